@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import random
+from typing import List
+
+# Synthetic 10-K-like text shared by the chunker benchmarks: prose sections, ALL-CAPS headers
+# and long tables (one short line per row, no blank lines inside).
+WORDS = (
+    "revenue income net total assets liabilities cash flow operating segment fiscal year "
+    "ended december company million billion share equity deferred tax goodwill"
+).split()
+HEADERS = ["ITEM 7. MANAGEMENT'S DISCUSSION", "RISK FACTORS", "CONSOLIDATED BALANCE SHEETS", "NOTES TO FINANCIAL STATEMENTS"]
+
+
+def sentence(rng: random.Random) -> str:
+    s = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 28)))
+    return s[0].upper() + s[1:] + "."
+
+
+def table_row(rng: random.Random) -> str:
+    cells = [rng.choice(WORDS).title()] + [f"${rng.randint(1, 99_999):,}" for _ in range(rng.randint(2, 5))]
+    return " | ".join(cells)
+
+
+def table(rng: random.Random) -> str:
+    return "\n".join(table_row(rng) for _ in range(rng.randint(40, 400)))
+
+
+def synthetic_filing(n_chars: int, rng: random.Random) -> str:
+    parts: List[str] = []
+    size = 0
+    while size < n_chars:
+        k = rng.random()
+        if k < 0.05:
+            part = rng.choice(HEADERS)
+        elif k < 0.30:
+            part = table(rng)
+        else:
+            part = " ".join(sentence(rng) for _ in range(rng.randint(1, 12)))
+        parts.append(part)
+        size += len(part) + 2
+    return "\n\n".join(parts)[:n_chars]
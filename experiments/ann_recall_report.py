@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import csv
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from src.chunker_registry import CHUNKERS
+from src.embedding_cache import get_default_cache
+from src.index_store import INDEX_ROOT, load_chunk_index
+from src.jsonl_io import iter_jsonl
+from src.retrieval import IndexSpec, build_ann_index, normalize_rows, search_params
+
+IN_PATH = Path("artifacts/eval_financebench.jsonl")
+OUT_CSV = Path("artifacts/ann_recall_latency.csv")
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+TOP_K = 5
+N_TIMING_REPEATS = 3
+
+# (spec, search-time knob values); nlist / pq sizes are clamped for small corpora
+CONFIGS = [
+    (IndexSpec(kind="ivf_flat", nlist=1024), {"nprobe": [1, 4, 16, 64]}),
+    (IndexSpec(kind="ivf_pq", nlist=1024, pq_m=16, pq_bits=8), {"nprobe": [1, 4, 16, 64]}),
+    (IndexSpec(kind="hnsw", hnsw_m=32), {"ef_search": [16, 64, 256]}),
+]
+
+
+def load_questions() -> List[str]:
+    return [r["question"] for r in iter_jsonl(IN_PATH)]
+
+
+def recall_at_k(approx: np.ndarray, exact: np.ndarray) -> float:
+    hits = 0
+    total = 0
+    for a, e in zip(approx, exact):
+        e = set(e[e >= 0].tolist())
+        hits += len(e & set(a.tolist()))
+        total += len(e)
+    return hits / max(1, total)
+
+
+def time_search(index: faiss.Index, q: np.ndarray, params: faiss.SearchParameters) -> tuple:
+    best = float("inf")
+    for _ in range(N_TIMING_REPEATS):
+        t0 = time.perf_counter()
+        _, idxs = index.search(q, TOP_K, params=params)
+        best = min(best, time.perf_counter() - t0)
+    return idxs, best
+
+
+def report_for_chunker(chunker_name: str, q: np.ndarray) -> List[Dict]:
+    """Recall@k and per-query latency of each ANN config vs the persisted flat index."""
+    flat = load_chunk_index(INDEX_ROOT / chunker_name, mmap=False, embed_model=EMBED_MODEL)
+    if flat.spec.kind != "flat":
+        raise SystemExit(f"{chunker_name}: baseline index must be flat (build_index with IndexSpec(kind='flat'))")
+    vectors = flat.index.reconstruct_n(0, flat.index.ntotal)
+
+    exact_idxs, exact_t = time_search(flat.index, q, search_params(flat.spec))
+    rows = [{
+        "chunker": chunker_name, "kind": "flat", "knob": "", "value": "",
+        "n_vectors": len(vectors), "recall_at_k": 1.0,
+        "ms_per_query": 1000 * exact_t / len(q), "build_s": 0.0,
+        "index_mb": faiss.serialize_index(flat.index).nbytes / 1e6,
+    }]
+
+    for spec, knobs in CONFIGS:
+        t0 = time.perf_counter()
+        index = build_ann_index(vectors, spec)
+        build_s = time.perf_counter() - t0
+        index_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        for knob, values in knobs.items():
+            for v in values:
+                params = search_params(replace(spec, **{knob: v}))
+                idxs, t = time_search(index, q, params)
+                rows.append({
+                    "chunker": chunker_name, "kind": spec.kind, "knob": knob, "value": v,
+                    "n_vectors": len(vectors), "recall_at_k": recall_at_k(idxs, exact_idxs),
+                    "ms_per_query": 1000 * t / len(q), "build_s": build_s, "index_mb": index_mb,
+                })
+    return rows
+
+
+def main():
+    questions = load_questions()
+    cache = get_default_cache()
+    q = normalize_rows(cache.encode(questions, model_name=EMBED_MODEL, normalize_embeddings=False))
+
+    all_rows: List[Dict] = []
+    for chunker_name in CHUNKERS:
+        if not (INDEX_ROOT / chunker_name / "manifest.json").exists():
+            print(f"{chunker_name}: no index, run python -m experiments.build_index first")
+            continue
+        all_rows += report_for_chunker(chunker_name, q)
+
+    if not all_rows:
+        return
+
+    OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
+    with OUT_CSV.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(all_rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(all_rows)
+
+    print(f"{'chunker':<18} {'kind':<9} {'knob':<10} {'value':>5} {'recall@k':>9} {'ms/query':>9} {'MB':>8}")
+    for r in all_rows:
+        print(
+            f"{r['chunker']:<18} {r['kind']:<9} {r['knob']:<10} {str(r['value']):>5} "
+            f"{r['recall_at_k']:>9.3f} {r['ms_per_query']:>9.4f} {r['index_mb']:>8.2f}"
+        )
+    print(f"Saved: {OUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from typing import Dict, List
 
 from datasets import load_from_disk
 
+from src.chunk_engine import chunk_corpus_list
 from src.chunker_registry import CHUNKERS
 
 
@@ -75,13 +76,17 @@ def digit_ratio(text: str) -> float:
 def run_one(dataset_name: str, docs: List[str]) -> List[Dict]:
     rows: List[Dict] = []
 
-    for chunker_name, chunker in CHUNKERS.items():
-        for i, doc in enumerate(docs):
-            chunks = chunker(doc)
-            sizes = [len(c.text) for c in chunks] if chunks else [0]
+    for chunker_name in CHUNKERS:
+        # Documents fan out over CHUNK_WORKERS processes; sizes come from the span arrays,
+        # texts are built one at a time
+        per_doc = chunk_corpus_list(docs, chunker_name)
+
+        for i, (doc, chunks) in enumerate(zip(docs, per_doc)):
+            sizes = chunks.lengths.tolist() if len(chunks) else [0]
+            texts = (chunks.text(j) for j in range(len(chunks)))
 
             # numeric heaviness proxy (helps your “numbers matter” argument)
-            dr = [digit_ratio(c.text) for c in chunks] if chunks else [0.0]
+            dr = [digit_ratio(t) for t in texts] if len(chunks) else [0.0]
 
             rows.append(
                 {
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from experiments._synthetic import synthetic_filing
+from src.chunkers import fixed_char_spans, fixed_token_spans, layout_break_spans, layout_break_token_spans
+from src.chunkers_recursive import recursive_spans, recursive_token_spans
+from src.token_counter import TokenCounter, get_token_counter
+
+# 10-K-sized synthetic filings (experiments/_synthetic.py): long tables are where block / line counts explode.
+DOC_MB = [1, 2, 3, 5]
+N_REPEATS = 3
+SEED = 0
+
+SPAN_CHUNKERS: Dict[str, Callable] = {
+    "fixed": lambda t: fixed_char_spans(t, chunk_size=1000, overlap=200),
+    "layout": lambda t: layout_break_spans(t, max_chars=1200),
+    "recursive_rule": lambda t: recursive_spans(t, max_chars=350),
+}
+
+# Token-budgeted counterparts (registry defaults); each run gets an empty count cache
+TOKEN_SPAN_CHUNKERS: Dict[str, Callable] = {
+    "fixed": lambda t, c: fixed_token_spans(t, chunk_tokens=254, overlap_tokens=50, counter=c),
+    "layout": lambda t, c: layout_break_token_spans(t, max_tokens=254, counter=c),
+    "recursive_rule": lambda t, c: recursive_token_spans(t, max_tokens=96, counter=c),
+}
+
+
+def best_of(fn, repeats: int = N_REPEATS) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    rng = random.Random(SEED)
+    docs = {mb: synthetic_filing(mb * 1_000_000, rng) for mb in DOC_MB}
+
+    print(f"{'chunker':<16} {'doc_MB':>6} {'n_chunks':>9} {'seconds':>8} {'s_per_MB':>9} {'MB_per_s':>9}")
+    for name, fn in SPAN_CHUNKERS.items():
+        for mb, doc in docs.items():
+            n_chunks = len(fn(doc))
+            t = best_of(lambda: fn(doc))
+            print(f"{name:<16} {mb:>6} {n_chunks:>9} {t:>8.3f} {t / mb:>9.3f} {mb / t:>9.2f}")
+    print("Linear packing: s_per_MB should stay flat as documents grow.")
+
+    # Tokenizer from the embedding model when transformers is installed, else the regex approximation
+    tokenizer = get_token_counter().tokenizer
+    print(f"\ntoken budgets ({type(tokenizer).__name__ if tokenizer is not None else 'regex approximation'}, cold cache)")
+    print(f"{'chunker':<16} {'doc_MB':>6} {'n_chunks':>9} {'seconds':>8} {'MB_per_s':>9} {'x_chars':>8}")
+    for name, fn in TOKEN_SPAN_CHUNKERS.items():
+        for mb, doc in docs.items():
+            n_chunks = len(fn(doc, TokenCounter(tokenizer)))
+            t = best_of(lambda: fn(doc, TokenCounter(tokenizer)))
+            t_chars = best_of(lambda: SPAN_CHUNKERS[name](doc))
+            print(f"{name:<16} {mb:>6} {n_chunks:>9} {t:>8.3f} {mb / t:>9.2f} {t / t_chars:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from experiments._synthetic import sentence, table_row
+
+# Throughput / memory of every CHUNKERS entry on synthetic documents of controlled size,
+# table density and paragraph count. Each case runs in a fresh process, so peak RSS is
+# per case. Results go to JSON and are compared against a stored baseline.
+OUT_PATH = Path("artifacts/bench/chunkers.json")
+BASELINE_PATH = Path("artifacts/bench/chunkers_baseline.json")
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+TABLE_DENSITIES = [0.0, 0.3, 0.7]
+PARAGRAPH_CHARS = 600
+# Paragraph-count sweep at a fixed size and table density
+PARAGRAPH_SWEEP = (1_000_000, 0.3, [100, 1_000, 10_000])
+QUICK_MAX_CHARS = 1_000_000
+# The semantic chunker embeds every paragraph; larger documents only measure the model
+SEMANTIC_MAX_CHARS = 1_000_000
+
+MIN_RUN_S = 0.5   # repeat each case for at least this long ...
+MIN_REPEATS = 3   # ... and at least this many times
+MAX_REPEATS = 1000
+SEED = 0
+
+# (chunker, n_chars, table_density, n_paragraphs)
+Case = Tuple[str, int, float, int]
+
+# Regressions: relative change past the tolerance, and past an absolute floor for memory
+TOLERANCE = 0.15
+MEMORY_FLOOR_MB = 2.0
+
+
+def synthetic_document(n_chars: int, table_density: float, n_paragraphs: int, rng: random.Random) -> str:
+    """n_paragraphs blank-line-separated blocks of about equal size; table_density of them are tables."""
+    para_chars = max(40, n_chars // max(1, n_paragraphs) - 2)
+    parts: List[str] = []
+    size = 0
+    while size < n_chars:
+        lines: List[str] = []
+        n = 0
+        is_table = rng.random() < table_density
+        while n < para_chars:
+            if is_table:
+                lines.append(table_row(rng))
+            else:
+                lines.append(sentence(rng))
+            n += len(lines[-1]) + 1
+        part = ("\n" if is_table else " ").join(lines)[:para_chars].strip()
+        parts.append(part)
+        size += len(part) + 2
+    return "\n\n".join(parts)[:n_chars]
+
+
+def default_cases(chunkers: List[str], quick: bool) -> List[Case]:
+    max_chars = QUICK_MAX_CHARS if quick else max(SIZES)
+    cases: List[Case] = []
+    for name in chunkers:
+        limit = min(max_chars, SEMANTIC_MAX_CHARS) if name == "semantic_adjacent" else max_chars
+        for n_chars in SIZES:
+            if n_chars > limit:
+                continue
+            for density in TABLE_DENSITIES:
+                cases.append((name, n_chars, density, max(1, n_chars // PARAGRAPH_CHARS)))
+        n_chars, density, counts = PARAGRAPH_SWEEP
+        if n_chars <= limit:
+            cases += [(name, n_chars, density, n) for n in counts if n != max(1, n_chars // PARAGRAPH_CHARS)]
+    return cases
+
+
+def _chunker(name: str):
+    from src.chunker_registry import CHUNKERS, make_semantic_adjacent
+
+    if name == "semantic_adjacent":
+        # Embedding cache off: every run pays for the model, as a cold corpus would
+        return make_semantic_adjacent(use_cache=False)
+    return CHUNKERS[name]
+
+
+def run_case(case: Case) -> Dict:
+    """Runs in its own process: timing runs, then one traced run for Python allocations."""
+    name, n_chars, density, n_paragraphs = case
+    row: Dict = {"chunker": name, "n_chars": n_chars, "table_density": density, "n_paragraphs": n_paragraphs}
+    try:
+        fn = _chunker(name)
+        doc = synthetic_document(n_chars, density, n_paragraphs, random.Random(SEED))
+        row["n_chunks"] = len(fn(doc))  # warm-up (model load, regex compilation)
+    except ImportError as e:
+        row["skipped"] = f"{type(e).__name__}: {e}"
+        return row
+
+    times: List[float] = []
+    t_start = time.perf_counter()
+    while len(times) < MAX_REPEATS and (len(times) < MIN_REPEATS or time.perf_counter() - t_start < MIN_RUN_S):
+        t0 = time.perf_counter()
+        fn(doc)
+        times.append(time.perf_counter() - t0)
+    seconds = statistics.median(times)
+
+    gc.collect()
+    blocks0 = sys.getallocatedblocks()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    result = fn(doc)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained_blocks = sys.getallocatedblocks() - blocks0
+    del result
+
+    row.update({
+        "repeats": len(times),
+        "seconds": seconds,
+        "min_seconds": min(times),
+        "docs_per_s": 1.0 / seconds,
+        "mb_per_s": n_chars / 1e6 / seconds,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        "alloc_peak_mb": (peak - base) / 1e6,
+        "retained_mb": (current - base) / 1e6,
+        "retained_blocks": retained_blocks,
+    })
+    return row
+
+
+def run_cases(cases: List[Case]) -> List[Dict]:
+    rows: List[Dict] = []
+    ctx = mp.get_context("spawn")
+    # One process per case: peak RSS must not carry over from earlier (larger) cases
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, max_tasks_per_child=1) as pool:
+        for case, row in zip(cases, pool.map(run_case, cases)):
+            rows.append(row)
+            if "skipped" in row:
+                print(f"{case[0]:<18} {case[1]:>9} skipped ({row['skipped']})")
+                continue
+            print(
+                f"{row['chunker']:<18} {row['n_chars']:>9} {row['table_density']:>5.2f} {row['n_paragraphs']:>6} "
+                f"{row['n_chunks']:>7} {row['docs_per_s']:>10.1f} {row['mb_per_s']:>8.2f} "
+                f"{row['peak_rss_mb']:>8.1f} {row['alloc_peak_mb']:>9.2f} {row['retained_blocks']:>9}"
+            )
+    return rows
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def case_key(row: Dict) -> Tuple:
+    return row["chunker"], row["n_chars"], row["table_density"], row["n_paragraphs"]
+
+
+def compare(rows: List[Dict], baseline: List[Dict], tolerance: float = TOLERANCE) -> List[Dict]:
+    """
+    Per case present in both runs: throughput and memory ratios vs the baseline.
+    A case regresses when MB/s drops by more than tolerance, or peak allocations /
+    peak RSS grow by more than tolerance and MEMORY_FLOOR_MB.
+    """
+    base = {case_key(r): r for r in baseline if "skipped" not in r}
+    out: List[Dict] = []
+    for r in rows:
+        b = base.get(case_key(r))
+        if b is None or "skipped" in r:
+            continue
+        reasons = []
+        speed = r["mb_per_s"] / b["mb_per_s"]
+        if speed < 1 - tolerance:
+            reasons.append(f"MB/s x{speed:.2f}")
+        for key in ("alloc_peak_mb", "peak_rss_mb"):
+            grown = r[key] - b[key]
+            if grown > MEMORY_FLOOR_MB and r[key] > b[key] * (1 + tolerance):
+                reasons.append(f"{key} +{grown:.1f}")
+        out.append({"case": case_key(r), "speed_ratio": speed, "regressions": reasons})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Chunker throughput / memory benchmark")
+    ap.add_argument("--chunkers", nargs="*", help="CHUNKERS names (default: all)")
+    ap.add_argument("--quick", action="store_true", help=f"documents up to {QUICK_MAX_CHARS:,} chars")
+    ap.add_argument("--out", type=Path, default=OUT_PATH)
+    ap.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true", help="also store this run as the baseline")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ap.add_argument("--fail-on-regression", action="store_true")
+    args = ap.parse_args()
+
+    from src.chunker_registry import CHUNKERS
+
+    chunkers = args.chunkers or list(CHUNKERS)
+    unknown = set(chunkers) - set(CHUNKERS)
+    if unknown:
+        raise SystemExit(f"Unknown chunkers: {sorted(unknown)} (known: {list(CHUNKERS)})")
+
+    cases = default_cases(chunkers, args.quick)
+    print(f"{len(cases)} cases")
+    print(f"{'chunker':<18} {'n_chars':>9} {'table':>5} {'paras':>6} {'chunks':>7} {'docs/s':>10} "
+          f"{'MB/s':>8} {'rss_MB':>8} {'alloc_MB':>9} {'blocks':>9}")
+    rows = run_cases(cases)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "seed": SEED,
+        },
+        "results": rows,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Saved: {args.out}")
+
+    regressed = []
+    if args.baseline.exists() and args.baseline.resolve() != args.out.resolve():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        diffs = compare(rows, baseline["results"], args.tolerance)
+        print(f"\nvs baseline {args.baseline} ({baseline['meta'].get('git_commit')}, {baseline['meta'].get('timestamp')})")
+        for d in diffs:
+            flag = "REGRESSION " + "; ".join(d["regressions"]) if d["regressions"] else ""
+            name, n_chars, density, n_paragraphs = d["case"]
+            print(f"{name:<18} {n_chars:>9} {density:>5.2f} {n_paragraphs:>6}  MB/s x{d['speed_ratio']:.2f}  {flag}")
+        regressed = [d for d in diffs if d["regressions"]]
+        print(f"{len(regressed)} of {len(diffs)} cases regressed (tolerance {args.tolerance:.0%})")
+    elif not args.save_baseline:
+        print(f"No baseline at {args.baseline} (store one with --save-baseline)")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline saved: {args.baseline}")
+
+    if regressed and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.chunkers_semantic import _merge_sequential, _merge_vectorized
+
+# Boundary detection only: embeddings are synthetic (topic drift + noise), so the
+# model is not part of the timing. Sizes cover long filings with thousands of paragraphs.
+# The modes are not equivalent: agreement columns compare vectorized chunk ends to the
+# sequential (original) ones, i.e. how much the registry default changed the chunks.
+N_PARAGRAPHS = [1_000, 5_000, 20_000]
+DIM = 384
+N_REPEATS = 3
+PARAMS = dict(max_chars=1200, min_chars=300, similarity_threshold=0.78)
+SEED = 0
+
+
+def synthetic_doc(n: int, rng: np.random.Generator) -> Tuple[List[str], np.ndarray]:
+    """Paragraph lengths like 10-K text, embeddings that stay on a topic for ~8 paragraphs."""
+    lengths = rng.lognormal(mean=5.0, sigma=0.8, size=n).astype(int) + 1
+    units = ["x" * int(l) for l in lengths]
+
+    topic = rng.normal(size=DIM)
+    embs = np.empty((n, DIM), dtype=np.float32)
+    for i in range(n):
+        if rng.random() < 0.125:
+            topic = rng.normal(size=DIM)
+        embs[i] = topic + 0.6 * rng.normal(size=DIM)
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    return units, embs
+
+
+def best_of(fn, repeats: int = N_REPEATS) -> Tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def boundary_agreement(a: List[Tuple[int, int]], b: List[Tuple[int, int]]) -> Tuple[float, float, float]:
+    """
+    How far b's chunk ends agree with a's: (jaccard, share of a's ends that b keeps,
+    share of b's ends that a does not have).
+    """
+    ea, eb = {e for _, e in a}, {e for _, e in b}
+    common = len(ea & eb)
+    return common / max(1, len(ea | eb)), common / max(1, len(ea)), (len(eb) - common) / max(1, len(eb))
+
+
+def main():
+    rng = np.random.default_rng(SEED)
+    print(f"{'paragraphs':>10} {'sequential_ms':>14} {'vectorized_ms':>14} {'speedup':>8} "
+          f"{'chunks_seq':>10} {'chunks_vec':>10} {'boundary_jaccard':>16} {'seq_kept':>8} {'vec_new':>8}")
+    for n in N_PARAGRAPHS:
+        units, embs = synthetic_doc(n, rng)
+        lengths = np.fromiter((len(u) for u in units), dtype=np.int64, count=n)
+
+        t_seq, g_seq = best_of(lambda: _merge_sequential([len(u) for u in units], embs, **PARAMS))
+        t_vec, g_vec = best_of(lambda: _merge_vectorized(lengths, embs, **PARAMS))
+
+        jaccard, kept, new = boundary_agreement(g_seq, g_vec)
+        print(f"{n:>10} {t_seq * 1e3:>14.1f} {t_vec * 1e3:>14.1f} {t_seq / t_vec:>7.1f}x "
+              f"{len(g_seq):>10} {len(g_vec):>10} {jaccard:>16.3f} {kept:>8.3f} {new:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 import json
+import sys
 from pathlib import Path
 from datasets import load_from_disk
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.tracing import start_trace, text_bytes
+
 def normalize_financebench_evidence(evidence):
     """
     evidence is typically a list[dict] with keys like:
@@ -75,8 +81,15 @@ def load_tatqa_examples(split_file="data/tatqa_raw/tatqa_dataset_train.json", li
     return examples
 
 def main():
-    fb = load_financebench_examples(limit=3)
-    tq = load_tatqa_examples(limit=3)
+    tracer = start_trace("build")
+    with tracer.stage_span() as stage:
+        with tracer.span("load", dataset="financebench") as sp:
+            fb = load_financebench_examples(limit=3)
+            sp["count"], sp["bytes"] = len(fb), text_bytes(ex["doc_text"] for ex in fb)
+        with tracer.span("load", dataset="tatqa") as sp:
+            tq = load_tatqa_examples(limit=3)
+            sp["count"], sp["bytes"] = len(tq), text_bytes(ex["doc_text"] for ex in tq)
+        stage["count"] = len(fb) + len(tq)
 
     print("FinanceBench sample:")
     for ex in fb:
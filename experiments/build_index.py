@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from tqdm import tqdm
+
+from src.chunk_engine import chunk_corpus
+from src.chunker_registry import CHUNKERS
+from src.embedding_cache import get_default_cache
+from src.embedding_pool import warm_models
+from src.index_store import CHUNK_META_DTYPE, INDEX_ROOT, doc_key, save_chunk_index
+from src.jsonl_io import iter_jsonl
+from src.retrieval import IndexSpec, build_ann_index, normalize_rows
+
+IN_PATH = Path("artifacts/eval_financebench.jsonl")
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# flat (exact) | ivf_flat | ivf_pq | hnsw -- see src/retrieval.IndexSpec
+INDEX_SPEC = IndexSpec(kind="flat")
+
+
+def load_corpus() -> Dict[str, str]:
+    """Unique evidence documents, keyed by content hash (same key retrieval uses)."""
+    corpus: Dict[str, str] = {}
+    for r in iter_jsonl(IN_PATH):
+        corpus.setdefault(doc_key(r["doc_text"]), r["doc_text"])
+    return corpus
+
+
+def build_for_chunker(chunker_name: str, corpus: Dict[str, str]) -> int:
+    cache = get_default_cache()
+
+    out_dir = INDEX_ROOT / chunker_name
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Normalized vectors are spooled to disk so ANN training/adding never needs them all in RAM
+    spool_path = out_dir / "vectors.tmp"
+    spool_path.unlink(missing_ok=True)
+
+    doc_ids = list(corpus.keys())
+    meta_rows: List[tuple] = []
+    blob = bytearray()
+    dim = 0
+
+    # Chunked in worker processes (semantic: in-process, batched across documents), in doc order
+    doc_chunks = chunk_corpus([corpus[doc_id] for doc_id in doc_ids], chunker_name)
+
+    for d, spans in tqdm(doc_chunks, total=len(doc_ids), desc=f"Index ({chunker_name})"):
+        kept = [(s, t) for s, t in zip(spans.spans.tolist(), spans.texts()) if t.strip()]
+        if not kept:
+            continue
+        chunks = [t for _, t in kept]
+
+        # Offsets come straight from the chunk spans
+        for (start, end), t in kept:
+            b = t.encode("utf-8")
+            meta_rows.append((d, start, end, len(blob), len(blob) + len(b)))
+            blob += b
+
+        # Chunk ids stay contiguous per document, so a doc is an id range in the index
+        vecs = normalize_rows(cache.encode(chunks, model_name=EMBED_MODEL, normalize_embeddings=False))
+        dim = vecs.shape[1]
+        with spool_path.open("ab") as f:
+            f.write(vecs.tobytes())
+
+    if not meta_rows:
+        print(f"{chunker_name}: no chunks, skipped")
+        return 0
+
+    vectors = np.memmap(spool_path, dtype="float32", mode="r", shape=(len(meta_rows), dim))
+    index = build_ann_index(vectors, INDEX_SPEC)
+    del vectors
+    spool_path.unlink()
+
+    meta = np.array(meta_rows, dtype=CHUNK_META_DTYPE)
+    save_chunk_index(out_dir, chunker_name, index, doc_ids, meta, bytes(blob), EMBED_MODEL, spec=INDEX_SPEC)
+    return len(meta_rows)
+
+
+def main():
+    corpus = load_corpus()
+    print(f"Documents: {len(corpus)}")
+    warm_models([EMBED_MODEL])
+
+    for chunker_name in CHUNKERS:
+        n = build_for_chunker(chunker_name, corpus)
+        print(f"{chunker_name}: {n} chunks -> {INDEX_ROOT / chunker_name}")
+
+    get_default_cache().flush()
+    print("Next step: python -m experiments.retrieve_financebench (USE_PERSISTED_INDEXES = True)")
+
+
+if __name__ == "__main__":
+    main()
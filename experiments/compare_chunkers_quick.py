@@ -5,6 +5,7 @@ sys.path.append(str(PROJECT_ROOT))
 
 from datasets import load_from_disk
 from src.chunker_registry import CHUNKERS
+from src.chunkers import prepare_document
 
 def get_one_financebench_doc():
     ds = load_from_disk("data/financebench")["train"]
@@ -20,8 +21,10 @@ def main():
     doc = get_one_financebench_doc()
     print("Doc length (chars):", len(doc))
 
+    # Parsed once (paragraphs, layout blocks, table lines), shared by every chunker
+    prepared = prepare_document(doc)
     for name, chunker in CHUNKERS.items():
-        chunks = chunker(doc)
+        chunks = chunker(prepared)
         sizes = [len(c.text) for c in chunks]
         print(f"\n== {name} ==")
         print("chunks:", len(chunks))
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
-import json
 import os
+import sys
 from collections import defaultdict
 from pathlib import Path
 from typing import Any, Dict, List
 
 import pandas as pd
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.eval_cache import JudgeStore, aggregate_from_store, evaluate_with_store
+from src.jsonl_io import iter_jsonl
+from src.tracing import start_trace
+
 
 def _clip_ctx(xs, k=3, n=1500):
     if not isinstance(xs, list):
@@ -35,23 +42,19 @@ MAX_Q_CHARS = 250
 MAX_A_CHARS = 250
 MAX_REF_CHARS = 250
 
-# Force serial execution
+# Each evaluate() call stays serial; parallelism comes from running shards side by side
 os.environ["RAGAS_MAX_WORKERS"] = "1"
 os.environ["RAGAS_NUM_WORKERS"] = "1"
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "2"))  # concurrent judge calls against ollama
+SHARD_SIZE = 4
+JUDGE_MODEL = "llama3.1:8b"
 
 EVAL_PATH = Path("artifacts/eval_financebench_ragas_ready.jsonl")
 ANSWERS_PATH = Path("artifacts/answers_financebench_ragas_ready_v3_merged.jsonl")
 OUT_PATH = Path("artifacts/ragas_results.csv")
 
-
-def load_jsonl(path: Path) -> List[Dict[str, Any]]:
-    rows = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                rows.append(json.loads(line))
-    return rows
+# Only these fields of the eval rows are kept in memory (not doc_text)
+GOLD_FIELDS = ("question", "answer", "ground_truth")
 
 
 def pick_id(row: Dict[str, Any]) -> str:
@@ -98,7 +101,7 @@ def get_run_config():
 def main():
     # Local judge + embeddings
     lc_llm = ChatOllama(
-        model="llama3.1:8b",
+        model=JUDGE_MODEL,
         temperature=0.0,
         max_tokens=128,
         num_predict=96,
@@ -111,12 +114,12 @@ def main():
 
     METRICS = [context_precision, context_recall]
 
-    answers = load_jsonl(ANSWERS_PATH)
-    gold_rows = load_jsonl(EVAL_PATH)
-    gold = {pick_id(r): r for r in gold_rows}
+    gold = {pick_id(r): {k: r.get(k) for k in GOLD_FIELDS} for r in iter_jsonl(EVAL_PATH)}
 
     by_chunker = defaultdict(list)
-    for a in answers:
+    for a in iter_jsonl(ANSWERS_PATH):
+        if len(by_chunker[a.get("chunker", "unknown")]) >= N_PER_CHUNKER:
+            continue
         qid = pick_id(a)
         g = gold.get(qid, {})
 
@@ -140,37 +143,38 @@ def main():
             # some versions use different field names
             run_config = RunConfig(timeout=1200)
 
-    results = []
-    for chunker, rows in by_chunker.items():
-        rows = rows[:N_PER_CHUNKER]
-        missing = sum(1 for r in rows if not r["retrieved_contexts"])
-        print(f"Evaluating chunker: {chunker} | examples={len(rows)} | missing_contexts={missing}")
-
+    def evaluate_shard(rows, metrics):
         ds = Dataset.from_list([{k: v for k, v in r.items() if k != "chunker"} for r in rows])
-
         kwargs = dict(
             dataset=ds,
-            metrics=METRICS,
+            metrics=metrics,
             llm=ragas_llm,
             embeddings=ragas_emb,
             raise_exceptions=False,
         )
         if run_config is not None:
             kwargs["run_config"] = run_config
+        df = evaluate(**kwargs).to_pandas()
+        return df.apply(pd.to_numeric, errors="coerce").to_dict("records")
 
-        scores = evaluate(**kwargs)
-
-        df = scores.to_pandas()
-        # only average numeric metric columns
-        means = (
-            df.apply(pd.to_numeric, errors="coerce")
-            .mean(numeric_only=True)
-            .to_dict()
+    # Only (sample, chunker, metric) cells not already judged by JUDGE_MODEL are evaluated
+    store = JudgeStore()
+    tracer = start_trace("judge")
+    for chunker, rows in by_chunker.items():
+        missing = sum(1 for r in rows if not r["retrieved_contexts"])
+        print(f"Evaluating chunker: {chunker} | examples={len(rows)} | missing_contexts={missing}")
+    with tracer.stage_span(judge=JUDGE_MODEL, concurrency=EVAL_WORKERS) as stage:
+        n_shards = evaluate_with_store(
+            by_chunker, METRICS, JUDGE_MODEL, evaluate_shard, store, n_workers=EVAL_WORKERS, shard_size=SHARD_SIZE
         )
-        means["chunker"] = chunker
-        means["n_examples"] = len(rows)
-        means["n_missing_contexts"] = missing
-        results.append(means)
+        stage["count"] = n_shards
+    print(f"Judged {n_shards} shards (everything else came from {store.path})")
+    print(f"Trace: {tracer.n_spans} spans -> {tracer.path} (run {tracer.run_id})")
+
+    # Aggregates are recomputed from the store, so re-running without new answers makes no judge calls
+    results = aggregate_from_store(by_chunker, METRICS, JUDGE_MODEL, store)
+    for means in results:
+        means["n_missing_contexts"] = sum(1 for r in by_chunker[means["chunker"]] if not r["retrieved_contexts"])
 
     out_df = pd.DataFrame(results)
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-import json
+import os
+import sys
 from collections import defaultdict
 from pathlib import Path
 from typing import Any, Dict, List
@@ -8,6 +9,13 @@ from typing import Any, Dict, List
 import pandas as pd
 from datasets import Dataset
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.eval_cache import JudgeStore, aggregate_from_store, evaluate_with_store
+from src.jsonl_io import iter_jsonl
+from src.tracing import start_trace
+
 from ragas import evaluate
 from ragas.metrics import context_precision, context_recall, faithfulness, answer_relevancy
 
@@ -20,6 +28,12 @@ N_PER_CHUNKER = 25     # 25 = meaningful, 50 = stronger but slower/costlier
 TOP_K_CTX     = 3      # only top 3 contexts
 CTX_CHARS     = 900    # truncate each context to 900 chars
 MAX_ANSWER_CHARS = 1200
+EVAL_WORKERS  = int(os.getenv("EVAL_WORKERS", "8"))  # shards evaluated concurrently
+SHARD_SIZE    = 5
+JUDGE_MODEL   = "gpt-4o-mini"
+
+# Only these fields of the eval rows are kept in memory (not doc_text)
+GOLD_FIELDS = ("question", "answer", "ground_truth")
 
 # ---- OpenAI via LangChain (works with older ragas + wrappers) ----
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
@@ -27,7 +41,7 @@ from ragas.llms import LangchainLLMWrapper
 from ragas.embeddings import LangchainEmbeddingsWrapper
 
 lc_llm = ChatOpenAI(
-    model="gpt-4o-mini",
+    model=JUDGE_MODEL,
     temperature=0,
     max_tokens=512,          # short judge outputs
     timeout=60,              # per request timeout
@@ -45,16 +59,6 @@ ragas_emb = LangchainEmbeddingsWrapper(lc_emb)
 METRICS = [context_precision, context_recall, faithfulness, answer_relevancy]
 
 
-def load_jsonl(path: Path) -> List[Dict[str, Any]]:
-    rows = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                rows.append(json.loads(line))
-    return rows
-
-
 def pick_id(row: Dict[str, Any]) -> str:
     return str(row.get("financebench_id") or row.get("id") or "noid")
 
@@ -71,13 +75,13 @@ def clip_contexts(ctxs: Any) -> List[str]:
 
 
 def main():
-    answers = load_jsonl(ANSWERS_PATH)
-    gold_rows = load_jsonl(EVAL_PATH)
-    gold = {pick_id(r): r for r in gold_rows}
+    gold = {pick_id(r): {k: r.get(k) for k in GOLD_FIELDS} for r in iter_jsonl(EVAL_PATH)}
 
     by_chunker = defaultdict(list)
 
-    for a in answers:
+    for a in iter_jsonl(ANSWERS_PATH):
+        if len(by_chunker[a.get("chunker", "unknown")]) >= N_PER_CHUNKER:
+            continue
         qid = pick_id(a)
         g = gold.get(qid, {})
 
@@ -107,19 +111,13 @@ def main():
         }
         by_chunker[chunker].append(row)
 
-    results = []
-    for chunker, rows in by_chunker.items():
-        rows = rows[:N_PER_CHUNKER]
-        missing = sum(1 for r in rows if not r["contexts"] and not r["retrieved_contexts"])
-        print(f"\nEvaluating chunker: {chunker} | examples={len(rows)} | missing_contexts={missing}")
-
+    def evaluate_shard(rows, metrics):
         ds = Dataset.from_list(rows)
-
         # Try both evaluate() signatures (ragas versions differ)
         try:
             scores = evaluate(
                 ds,
-                metrics=METRICS,
+                metrics=metrics,
                 llm=ragas_llm,
                 embeddings=ragas_emb,
                 raise_exceptions=False,
@@ -127,23 +125,31 @@ def main():
         except TypeError:
             scores = evaluate(
                 ds,
-                metrics=METRICS,
+                metrics=metrics,
                 raise_exceptions=False,
             )
+        return scores.to_pandas().apply(pd.to_numeric, errors="coerce").to_dict("records")
 
-        df = scores.to_pandas()
+    def n_missing(rows):
+        return sum(1 for r in rows if not r["contexts"] and not r["retrieved_contexts"])
 
-        metric_cols = [c for c in df.columns if c in ["context_precision","context_recall","faithfulness","answer_relevancy"]]
-        means = (
-            df[metric_cols]
-            .apply(pd.to_numeric, errors="coerce")
-            .mean(numeric_only=True)
-            .to_dict()
+    # Only (sample, chunker, metric) cells not already judged by JUDGE_MODEL are evaluated
+    store = JudgeStore()
+    tracer = start_trace("judge")
+    for chunker, rows in by_chunker.items():
+        print(f"\nEvaluating chunker: {chunker} | examples={len(rows)} | missing_contexts={n_missing(rows)}")
+    with tracer.stage_span(judge=JUDGE_MODEL, concurrency=EVAL_WORKERS) as stage:
+        n_shards = evaluate_with_store(
+            by_chunker, METRICS, JUDGE_MODEL, evaluate_shard, store, n_workers=EVAL_WORKERS, shard_size=SHARD_SIZE
         )
-        means["chunker"] = chunker
-        means["n_examples"] = len(rows)
-        means["n_missing_contexts"] = missing
-        results.append(means)
+        stage["count"] = n_shards
+    print(f"Judged {n_shards} shards (everything else came from {store.path})")
+    print(f"Trace: {tracer.n_spans} spans -> {tracer.path} (run {tracer.run_id})")
+
+    # Aggregates are recomputed from the store, so re-running without new answers makes no judge calls
+    results = aggregate_from_store(by_chunker, METRICS, JUDGE_MODEL, store)
+    for means in results:
+        means["n_missing_contexts"] = n_missing(by_chunker[means["chunker"]])
 
     out_df = pd.DataFrame(results).sort_values("chunker")
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
@@ -1,8 +1,17 @@
-import json
+import sys
 from pathlib import Path
+from typing import Any, Dict, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
 import requests
 from tqdm import tqdm
 
+from src.jsonl_io import JsonlWriter, iter_jsonl
+from src.response_cache import get_response_cache
+from src.tracing import start_trace, text_bytes
+
 IN_PATH = Path("artifacts/retrieval_financebench.jsonl")
 OUT_PATH = Path("artifacts/answers_financebench_ollama.jsonl")
 
@@ -14,6 +23,7 @@ TOP_K = 3               # only use top 3 retrieved contexts
 CTX_CHAR_LIMIT = 1200   # truncate each context chunk
 MAX_TOKENS = 120        # cap answer length (fast)
 TIMEOUT = 600           # seconds
+USE_RESPONSE_CACHE = True  # identical (model, options, prompt) are answered from artifacts/llm_cache.sqlite
 
 SYSTEM = (
     "You are a careful financial QA assistant. "
@@ -22,15 +32,6 @@ SYSTEM = (
     "Return a short, direct answer."
 )
 
-def load_rows(path: Path):
-    rows = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                rows.append(json.loads(line))
-    return rows
-
 def build_prompt(question: str, contexts):
     contexts = contexts[:TOP_K]
     cleaned = []
@@ -48,7 +49,7 @@ def build_prompt(question: str, contexts):
         f"ANSWER:"
     )
 
-def ollama_generate(prompt: str) -> str:
+def ollama_generate(prompt: str, span: Optional[Dict[str, Any]] = None) -> str:
     payload = {
         "model": MODEL,
         "prompt": prompt,
@@ -58,10 +59,18 @@ def ollama_generate(prompt: str) -> str:
             "temperature": 0.0,
         },
     }
-    r = requests.post(OLLAMA_URL, json=payload, timeout=TIMEOUT)
-    r.raise_for_status()
-    data = r.json()
-    return (data.get("response") or "").strip()
+
+    def call() -> str:
+        if span is not None:
+            span["cached"] = False
+        r = requests.post(OLLAMA_URL, json=payload, timeout=TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        return (data.get("response") or "").strip()
+
+    if not USE_RESPONSE_CACHE:
+        return call()
+    return get_response_cache().cached_call("ollama", MODEL, payload["options"], prompt, call)
 
 def main():
     if not IN_PATH.exists():
@@ -69,16 +78,18 @@ def main():
             f"Missing {IN_PATH}. Run: python -m experiments.retrieve_financebench"
         )
 
-    rows = load_rows(IN_PATH)
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    with OUT_PATH.open("w", encoding="utf-8") as out:
-        for row in tqdm(rows, desc="Generate answers (Ollama)"):
+    tracer = start_trace("generate")
+    with tracer.stage_span(provider="ollama") as stage, JsonlWriter(OUT_PATH, mode="w") as out:
+        for row in tqdm(iter_jsonl(IN_PATH), desc="Generate answers (Ollama)"):
             q = row["question"]
             ctxs = row.get("retrieved_contexts", [])
             prompt = build_prompt(q, ctxs)
 
-            ans = ollama_generate(prompt)
+            with tracer.span("llm_call", row.get("chunker"), provider="ollama") as sp:
+                sp.update(count=1, bytes=text_bytes([prompt]), cached=True)
+                ans = ollama_generate(prompt, span=sp)
+                sp["out_bytes"] = text_bytes([ans])
+            stage["count"] += 1
 
             row["generated_answer"] = ans
             row["generator"] = f"ollama:{MODEL}"
@@ -86,9 +97,12 @@ def main():
             row["gen_ctx_char_limit"] = CTX_CHAR_LIMIT
             row["gen_max_tokens"] = MAX_TOKENS
 
-            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.write(row)
 
     print(f"Saved: {OUT_PATH}")
+    print(f"Trace: {tracer.n_spans} spans -> {tracer.path} (run {tracer.run_id})")
+    if USE_RESPONSE_CACHE:
+        print(f"Response cache: {get_response_cache().stats()}")
 
 if __name__ == "__main__":
     main()
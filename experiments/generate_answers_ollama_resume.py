@@ -1,11 +1,23 @@
-import json
+import os
+import sys
 from pathlib import Path
-from typing import Dict, Any, Set, Tuple
+from typing import Dict, Any, Optional, Set, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
 
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
-OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
+from src.gen_runner import RetryPolicy, call_with_retries, run_bounded
+from src.jsonl_io import JsonlWriter, iter_jsonl, iter_jsonl_resume
+from src.response_cache import get_response_cache
+from src.tracing import get_tracer, start_trace, text_bytes
+
+# Point at a local stub (experiments/stub_llm_server.py) to measure throughput
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
+OLLAMA_URL = f"{OLLAMA_BASE_URL}/api/generate"
 
 IN_PATH = Path("artifacts/retrieval_financebench.jsonl")
 OUT_PATH = Path("artifacts/answers_financebench_ollama.jsonl")
@@ -15,19 +27,20 @@ TEMPERATURE = 0.0
 MAX_TOKENS = 256        # keep small for speed/cost
 TIMEOUT = 600           # seconds
 
-
-def load_jsonl(path: Path):
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                yield json.loads(line)
+# Concurrent requests in flight; match the server's OLLAMA_NUM_PARALLEL
+CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "4"))
+FLUSH_EVERY = 16        # answers buffered before hitting disk (lost + redone on crash)
+RETRY = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=30.0)
+USE_RESPONSE_CACHE = True  # identical (model, options, prompt) are answered from artifacts/llm_cache.sqlite
 
 
-def append_jsonl(path: Path, obj: Dict[str, Any]):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+def make_session(pool_size: int = CONCURRENCY) -> requests.Session:
+    """One keep-alive connection pool shared by all worker threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 def get_id(row: Dict[str, Any]) -> str:
@@ -75,7 +88,7 @@ def build_prompt(question: str, contexts) -> str:
     )
 
 
-def ollama_generate(prompt: str) -> str:
+def ollama_generate(prompt: str, session: requests.Session | None = None, span: Optional[Dict[str, Any]] = None) -> str:
     payload = {
         "model": MODEL,
         "prompt": prompt,
@@ -85,17 +98,52 @@ def ollama_generate(prompt: str) -> str:
             "num_predict": MAX_TOKENS,
         },
     }
-    r = requests.post(OLLAMA_URL, json=payload, timeout=TIMEOUT)
-    r.raise_for_status()
-    data = r.json()
-    return (data.get("response") or "").strip()
+
+    def call() -> str:
+        if span is not None:
+            span["cached"] = False
+        r = (session or requests).post(OLLAMA_URL, json=payload, timeout=TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        return (data.get("response") or "").strip()
+
+    if not USE_RESPONSE_CACHE:
+        return call()
+    return get_response_cache().cached_call("ollama", MODEL, payload["options"], prompt, call)
+
+
+def answer_row(row: Dict[str, Any], session: requests.Session) -> Dict[str, Any]:
+    qid = get_id(row)
+    ch = get_chunker(row)
+    question = row.get("question", "")
+    contexts = row.get("retrieved_contexts") or row.get("contexts") or row.get("retrieved") or []
+
+    prompt = build_prompt(question, contexts)
+    with get_tracer().span("llm_call", ch, provider="ollama") as sp:
+        sp.update(count=1, bytes=text_bytes([prompt]), cached=True, attempts=0)
+
+        def attempt() -> str:
+            sp["attempts"] += 1
+            return ollama_generate(prompt, session, span=sp)
+
+        answer = call_with_retries(attempt, RETRY)
+        sp["out_bytes"] = text_bytes([answer])
+
+    return {
+        "financebench_id": qid,
+        "chunker": ch,
+        "question": question,
+        "answer": answer,
+        "model": MODEL,
+    }
 
 
 def load_done_keys(path: Path) -> Set[Tuple[str, str]]:
     done: Set[Tuple[str, str]] = set()
     if not path.exists():
         return done
-    for row in load_jsonl(path):
+    # A run killed mid-flush can leave half a row at the end; it is trimmed (and redone)
+    for row in iter_jsonl_resume(path):
         qid = get_id(row)
         ch = get_chunker(row)
         done.add((qid, ch))
@@ -106,9 +154,11 @@ def main():
     if not IN_PATH.exists():
         raise SystemExit(f"Missing input: {IN_PATH}")
 
+    session = make_session()
+
     # make sure ollama server is up
     try:
-        _ = requests.get("http://127.0.0.1:11434/api/tags", timeout=5)
+        _ = session.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
     except Exception as e:
         raise SystemExit(
             "Ollama server not responding. Start it in another terminal with:\n\n"
@@ -116,56 +166,48 @@ def main():
         ) from e
 
     done = load_done_keys(OUT_PATH)
-
-    rows = list(load_jsonl(IN_PATH))
-    pbar = tqdm(rows, desc=f"Generate answers (Ollama: {MODEL})")
+    tracer = start_trace("generate")
 
     wrote = 0
     skipped = 0
 
-    for row in pbar:
-        qid = get_id(row)
-        ch = get_chunker(row)
-        key = (qid, ch)
-
-        if key in done:
-            skipped += 1
-            continue
-
-        question = row.get("question", "")
-        contexts = row.get("retrieved_contexts") or row.get("contexts") or row.get("retrieved") or []
-
-        prompt = build_prompt(question, contexts)
-
-        try:
-            answer = ollama_generate(prompt)
-        except Exception as e:
-            # save the error so you can inspect later and still continue
-            out = {
-                "financebench_id": qid,
-                "chunker": ch,
-                "question": question,
-                "answer": None,
-                "error": str(e),
-            }
-            append_jsonl(OUT_PATH, out)
+    def todo():
+        # Keys are claimed on submit so duplicate input rows are only generated once
+        nonlocal skipped
+        for row in iter_jsonl(IN_PATH):
+            key = (get_id(row), get_chunker(row))
+            if key in done:
+                skipped += 1
+                continue
             done.add(key)
+            yield row
+
+    pbar = tqdm(desc=f"Generate answers (Ollama: {MODEL}, x{CONCURRENCY})")
+
+    # Single writer: only this thread touches OUT_PATH, appending completed rows
+    with tracer.stage_span(provider="ollama", concurrency=CONCURRENCY) as stage, \
+            JsonlWriter(OUT_PATH, mode="a", batch_size=FLUSH_EVERY) as out:
+        for row, result, err in run_bounded(todo(), lambda r: answer_row(r, session), max_workers=CONCURRENCY):
+            stage["count"] += 1
+            if err is not None:
+                # save the error so you can inspect later and still continue
+                result = {
+                    "financebench_id": get_id(row),
+                    "chunker": get_chunker(row),
+                    "question": row.get("question", ""),
+                    "answer": None,
+                    "error": str(err),
+                }
+            out.write(result)
             wrote += 1
-            continue
-
-        out = {
-            "financebench_id": qid,
-            "chunker": ch,
-            "question": question,
-            "answer": answer,
-            "model": MODEL,
-        }
-        append_jsonl(OUT_PATH, out)
-        done.add(key)
-        wrote += 1
+            pbar.update(1)
 
+    pbar.close()
     print(f"\nDone. wrote={wrote}, skipped(existing)={skipped}")
     print(f"Output: {OUT_PATH}")
+    print(f"Trace: {tracer.n_spans} spans -> {tracer.path} (run {tracer.run_id})")
+    if USE_RESPONSE_CACHE:
+        print(f"Response cache: {get_response_cache().stats()}")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-import json
 import os
+import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Set, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
 
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from src.gen_runner import RateLimiter, RetryPolicy, call_with_retries, run_bounded
+from src.jsonl_io import JsonlWriter, count_jsonl, iter_jsonl, iter_jsonl_resume
+from src.response_cache import get_response_cache
+from src.tracing import start_trace, text_bytes
+
 IN_PATH = Path("artifacts/retrieval_financebench.jsonl")
 OUT_PATH = Path("artifacts/answers_openai_financebench.jsonl")
 
@@ -16,14 +24,16 @@ Use ONLY the provided context to answer the user's question.
 If the answer is not in the context, say: "Not enough information in the provided context."
 Return a short, direct answer (no extra commentary)."""
 
-def load_jsonl(path: Path) -> List[Dict[str, Any]]:
-    rows = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                rows.append(json.loads(line))
-    return rows
+# Throughput / limits (match your account tier). OPENAI_BASE_URL can point at
+# experiments/stub_llm_server.py for local testing.
+CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_RPM", "500"))
+TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TPM", "200000"))
+EXPECTED_OUTPUT_TOKENS = 128   # budgeted per request on top of the prompt
+FLUSH_EVERY = 10               # rows buffered before hitting disk (redone on crash)
+RETRY = RetryPolicy(max_attempts=6, base_delay=1.0, max_delay=60.0)
+TEMPERATURE = 0.0
+USE_RESPONSE_CACHE = True  # identical (model, options, prompt) are answered from artifacts/llm_cache.sqlite
 
 def build_context(row: Dict[str, Any]) -> str:
     # Most retrievers store contexts like: row["retrieved_contexts"] = [{"text": "...", "score": ...}, ...]
@@ -38,53 +48,120 @@ def build_context(row: Dict[str, Any]) -> str:
             parts.append(f"[Context {i}]\n{t}")
     return "\n\n".join(parts).strip()
 
-def main() -> None:
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+def row_key(row: Dict[str, Any]) -> Tuple[str, str]:
+    return (str(row.get("id")), str(row.get("chunker")))
 
-    if not api_key:
-        raise SystemExit("Missing OPENAI_API_KEY in .env")
 
-    client = OpenAI(api_key=api_key)
+def load_done_keys(path: Path) -> Set[Tuple[str, str]]:
+    if not path.exists():
+        return set()
+    # A run killed mid-flush can leave half a row at the end; it is trimmed (and redone)
+    return {row_key(r) for r in iter_jsonl_resume(path)}
 
-    rows = load_jsonl(IN_PATH)
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    with OUT_PATH.open("w", encoding="utf-8") as out:
-        for idx, row in enumerate(rows, start=1):
-            question = row.get("question", "").strip()
-            context = build_context(row)
+def build_user_prompt(row: Dict[str, Any]) -> str:
+    question = row.get("question", "").strip()
+    context = build_context(row)
 
-            user_prompt = f"""Question:
+    return f"""Question:
 {question}
 
 Context:
 {context}
 """
 
-            resp = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.0,
-            )
 
-            answer = resp.choices[0].message.content.strip()
+def estimate_tokens(*texts: str) -> int:
+    # ~4 chars/token for English; only used to pace against the TPM limit
+    return sum(len(t) for t in texts) // 4 + EXPECTED_OUTPUT_TOKENS
 
-            out_row = dict(row)
-            out_row["model_provider"] = "openai"
-            out_row["model_name"] = model
-            out_row["model_answer"] = answer
 
-            out.write(json.dumps(out_row, ensure_ascii=False) + "\n")
+def main() -> None:
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+    if not api_key:
+        raise SystemExit("Missing OPENAI_API_KEY in .env")
+
+    # Retries are handled here (with the rate limiter), not inside the client
+    client = OpenAI(api_key=api_key, max_retries=0)
+    limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+    tracer = start_trace("generate")
+
+    def answer(row: Dict[str, Any]) -> Dict[str, Any]:
+        user_prompt = build_user_prompt(row)
+
+        # One span per row: cache lookup, rate-limit waits, retries and the API calls
+        with tracer.span("llm_call", str(row.get("chunker")), provider="openai") as sp:
+            sp.update(count=1, bytes=text_bytes([SYSTEM_PROMPT, user_prompt]), cached=True, attempts=0, rate_wait_s=0.0)
+
+            def call():
+                sp["attempts"] += 1
+                sp["rate_wait_s"] += limiter.acquire(estimate_tokens(SYSTEM_PROMPT, user_prompt))
+                return client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=TEMPERATURE,
+                )
+
+            def generate() -> str:
+                sp["cached"] = False
+                return call_with_retries(call, RETRY).choices[0].message.content
+
+            if USE_RESPONSE_CACHE:
+                # Cache hits skip the rate limiter too
+                prompt = SYSTEM_PROMPT + "\n\n" + user_prompt
+                content = get_response_cache().cached_call("openai", model, {"temperature": TEMPERATURE}, prompt, generate)
+            else:
+                content = generate()
+            sp["out_bytes"] = text_bytes([content])
+
+        out_row = dict(row)
+        out_row["model_provider"] = "openai"
+        out_row["model_name"] = model
+        out_row["model_answer"] = content.strip()
+        return out_row
+
+    # Resume: rows already in OUT_PATH (by id + chunker) are not re-asked
+    done = load_done_keys(OUT_PATH)
+    n_rows = count_jsonl(IN_PATH)
+    skipped = 0
+    failed = 0
+
+    def todo():
+        nonlocal skipped
+        for row in iter_jsonl(IN_PATH):
+            key = row_key(row)
+            if key in done:
+                skipped += 1
+                continue
+            done.add(key)
+            yield row
+
+    # Single writer, input order preserved; failed rows are left out and retried on the next run
+    with tracer.stage_span(provider="openai", concurrency=CONCURRENCY) as stage, \
+            JsonlWriter(OUT_PATH, mode="a", batch_size=FLUSH_EVERY) as out:
+        for idx, (row, out_row, err) in enumerate(
+            run_bounded(todo(), answer, max_workers=CONCURRENCY, ordered=True), start=1
+        ):
+            stage["count"] += 1
+            if err is not None:
+                failed += 1
+                print(f"Failed {row_key(row)}: {err}")
+            else:
+                out.write(out_row)
 
             if idx % 10 == 0:
-                print(f"Processed {idx}/{len(rows)}")
+                print(f"Processed {skipped + idx}/{n_rows}")
 
-    print(f"Saved: {OUT_PATH}")
+    print(f"Saved: {OUT_PATH} (skipped existing={skipped}, failed={failed})")
+    print(f"Trace: {tracer.n_spans} spans -> {tracer.path} (run {tracer.run_id})")
+    if USE_RESPONSE_CACHE:
+        print(f"Response cache: {get_response_cache().stats()}")
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,16 @@
 from __future__ import annotations
-import json
+import sys
 from pathlib import Path
 from typing import Dict, List
 
 from datasets import load_from_disk
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.jsonl_io import write_jsonl
+from src.tracing import start_trace, text_bytes
+
 FB_PATH = Path("data/financebench")
 OUT_PATH = Path("artifacts/eval_financebench.jsonl")
 
@@ -32,12 +38,14 @@ def financebench_rows(n: int) -> List[Dict]:
     return rows
 
 def main():
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    rows = financebench_rows(N)
-
-    with OUT_PATH.open("w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    tracer = start_trace("build")
+    with tracer.stage_span() as stage:
+        with tracer.span("load", dataset="financebench") as sp:
+            rows = financebench_rows(N)
+            sp["count"], sp["bytes"] = len(rows), text_bytes(r["doc_text"] for r in rows)
+        with tracer.span("write") as sp:
+            sp["count"] = write_jsonl(OUT_PATH, rows)
+        stage["count"] = len(rows)
 
     print(f"Saved {len(rows)} rows to {OUT_PATH}")
     print("Sample:")
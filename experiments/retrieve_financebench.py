@@ -1,109 +1,175 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Dict, List, Tuple
 
 import numpy as np
-import faiss
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
 
 from src.chunker_registry import CHUNKERS
+from src.chunkers import prepare_document
+from src.embedding_cache import get_default_cache
+from src.embedding_pool import pool_stats, warm_models
+from src.index_store import INDEX_ROOT, doc_key, load_chunk_index
+from src.jsonl_io import JsonlWriter, iter_jsonl
+from src.retrieval import build_faiss_index, hits_for_row, normalize_rows, search_batch
+from src.tracing import get_tracer, start_trace, text_bytes
 
 IN_PATH = Path("artifacts/eval_financebench.jsonl")
 OUT_PATH = Path("artifacts/retrieval_financebench.jsonl")
 
 TOP_K = 5
+QUERY_BATCH_SIZE = 64
 EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Query prebuilt per-chunker indexes (python -m experiments.build_index) instead of
+# chunking + embedding every document here
+USE_PERSISTED_INDEXES = False
+# Search-time knobs for ANN persisted indexes (None = value stored in the index manifest)
+NPROBE = None
+EF_SEARCH = None
 
-def load_rows() -> List[Dict]:
-    rows = []
-    with IN_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            rows.append(json.loads(line))
-    return rows
 
-
-def build_faiss_index(vectors: np.ndarray) -> faiss.IndexFlatIP:
+def load_rows() -> Tuple[List[Dict], Dict[str, str], Dict[str, List[int]]]:
     """
-    We use cosine similarity by normalizing vectors and using inner product index.
+    Stream the eval file once.
+    FinanceBench has many questions per evidence document, so rows keep only a doc hash;
+    returns (rows, doc hash -> doc_text, doc hash -> row positions) so each unique doc is
+    held once and chunked/embedded once per chunker.
     """
-    vecs = vectors.astype("float32")
-    faiss.normalize_L2(vecs)
-    index = faiss.IndexFlatIP(vecs.shape[1])
-    index.add(vecs)
-    return index
-
-
-def retrieve_top_k(
-    query_vec: np.ndarray,
-    chunk_vecs: np.ndarray,
-    chunks: List[str],
-    k: int,
-) -> List[Tuple[int, float, str]]:
-    q = query_vec.astype("float32").reshape(1, -1)
-    faiss.normalize_L2(q)
-
-    index = build_faiss_index(chunk_vecs)
-    scores, idxs = index.search(q, k)
-
-    out = []
-    for rank, (i, s) in enumerate(zip(idxs[0].tolist(), scores[0].tolist()), start=1):
-        out.append((i, float(s), chunks[i]))
-    return out
+    rows: List[Dict] = []
+    docs: Dict[str, str] = {}
+    groups: Dict[str, List[int]] = {}
+    for i, r in enumerate(iter_jsonl(IN_PATH)):
+        doc_text = r.pop("doc_text")
+        key = doc_key(doc_text)
+        docs.setdefault(key, doc_text)
+        groups.setdefault(key, []).append(i)
+        rows.append(r)
+    return rows, docs, groups
+
+
+def make_out_row(r: Dict, chunker_name: str, top: List[Tuple[int, float, str]], n_chunks: int) -> Dict:
+    return {
+        "id": r["id"],
+        "dataset": r["dataset"],
+        "chunker": chunker_name,
+        "question": r["question"],
+        "ground_truth": r["ground_truth"],
+        "retrieved_contexts": [t[2] for t in top],
+        "retrieved_scores": [t[1] for t in top],
+        "n_chunks_total": n_chunks,
+    }
+
+
+def retrieve_per_document(
+    rows: List[Dict],
+    docs: Dict[str, str],
+    groups: Dict[str, List[int]],
+    q_vecs: np.ndarray,
+    results: Dict[Tuple[int, str], Dict],
+    cache,
+) -> None:
+    tracer = get_tracer()
+    for doc_id, row_ids in tqdm(groups.items(), desc="Retrieval (FinanceBench docs)"):
+        # Parsed once for all chunkers
+        doc = prepare_document(docs[doc_id])
+        doc_bytes = text_bytes([docs[doc_id]])
+
+        for chunker_name, chunker_fn in CHUNKERS.items():
+            # 1) chunk doc (once for all of its questions)
+            with tracer.span("chunk", chunker_name, doc=doc_id) as sp:
+                chunk_objs = chunker_fn(doc)
+                chunks = [c.text for c in chunk_objs if c.text.strip()]
+                sp["count"], sp["bytes"] = len(chunks), doc_bytes
+
+            if not chunks:
+                continue
+
+            # 2) embed chunks + build the shared index
+            # (content-addressed: unchanged chunks are read back from disk)
+            with tracer.span("embed", chunker_name, doc=doc_id) as sp:
+                misses = cache.misses
+                chunk_vecs = cache.encode(chunks, model_name=EMBED_MODEL, normalize_embeddings=False)
+                sp["count"], sp["bytes"], sp["embedded"] = len(chunks), text_bytes(chunks), cache.misses - misses
+            with tracer.span("index_build", chunker_name, doc=doc_id) as sp:
+                index = build_faiss_index(chunk_vecs)
+                sp["count"], sp["bytes"] = len(chunks), chunk_vecs.nbytes
+
+            # 3) one batched search for every question that points at this doc
+            with tracer.span("search", chunker_name, doc=doc_id) as sp:
+                scores, idxs = search_batch(index, q_vecs[row_ids], TOP_K)
+                sp["count"] = len(row_ids)
+            for j, i in enumerate(row_ids):
+                top = hits_for_row(scores[j], idxs[j], chunks)
+                results[(i, chunker_name)] = make_out_row(rows[i], chunker_name, top, len(chunks))
+
+
+def retrieve_persisted(
+    rows: List[Dict],
+    groups: Dict[str, List[int]],
+    q_vecs: np.ndarray,
+    results: Dict[Tuple[int, str], Dict],
+) -> None:
+    tracer = get_tracer()
+    for chunker_name in CHUNKERS:
+        with tracer.span("index_load", chunker_name):
+            # Queries are embedded with EMBED_MODEL; an index of another model's vectors is refused
+            store = load_chunk_index(INDEX_ROOT / chunker_name, embed_model=EMBED_MODEL)
+        for doc_id, row_ids in tqdm(groups.items(), desc=f"Retrieval ({chunker_name}, persisted)"):
+            chunks = store.doc_chunks(doc_id)
+            if not len(chunks):
+                continue
+            with tracer.span("search", chunker_name, doc=doc_id) as sp:
+                scores, idxs = store.search(q_vecs[row_ids], TOP_K, doc_id=doc_id, nprobe=NPROBE, ef_search=EF_SEARCH)
+                sp["count"] = len(row_ids)
+            for j, i in enumerate(row_ids):
+                top = hits_for_row(scores[j], idxs[j], chunks)
+                results[(i, chunker_name)] = make_out_row(rows[i], chunker_name, top, len(chunks))
 
 
 def main():
-    rows = load_rows()
-    model = SentenceTransformer(EMBED_MODEL)
-
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    with OUT_PATH.open("w", encoding="utf-8") as out_f:
-        for r in tqdm(rows, desc="Retrieval (FinanceBench)"):
-            q = r["question"]
-            doc_text = r["doc_text"]
-
-            for chunker_name, chunker_fn in CHUNKERS.items():
-                # 1) chunk doc
-                chunk_objs = chunker_fn(doc_text)
-                chunks = [c.text for c in chunk_objs if c.text.strip()]
-
-                if not chunks:
-                    continue
-
-                # 2) embed chunks + query
-                chunk_vecs = model.encode(
-                    chunks,
-                    convert_to_numpy=True,
-                    normalize_embeddings=False,
-                    show_progress_bar=False,
-                )
-                q_vec = model.encode(
-                    [q],
-                    convert_to_numpy=True,
-                    normalize_embeddings=False,
-                    show_progress_bar=False,
-                )[0]
-
-                # 3) retrieve
-                top = retrieve_top_k(q_vec, chunk_vecs, chunks, TOP_K)
-
-                out_row = {
-                    "id": r["id"],
-                    "dataset": r["dataset"],
-                    "chunker": chunker_name,
-                    "question": q,
-                    "ground_truth": r["ground_truth"],
-                    "retrieved_contexts": [t[2] for t in top],
-                    "retrieved_scores": [t[1] for t in top],
-                    "n_chunks_total": len(chunks),
-                }
-                out_f.write(json.dumps(out_row, ensure_ascii=False) + "\n")
+    # Spans (chunk / embed / index_build / search per doc and chunker) go to artifacts/traces/
+    tracer = start_trace("retrieve")
+    with tracer.stage_span() as stage:
+        rows, docs, groups = load_rows()
+        # Same model backs the semantic chunker, so this also warms chunking
+        with tracer.span("model_load"):
+            warm_models([EMBED_MODEL])
+        cache = get_default_cache()
+
+        print(f"Questions: {len(rows)} | unique documents: {len(groups)}")
+
+        # Encode every question once, in one batched pass; reused across all chunkers
+        questions = [r["question"] for r in rows]
+        with tracer.span("embed_queries") as sp:
+            q_vecs = normalize_rows(
+                cache.encode(questions, model_name=EMBED_MODEL, normalize_embeddings=False, batch_size=QUERY_BATCH_SIZE)
+            )
+            sp["count"], sp["bytes"] = len(questions), text_bytes(questions)
+
+        results: Dict[Tuple[int, str], Dict] = {}
+
+        if USE_PERSISTED_INDEXES:
+            retrieve_persisted(rows, groups, q_vecs, results)
+        else:
+            retrieve_per_document(rows, docs, groups, q_vecs, results, cache)
+
+        # Keep the original (question, chunker) output order
+        with tracer.span("write") as sp, JsonlWriter(OUT_PATH, mode="w") as out_f:
+            for i in range(len(rows)):
+                for chunker_name in CHUNKERS:
+                    out_row = results.pop((i, chunker_name), None)
+                    if out_row is not None:
+                        out_f.write(out_row)
+                        sp["count"] += 1
+        stage["count"], stage["bytes"] = len(rows), text_bytes(docs.values())
 
     print(f"Saved retrieval results to {OUT_PATH}")
+    print(f"Trace: {tracer.n_spans} spans -> {tracer.path} (run {tracer.run_id})")
+    cache.flush()
+    print(f"Embedding model pool: {pool_stats()}")
+    print(f"Embedding cache: {cache.stats()}")
     print("Next step: call LLM to generate answers using retrieved_contexts.")
 
 
@@ -0,0 +1,108 @@
+"""
+Local stand-in for the LLM endpoints, to measure generation throughput / resume
+behaviour without a real model:
+
+    python -m experiments.stub_llm_server --latency 0.2 --fail-rate 0.05
+    OLLAMA_BASE_URL=http://127.0.0.1:11500 python -m experiments.generate_answers_ollama_resume
+    OPENAI_BASE_URL=http://127.0.0.1:11500/v1 OPENAI_API_KEY=stub python -m experiments.generate_answers_openai
+
+Serves GET /api/tags, POST /api/generate (Ollama) and POST /v1/chat/completions (OpenAI).
+Each request sleeps `latency` seconds; `fail-rate` of them return 503 to exercise retries.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATS = {"requests": 0, "failed": 0}
+_LOCK = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling is visible
+    latency = 0.0
+    fail_rate = 0.0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, obj) -> None:
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send(200, {"models": [{"name": "stub"}]})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        with _LOCK:
+            STATS["requests"] += 1
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            with _LOCK:
+                STATS["failed"] += 1
+            self._send(503, {"error": "stub overloaded"})
+            return
+
+        if self.path == "/api/generate":
+            prompt = payload.get("prompt", "")
+            self._send(200, {"model": payload.get("model"), "response": f"stub answer ({len(prompt)} chars)", "done": True})
+        elif self.path == "/v1/chat/completions":
+            prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+            content = f"stub answer ({prompt_chars} chars)"
+            self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_chars // 4,
+                    "completion_tokens": len(content) // 4,
+                    "total_tokens": prompt_chars // 4 + len(content) // 4,
+                },
+            })
+        else:
+            self._send(404, {"error": "not found"})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11500)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub LLM server on http://{args.host}:{args.port} (latency={args.latency}s, fail_rate={args.fail_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Stats: {STATS}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import csv
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.embedding_cache import get_default_cache
+from src.jsonl_io import iter_jsonl
+from src.sweep import SweepDoc, expand_grid, run_sweep
+
+IN_PATH = Path("artifacts/eval_financebench.jsonl")
+OUT_CSV = Path("artifacts/chunker_sweep.csv")
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+TOP_K = 5
+# Embed each grid point's chunks instead of pooling paragraph vectors (slow; for a shortlist)
+ENCODE_CHUNKS = False
+
+# Parameters of the registry factories (make_fixed, make_layout, make_recursive_rule,
+# make_semantic_adjacent); 98 grid points
+GRID = {
+    "fixed": {"chunk_size": [500, 750, 1000, 1500, 2000], "overlap": [0, 100, 200]},
+    "layout": {"max_chars": [600, 900, 1200, 1600, 2000]},
+    "recursive_rule": {
+        "max_chars": [250, 350, 500, 700, 1000],
+        "min_chars": [100, 200, 300],
+        "overlap_chars": [0, 50],
+    },
+    "semantic_adjacent": {
+        "max_chars": [350, 600, 1000],
+        "min_chars": [100, 200],
+        "similarity_threshold": [0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9],
+    },
+}
+
+
+def load_docs() -> List[SweepDoc]:
+    """Eval rows grouped by document (FinanceBench asks many questions per evidence doc)."""
+    docs: Dict[str, SweepDoc] = {}
+    for r in iter_jsonl(IN_PATH):
+        d = docs.setdefault(r["doc_text"], SweepDoc(r["doc_text"]))
+        d.questions.append(r["question"])
+        d.answers.append(str(r.get("ground_truth") or r.get("gold_answer") or ""))
+    return list(docs.values())
+
+
+def main():
+    docs = load_docs()
+    n_points = len(expand_grid(GRID))
+    print(f"Documents: {len(docs)} | questions: {sum(len(d.questions) for d in docs)} | grid points: {n_points}")
+
+    cache = get_default_cache()
+    encode = lambda texts: cache.encode(texts, model_name=EMBED_MODEL, normalize_embeddings=True)
+
+    t0 = time.perf_counter()
+    rows = run_sweep(docs, GRID, encode, top_k=TOP_K, encode_chunks=ENCODE_CHUNKS)
+    print(f"Sweep: {time.perf_counter() - t0:.1f}s")
+    cache.flush()
+
+    OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
+    with OUT_CSV.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    param_names = sorted({p for params in GRID.values() for p in params})
+    print(f"{'chunker':<18} {'params':<58} {'chunks':>7} {'avg_chars':>9} {'hit@k':>6} {'recall@k':>8}")
+    for r in sorted(rows, key=lambda r: -r["hit_at_k"])[:15]:
+        params = ", ".join(f"{k}={r[k]}" for k in param_names if r[k] != "")
+        print(f"{r['chunker']:<18} {params:<58} {r['n_chunks']:>7} {r['avg_chunk_chars']:>9.0f} "
+              f"{r['hit_at_k']:>6.3f} {r['term_recall_at_k']:>8.3f}")
+    print(f"Saved: {OUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.tracing import DEFAULT_TRACE_PATH, PERCENTILES, STAGE_SPAN, latest_run, load_trace, summarize
+
+OUT_CSV = Path("artifacts/traces/summary.csv")
+
+# Pipeline order; stages not listed here follow in name order
+STAGE_ORDER = ["build", "retrieve", "generate", "judge"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="p50/p95/p99 latency per stage, span and chunker from a pipeline trace")
+    ap.add_argument("--trace", type=Path, default=DEFAULT_TRACE_PATH)
+    ap.add_argument("--run", nargs="*", help="run ids to include (default: the latest run)")
+    ap.add_argument("--all-runs", action="store_true", help="pool every run in the trace file")
+    ap.add_argument("--out", type=Path, default=OUT_CSV)
+    args = ap.parse_args()
+
+    if not args.trace.exists():
+        raise SystemExit(f"No trace at {args.trace} (run a pipeline stage first; TRACE=0 disables tracing)")
+
+    rows = load_trace(args.trace)
+    if not args.all_runs:
+        runs = args.run or [latest_run(rows)]
+        rows = [r for r in rows if r["run"] in runs]
+        print(f"Runs: {', '.join(str(r) for r in runs)}")
+    summary = summarize(rows)
+    if not summary:
+        raise SystemExit("No spans for the selected runs")
+
+    def order(r):
+        stage = r["stage"]
+        rank = STAGE_ORDER.index(stage) if stage in STAGE_ORDER else len(STAGE_ORDER)
+        return rank, stage, r["span"] != STAGE_SPAN, r["span"], r["chunker"]
+
+    summary.sort(key=order)
+
+    pct_cols = [f"p{p}_ms" for p in PERCENTILES]
+    header = f"{'span':<14} {'chunker':<18} {'n':>6} {'total_s':>9} " + " ".join(f"{c:>9}" for c in pct_cols)
+    header += f" {'max_ms':>9} {'count':>8} {'MB':>8} {'failed':>6} {'share':>6}"
+    stage = None
+    for r in summary:
+        if r["stage"] != stage:
+            stage = r["stage"]
+            print(f"\n== {stage} ==")
+            print(header)
+        print(
+            f"{r['span']:<14} {r['chunker']:<18} {r['n']:>6} {r['total_s']:>9.2f} "
+            + " ".join(f"{r[c]:>9.1f}" for c in pct_cols)
+            + f" {r['max_ms']:>9.1f} {r['count']:>8} {r['bytes'] / 1e6:>8.2f} {r['failed']:>6} {r['share_of_stage']:>6.2f}"
+        )
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with args.out.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0].keys()))
+        writer.writeheader()
+        writer.writerows(summary)
+    print(f"\nSaved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
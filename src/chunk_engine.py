@@ -0,0 +1,143 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src.chunkers import Chunk, ChunkSpans
+from src.gen_runner import run_bounded
+
+# (first doc index, chunker name, texts)
+WorkUnit = Tuple[int, str, List[str]]
+
+DEFAULT_WORKERS = int(os.getenv("CHUNK_WORKERS", str(os.cpu_count() or 1)))
+# Chunked in this process unless n_workers is given: the semantic chunker is bound by
+# embedding, which already batches across documents and reuses the shared embedding cache
+IN_PROCESS_CHUNKERS = {"semantic_adjacent"}
+
+_WORKER_FNS: Dict[str, Callable[[List[str]], List[ChunkSpans]]] = {}
+
+
+def _from_chunk_lists(
+    texts: List[str], chunk_texts: Callable[[List[str]], List[List[Chunk]]], chunker: str
+) -> List[ChunkSpans]:
+    # Offsets index the chunks' own source, which is the newline-normalized text for some chunkers
+    return [ChunkSpans.from_chunks(cs[0].source if cs else t, cs, chunker) for t, cs in zip(texts, chunk_texts(texts))]
+
+
+def _batch_fns(use_cache: bool) -> Dict[str, Callable[[List[str]], List[ChunkSpans]]]:
+    """Per-chunker functions mapping a list of texts to one ChunkSpans per text."""
+    from src.chunker_registry import CHUNKERS, SPAN_CHUNKERS, make_semantic_adjacent_many
+
+    fns: Dict[str, Callable[[List[str]], List[ChunkSpans]]] = {}
+    for name, fn in CHUNKERS.items():
+        if name in SPAN_CHUNKERS:
+            span_fn = SPAN_CHUNKERS[name]
+            fns[name] = lambda texts, f=span_fn: [f(t) for t in texts]
+        elif name == "semantic_adjacent":
+            many = make_semantic_adjacent_many(use_cache=use_cache)
+            fns[name] = lambda texts, f=many, n=name: _from_chunk_lists(texts, f, n)
+        else:
+            fns[name] = lambda texts, f=fn, n=name: _from_chunk_lists(texts, lambda ts: [f(t) for t in ts], n)
+    return fns
+
+
+def _init_worker(chunker_names: Sequence[str]) -> None:
+    """
+    Runs once per worker process: imports the chunkers (compiles their regexes) and,
+    for the semantic chunker, loads the embedding model single-threaded.
+    Workers share nothing: the semantic chunker embeds without the on-disk cache,
+    which is not safe for concurrent writers.
+    """
+    global _WORKER_FNS
+    _WORKER_FNS = _batch_fns(use_cache=False)
+    if "semantic_adjacent" in chunker_names:
+        import torch
+
+        from src.embedding_pool import DEFAULT_MODEL, warm_models
+
+        torch.set_num_threads(1)
+        warm_models([DEFAULT_MODEL])
+
+
+def _chunk_unit(unit: WorkUnit) -> List[ChunkSpans]:
+    _, name, texts = unit
+    out = _WORKER_FNS[name](texts)
+    # The parent already holds the texts; only ship a source back when the chunker changed it
+    for t, cs in zip(texts, out):
+        if cs.source is t:
+            cs.source = None
+    return out
+
+
+def _work_units(
+    texts: Iterable[str],
+    chunker_name: str,
+    max_docs: int,
+    max_chars: int,
+) -> Iterator[WorkUnit]:
+    batch: List[str] = []
+    size = 0
+    start = 0
+    for i, t in enumerate(texts):
+        if not batch:
+            start = i
+        batch.append(t)
+        size += len(t)
+        if len(batch) >= max_docs or size >= max_chars:
+            yield start, chunker_name, batch
+            batch, size = [], 0
+    if batch:
+        yield start, chunker_name, batch
+
+
+def chunk_corpus(
+    texts: Iterable[str],
+    chunker_name: str,
+    n_workers: Optional[int] = None,
+    ordered: bool = True,
+    max_docs: int = 32,
+    max_chars: int = 2_000_000,
+) -> Iterator[Tuple[int, ChunkSpans]]:
+    """
+    Chunk many documents with one registry chunker, yielding (doc index, ChunkSpans).
+    - Documents are grouped into work units of <= max_docs docs / ~max_chars chars
+      and fanned out over n_workers processes (spawned, initialized once each)
+    - ordered=True yields in input order; otherwise in completion order
+    - n_workers=0 chunks in this process with the registry defaults (semantic
+      chunking then goes through the shared embedding cache); n_workers=None uses
+      CHUNK_WORKERS processes, or 0 for IN_PROCESS_CHUNKERS
+    Use ChunkSpans.to_chunks() where Chunk objects are needed.
+    """
+    if n_workers is None:
+        n_workers = 0 if chunker_name in IN_PROCESS_CHUNKERS else DEFAULT_WORKERS
+    units = _work_units(texts, chunker_name, max_docs, max_chars)
+
+    if n_workers <= 0:
+        fn = _batch_fns(use_cache=True)[chunker_name]
+        for start, _, batch in units:
+            for j, cs in enumerate(fn(batch)):
+                yield start + j, cs
+        return
+
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=n_workers, mp_context=ctx, initializer=_init_worker, initargs=([chunker_name],)
+    ) as pool:
+        for (start, _, batch), result, err in run_bounded(
+            units, _chunk_unit, max_workers=n_workers, ordered=ordered, pool=pool
+        ):
+            if err is not None:
+                raise err
+            for j, (t, cs) in enumerate(zip(batch, result)):
+                if cs.source is None:
+                    cs.source = t
+                yield start + j, cs
+
+
+def chunk_corpus_list(texts: Sequence[str], chunker_name: str, **kwargs) -> List[ChunkSpans]:
+    """All documents' ChunkSpans in input order."""
+    out: List[Optional[ChunkSpans]] = [None] * len(texts)
+    for i, cs in chunk_corpus(texts, chunker_name, **kwargs):
+        out[i] = cs
+    return out
@@ -1,32 +1,66 @@
 from __future__ import annotations
-from typing import Callable, Dict, List
+from typing import Callable, Dict, Iterable, Iterator, List
 
-from src.chunkers import Chunk, chunk_fixed_chars, chunk_by_layout_breaks
-from src.chunkers_recursive import chunk_recursive, split_sentences_rule
-from src.chunkers_semantic import chunk_semantic_adjacent
+from src.chunkers import (
+    Chunk,
+    ChunkSpans,
+    TextStream,
+    chunk_fixed_chars,
+    chunk_by_layout_breaks,
+    fixed_char_spans,
+    fixed_token_spans,
+    iter_fixed_chars,
+    iter_layout_breaks,
+    layout_break_spans,
+    layout_break_token_spans,
+)
+from src.chunkers_recursive import (
+    chunk_recursive,
+    iter_recursive,
+    recursive_spans,
+    recursive_token_spans,
+    split_sentences_rule,
+)
+from src.chunkers_semantic import chunk_semantic_adjacent, chunk_semantic_adjacent_many, chunk_semantic_adjacent_tokens
+from src.embedding_cache import get_default_cache
+from src.token_counter import MODEL_MAX_TOKENS, SPECIAL_TOKENS
 
 ChunkerFn = Callable[[str], List[Chunk]]
+BatchChunkerFn = Callable[[Iterable[str]], List[List[Chunk]]]
+SpanChunkerFn = Callable[[str], ChunkSpans]
+StreamChunkerFn = Callable[[TextStream], Iterator[Chunk]]
 
 # 1) Size-based baseline
-def make_fixed(chunk_size: int = 1000, overlap: int = 200) -> ChunkerFn:
-    return lambda text: chunk_fixed_chars(
+def make_fixed(chunk_size: int = 1000, overlap: int = 200, as_spans: bool = False, as_stream: bool = False) -> ChunkerFn:
+    fn = iter_fixed_chars if as_stream else fixed_char_spans if as_spans else chunk_fixed_chars
+    return lambda text: fn(
         text,
         chunk_size=chunk_size,
         overlap=overlap,
     )
 
 # 2) Layout-based
-def make_layout(max_chars: int = 1200) -> ChunkerFn:
-    return lambda text: chunk_by_layout_breaks(
+def make_layout(max_chars: int = 1200, as_spans: bool = False, as_stream: bool = False) -> ChunkerFn:
+    fn = iter_layout_breaks if as_stream else layout_break_spans if as_spans else chunk_by_layout_breaks
+    return lambda text: fn(
         text,
         max_chars=max_chars,
     )
 
 # 3) Recursive rule-based
-def make_recursive_rule(max_chars: int = 350) -> ChunkerFn:
-    return lambda text: chunk_recursive(
+def make_recursive_rule(
+    max_chars: int = 350,
+    min_chars: int = 300,
+    overlap_chars: int = 0,
+    as_spans: bool = False,
+    as_stream: bool = False,
+) -> ChunkerFn:
+    fn = iter_recursive if as_stream else recursive_spans if as_spans else chunk_recursive
+    return lambda text: fn(
         text,
         max_chars=max_chars,
+        min_chars=min_chars,
+        overlap_chars=overlap_chars,
         sentence_splitter=split_sentences_rule,
     )
 
@@ -35,12 +69,77 @@ def make_semantic_adjacent(
     max_chars: int = 350,
     min_chars: int = 200,
     similarity_threshold: float = 0.65,
+    use_cache: bool = True,
+    mode: str = "vectorized",
 ) -> ChunkerFn:
+    # Paragraph embeddings go through the shared on-disk cache, so re-runs skip the model.
+    # mode="vectorized" chunks differently from the original running-mean merge;
+    # use mode="sequential" to compare against results produced before it was the default.
     return lambda text: chunk_semantic_adjacent(
         text,
         max_chars=max_chars,
         min_chars=min_chars,
         similarity_threshold=similarity_threshold,
+        cache=get_default_cache() if use_cache else None,
+        mode=mode,
+    )
+
+# 4b) Semantic adjacent over many documents (paragraph embeddings pooled across docs)
+def make_semantic_adjacent_many(
+    max_chars: int = 350,
+    min_chars: int = 200,
+    similarity_threshold: float = 0.65,
+    use_cache: bool = True,
+    mode: str = "vectorized",
+) -> BatchChunkerFn:
+    return lambda texts: chunk_semantic_adjacent_many(
+        texts,
+        max_chars=max_chars,
+        min_chars=min_chars,
+        similarity_threshold=similarity_threshold,
+        cache=get_default_cache() if use_cache else None,
+        mode=mode,
+    )
+
+# 5) Token-budgeted variants: sizes in tokens of the embedding model's tokenizer (loaded on
+# first call), counted per unit through the shared TokenCounter cache. Fixed / layout fill
+# the model window (MODEL_MAX_TOKENS incl. special tokens); recursive / semantic stay near
+# the char defaults' chunk size.
+def make_fixed_tokens(
+    chunk_tokens: int = MODEL_MAX_TOKENS - SPECIAL_TOKENS, overlap_tokens: int = 50, as_spans: bool = False
+) -> ChunkerFn:
+    fn = lambda text: fixed_token_spans(text, chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+    return fn if as_spans else lambda text: fn(text).to_chunks()
+
+
+def make_layout_tokens(max_tokens: int = MODEL_MAX_TOKENS - SPECIAL_TOKENS, as_spans: bool = False) -> ChunkerFn:
+    fn = lambda text: layout_break_token_spans(text, max_tokens=max_tokens)
+    return fn if as_spans else lambda text: fn(text).to_chunks()
+
+
+def make_recursive_rule_tokens(max_tokens: int = 96, as_spans: bool = False) -> ChunkerFn:
+    fn = lambda text: recursive_token_spans(
+        text,
+        max_tokens=max_tokens,
+        sentence_splitter=split_sentences_rule,
+    )
+    return fn if as_spans else lambda text: fn(text).to_chunks()
+
+
+def make_semantic_adjacent_tokens(
+    max_tokens: int = 96,
+    min_tokens: int = 48,
+    similarity_threshold: float = 0.65,
+    use_cache: bool = True,
+    mode: str = "vectorized",
+) -> ChunkerFn:
+    return lambda text: chunk_semantic_adjacent_tokens(
+        text,
+        max_tokens=max_tokens,
+        min_tokens=min_tokens,
+        similarity_threshold=similarity_threshold,
+        cache=get_default_cache() if use_cache else None,
+        mode=mode,
     )
 
 CHUNKERS: Dict[str, ChunkerFn] = {
@@ -49,3 +148,40 @@ CHUNKERS: Dict[str, ChunkerFn] = {
     "recursive_rule": make_recursive_rule(),
     "semantic_adjacent": make_semantic_adjacent(),
 }
+
+# Span-array output (ChunkSpans: offsets + rules, texts materialized on demand); same chunks as CHUNKERS
+SPAN_CHUNKERS: Dict[str, SpanChunkerFn] = {
+    "fixed": make_fixed(as_spans=True),
+    "layout": make_layout(as_spans=True),
+    "recursive_rule": make_recursive_rule(as_spans=True),
+}
+
+# Streaming variants: take a text file / iterator of pages and yield the same chunks
+# incrementally (chunks own their text; offsets are into the whole stream)
+STREAM_CHUNKERS: Dict[str, StreamChunkerFn] = {
+    "fixed": make_fixed(as_stream=True),
+    "layout": make_layout(as_stream=True),
+    "recursive_rule": make_recursive_rule(as_stream=True),
+}
+
+# Token-budgeted counterparts of CHUNKERS (chunk sizes in model tokens)
+TOKEN_CHUNKERS: Dict[str, ChunkerFn] = {
+    "fixed": make_fixed_tokens(),
+    "layout": make_layout_tokens(),
+    "recursive_rule": make_recursive_rule_tokens(),
+    "semantic_adjacent": make_semantic_adjacent_tokens(),
+}
+
+# Corpus-level variants; same output as mapping the CHUNKERS entry over the texts
+BATCH_CHUNKERS: Dict[str, BatchChunkerFn] = {
+    "semantic_adjacent": make_semantic_adjacent_many(),
+}
+
+
+def chunk_many(chunker_name: str, texts: Iterable[str]) -> List[List[Chunk]]:
+    """Chunk a list of documents, using the batched variant when the chunker has one."""
+    batch_fn = BATCH_CHUNKERS.get(chunker_name)
+    if batch_fn is not None:
+        return batch_fn(texts)
+    fn = CHUNKERS[chunker_name]
+    return [fn(t) for t in texts]
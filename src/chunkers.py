@@ -1,44 +1,567 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import re
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from src.token_counter import TokenCounter
+
+# How Chunk.text is rebuilt from source[start:end] (low bits of Chunk.flags)
+TEXT_SLICE = 0       # exact slice
+TEXT_PARAGRAPHS = 1  # paragraphs stripped and re-joined with "\n\n"
+TEXT_LAYOUT = 2      # layout blocks (blank lines / headers) re-joined with "\n\n"
+TEXT_COLLAPSED = 3   # whitespace runs collapsed to one space (sentence packing)
+TEXT_LINES = 4       # non-empty lines stripped and joined with " " (table line packing)
+TEXT_OWNED = 7       # no rule reproduces the text; the chunk keeps its own copy
+TEXT_MODE_MASK = 0b111
+
+_PARA_SPLIT_RE = re.compile(r"\n\s*\n+")
+_SECTION_BREAK_RE = re.compile(r"\n\s*\n+|\n(?=[A-Z][A-Z \t&/-]{3,}\n)")
+_NONSPACE_RE = re.compile(r"\S")
+_LINE_END_RE = re.compile(r"[ \t]*\n")
+
+# Streaming input: a whole string, a text file object (read in blocks) or an iterator of pages
+TextStream = Union[str, TextIO, Iterable[str]]
+STREAM_READ_CHARS = 1 << 20
+
+
+def _materialize(source: str, start: int, end: int, mode: int) -> str:
+    span = source[start:end]
+    if mode == TEXT_SLICE:
+        return span
+    if mode == TEXT_PARAGRAPHS:
+        return "\n\n".join(p.strip() for p in _PARA_SPLIT_RE.split(span) if p.strip())
+    if mode == TEXT_LAYOUT:
+        # A trailing header block is only split off if its line ends in "\n" (and the
+        # document continues, since layout chunking strips the text first)
+        m = _LINE_END_RE.match(source, end)
+        if m is not None and _NONSPACE_RE.search(source, m.end()) is not None:
+            span += m.group()
+        return "\n\n".join(b.strip() for b in _SECTION_BREAK_RE.split(span) if b and b.strip())
+    if mode == TEXT_COLLAPSED:
+        return " ".join(span.split())
+    if mode == TEXT_LINES:
+        return " ".join(ln.strip() for ln in span.splitlines() if ln.strip())
+    raise ValueError(f"Unknown text mode: {mode}")
+
 
-@dataclass
 class Chunk:
-    text: str
-    start: int | None = None
-    end: int | None = None
+    """
+    One chunk of a source document, shared by every chunker.
+    - start / end: character span in `source` (-1 if the chunk could not be located)
+    - chunker: name of the chunker that produced it
+    - flags: TEXT_* mode saying how `text` is rebuilt from the span
+    - doc_id: optional caller-side document id
+    `text` is materialized on access; only TEXT_OWNED chunks hold a string of their own,
+    so holding many chunks costs a few pointers each plus the (shared) documents.
+    """
+
+    __slots__ = ("source", "start", "end", "chunker", "flags", "doc_id", "_text")
+
+    def __init__(
+        self,
+        source: str,
+        start: int,
+        end: int,
+        chunker: str = "",
+        flags: int = TEXT_SLICE,
+        doc_id: Optional[str] = None,
+        text: Optional[str] = None,
+    ):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.chunker = chunker
+        self.flags = TEXT_OWNED if text is not None else flags
+        self.doc_id = doc_id
+        self._text = text
+
+    @classmethod
+    def from_text(cls, source: str, start: int, end: int, text: str, chunker: str = "") -> "Chunk":
+        """Pick the first TEXT_* rule that rebuilds `text` from the span, else keep a copy."""
+        if start >= 0:
+            for mode in (TEXT_SLICE, TEXT_PARAGRAPHS, TEXT_LAYOUT, TEXT_COLLAPSED, TEXT_LINES):
+                if _materialize(source, start, end, mode) == text:
+                    return cls(source, start, end, chunker, mode)
+        return cls(source, start, end, chunker, text=text)
+
+    @property
+    def text(self) -> str:
+        if self._text is not None:
+            return self._text
+        return _materialize(self.source, self.start, self.end, self.flags & TEXT_MODE_MASK)
 
-def chunk_fixed_chars(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[Chunk]:
+    @property
+    def meta(self) -> dict:
+        return {"chunker": self.chunker}
+
+    def __repr__(self) -> str:
+        return f"Chunk(chunker={self.chunker!r}, start={self.start}, end={self.end}, flags={self.flags})"
+
+
+def locate_spans(doc_text: str, chunk_texts: Sequence[str]) -> List[Tuple[int, int]]:
     """
-    Baseline #1: Fixed-size character windows with overlap.
-    - chunk_size: how big each chunk is (in characters)
-    - overlap: how many characters repeat between adjacent chunks
-    Why overlap exists: prevents cutting important context at chunk boundaries.
+    (start, end) of each chunk in doc_text, matching whitespace loosely
+    (chunkers re-join units with "\\n\\n" or " "). Chunks are searched in order;
+    (-1, -1) if a chunk can't be found (e.g. overlap prefixes).
+    """
+    spans: List[Tuple[int, int]] = []
+    cursor = 0
+    for t in chunk_texts:
+        tokens = t.split()
+        if not tokens:
+            spans.append((-1, -1))
+            continue
+        pat = re.compile(r"\s+".join(re.escape(tok) for tok in tokens))
+        m = pat.search(doc_text, cursor) or pat.search(doc_text)
+        if m is None:
+            spans.append((-1, -1))
+            continue
+        spans.append((m.start(), m.end()))
+        cursor = m.start() + 1
+    return spans
+
+
+def chunks_from_texts(source: str, texts: Sequence[str], chunker: str) -> List[Chunk]:
+    """Wrap chunk strings built by a chunker as span-backed Chunks over `source`."""
+    return [Chunk.from_text(source, s, e, t, chunker) for (s, e), t in zip(locate_spans(source, texts), texts)]
+
+
+def _strip_span(source: str, lo: int, hi: int) -> Optional[Tuple[int, int]]:
+    """Span of source[lo:hi].strip(), without copying the piece (None if blank)."""
+    m = _NONSPACE_RE.search(source, lo, hi)
+    if m is None:
+        return None
+    end = hi
+    while source[end - 1].isspace():
+        end -= 1
+    return m.start(), end
+
+
+def _split_spans(source: str, pattern: re.Pattern, lo: int, hi: int) -> Iterator[Tuple[int, int]]:
+    """Stripped, non-blank pieces of pattern.split(source[lo:hi]), as spans."""
+    pos = lo
+    for m in pattern.finditer(source, lo, hi):
+        span = _strip_span(source, pos, m.start())
+        if span is not None:
+            yield span
+        pos = m.end()
+    span = _strip_span(source, pos, hi)
+    if span is not None:
+        yield span
+
+
+@dataclass
+class ChunkSpans:
     """
-    text = text or ""
+    Chunker output as arrays over one source text (no chunk strings):
+    - spans:   (n, 2) int64 start/end offsets
+    - flags:   (n,) uint8 TEXT_* rule per chunk
+    - lengths: (n,) int64 length of each chunk's text
+    - owned:   text of the few TEXT_OWNED chunks, by row
+    Use text(i) / texts(ids) to materialize only the chunks that are needed (e.g. hits).
+    """
+
+    source: str
+    chunker: str
+    spans: np.ndarray
+    flags: np.ndarray
+    lengths: np.ndarray
+    owned: Dict[int, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_chunks(cls, source: str, chunks: Sequence[Chunk], chunker: str) -> "ChunkSpans":
+        out = _SpanBuilder()
+        for c in chunks:
+            out.add(c.start, c.end, c.flags, len(c.text), c._text)
+        return out.build(source, chunker)
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def text(self, i: int) -> str:
+        if self.flags[i] == TEXT_OWNED:
+            return self.owned[int(i) % len(self)]
+        start, end = self.spans[i]
+        return _materialize(self.source, int(start), int(end), int(self.flags[i]))
+
+    def texts(self, ids: Optional[Sequence[int]] = None) -> List[str]:
+        if ids is None:
+            ids = range(len(self))
+        return [self.text(i) for i in ids]
+
+    def chunk(self, i: int) -> Chunk:
+        start, end = (int(x) for x in self.spans[i])
+        if self.flags[i] == TEXT_OWNED:
+            return Chunk(self.source, start, end, self.chunker, text=self.owned[int(i) % len(self)])
+        return Chunk(self.source, start, end, self.chunker, int(self.flags[i]))
+
+    def to_chunks(self) -> List[Chunk]:
+        out: List[Chunk] = []
+        for i, ((start, end), flags) in enumerate(zip(self.spans.tolist(), self.flags.tolist())):
+            if flags == TEXT_OWNED:
+                out.append(Chunk(self.source, start, end, self.chunker, text=self.owned[i]))
+            else:
+                out.append(Chunk(self.source, start, end, self.chunker, flags))
+        return out
+
+
+class _SpanBuilder:
+    def __init__(self):
+        self.rows: List[Tuple[int, int, int, int]] = []
+        self.owned: Dict[int, str] = {}
+
+    def add(self, start: int, end: int, flags: int, length: int, text: Optional[str] = None) -> None:
+        if text is not None:
+            self.owned[len(self.rows)] = text
+            flags = TEXT_OWNED
+        self.rows.append((start, end, flags, length))
+
+    def build(self, source: str, chunker: str) -> ChunkSpans:
+        arr = np.array(self.rows, dtype=np.int64).reshape(-1, 4)
+        return ChunkSpans(
+            source=source,
+            chunker=chunker,
+            spans=np.ascontiguousarray(arr[:, :2]),
+            flags=arr[:, 2].astype(np.uint8),
+            lengths=np.ascontiguousarray(arr[:, 3]),
+            owned=self.owned,
+        )
+
+
+class PreparedDocument:
+    """
+    One parse of a document, shared by every chunker (all of them accept it in place of the text):
+    - text: the document as given (fixed and layout chunk it as is)
+    - source: text with \r\n / \r normalized to \n (recursive / semantic offsets index it)
+    - paragraphs: stripped paragraph spans in source (blank-line breaks)
+    - blocks: stripped layout block spans in text (blank lines / ALL-CAPS header lines)
+    - table_lines(i): line spans of paragraph i if it is table-like, else None
+    Each part is computed on first use and kept, so running all chunkers over one
+    PreparedDocument parses it once and leaves them only their packing passes.
+    """
+
+    def __init__(self, text: str):
+        self.text = text or ""
+        self._source: Optional[str] = None
+        self._paragraphs: Optional[List[Tuple[int, int]]] = None
+        self._blocks: Optional[List[Tuple[int, int]]] = None
+        self._tables: Dict[int, Optional[List[Tuple[int, int]]]] = {}
+        self._sentences: Dict[int, list] = {}  # split_sentences_rule units per paragraph (chunkers_recursive)
+
+    @property
+    def source(self) -> str:
+        if self._source is None:
+            t = self.text
+            self._source = t.replace("\r\n", "\n").replace("\r", "\n") if "\r" in t else t
+        return self._source
+
+    @property
+    def paragraphs(self) -> List[Tuple[int, int]]:
+        if self._paragraphs is None:
+            bounds = _strip_span(self.source, 0, len(self.source))
+            self._paragraphs = [] if bounds is None else list(_split_spans(self.source, _PARA_SPLIT_RE, *bounds))
+        return self._paragraphs
+
+    @property
+    def blocks(self) -> List[Tuple[int, int]]:
+        if self._blocks is None:
+            self._blocks = _layout_blocks(self.text)
+        return self._blocks
+
+    def table_lines(self, i: int) -> Optional[List[Tuple[int, int]]]:
+        if i not in self._tables:
+            from src.chunkers_recursive import _table_lines
+
+            self._tables[i] = _table_lines(self.source, *self.paragraphs[i])
+        return self._tables[i]
+
+
+DocumentInput = Union[str, PreparedDocument]
+
+
+def prepare_document(text: DocumentInput) -> PreparedDocument:
+    """The PreparedDocument for text (text itself if it already is one)."""
+    return text if isinstance(text, PreparedDocument) else PreparedDocument(text)
+
+
+def fixed_char_spans(text: DocumentInput, chunk_size: int = 1000, overlap: int = 200) -> ChunkSpans:
+    """chunk_fixed_chars as spans: each window, stripped, is an exact slice."""
+    text = prepare_document(text).text
     if chunk_size <= 0:
         raise ValueError("chunk_size must be > 0")
     if overlap < 0 or overlap >= chunk_size:
         raise ValueError("overlap must be >= 0 and < chunk_size")
 
-    chunks: List[Chunk] = []
-    i = 0
+    out = _SpanBuilder()
     n = len(text)
     step = chunk_size - overlap
+    for i in range(0, n, step):
+        span = _strip_span(text, i, min(i + chunk_size, n))
+        if span is not None:
+            out.add(span[0], span[1], TEXT_SLICE, span[1] - span[0])
+    return out.build(text, "fixed")
 
-    while i < n:
-        j = min(i + chunk_size, n)
-        chunk_text = text[i:j].strip()
-        if chunk_text:
-            chunks.append(Chunk(text=chunk_text, start=i, end=j))
-        i += step
 
-    return chunks
+def _pack_blocks(
+    source: str,
+    blocks: List[Tuple[int, int]],
+    sizes: Sequence[int],
+    limit: int,
+    sep: int,
+    chunker: str,
+) -> ChunkSpans:
+    """Merge consecutive blocks while their sizes (plus sep per join) stay within limit."""
+    out = _SpanBuilder()
+    first = 0
+    buf_size = buf_chars = 0
 
-_SECTION_BREAK_RE = re.compile(r"\n\s*\n+|\n(?=[A-Z][A-Z \t&/-]{3,}\n)")
+    def flush(last: int) -> None:
+        # A single block is an exact slice; merged blocks are re-joined with "\n\n"
+        out.add(blocks[first][0], blocks[last][1], TEXT_SLICE if first == last else TEXT_LAYOUT, buf_chars)
 
-def chunk_by_layout_breaks(text: str, max_chars: int = 1200) -> List[Chunk]:
+    for i, ((s, e), size) in enumerate(zip(blocks, sizes)):
+        if i == first:
+            buf_size, buf_chars = size, e - s
+        elif buf_size + sep + size <= limit:
+            buf_size += sep + size
+            buf_chars += 2 + e - s
+        else:
+            flush(i - 1)
+            first, buf_size, buf_chars = i, size, e - s
+    if blocks:
+        flush(len(blocks) - 1)
+
+    return out.build(source, chunker)
+
+
+def _layout_blocks(source: str) -> List[Tuple[int, int]]:
+    bounds = _strip_span(source, 0, len(source))
+    if bounds is None:
+        return []
+    return list(_split_spans(source, _SECTION_BREAK_RE, bounds[0], bounds[1]))
+
+
+def layout_break_spans(text: DocumentInput, max_chars: int = 1200) -> ChunkSpans:
+    """chunk_by_layout_breaks as spans: blocks are located in place and merged by length."""
+    doc = prepare_document(text)
+    blocks = doc.blocks
+    return _pack_blocks(doc.text, blocks, [e - s for s, e in blocks], max_chars, 2, "layout")
+
+
+def layout_break_token_spans(
+    text: DocumentInput, max_tokens: int = 254, counter: Optional["TokenCounter"] = None
+) -> ChunkSpans:
+    """layout_break_spans with a token budget: block counts come from the (cached) counter, joins are free."""
+    from src.token_counter import get_token_counter
+
+    counter = counter or get_token_counter()
+    doc = prepare_document(text)
+    blocks = doc.blocks
+    sizes = counter.count_many([doc.text[s:e] for s, e in blocks])
+    return _pack_blocks(doc.text, blocks, sizes, max_tokens, 0, "layout")
+
+
+def fixed_token_spans(
+    text: DocumentInput,
+    chunk_tokens: int = 254,
+    overlap_tokens: int = 50,
+    counter: Optional["TokenCounter"] = None,
+) -> ChunkSpans:
+    """fixed_char_spans over tokens: windows of chunk_tokens tokens, sliced from first to last token."""
+    from src.token_counter import get_token_counter
+
+    if chunk_tokens <= 0:
+        raise ValueError("chunk_tokens must be > 0")
+    if overlap_tokens < 0 or overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be >= 0 and < chunk_tokens")
+
+    counter = counter or get_token_counter()
+    text = prepare_document(text).text
+    tokens = counter.spans(text)
+    out = _SpanBuilder()
+    n = len(tokens)
+    for i in range(0, n, chunk_tokens - overlap_tokens):
+        start, end = tokens[i][0], tokens[min(i + chunk_tokens, n) - 1][1]
+        out.add(start, end, TEXT_SLICE, end - start)
+    return out.build(text, "fixed")
+
+
+def _iter_pieces(stream: TextStream, read_chars: int = STREAM_READ_CHARS) -> Iterator[str]:
+    if isinstance(stream, str):
+        yield stream
+        return
+    read = getattr(stream, "read", None)
+    if read is not None:
+        while True:
+            piece = read(read_chars)
+            if not piece:
+                return
+            yield piece
+    for piece in stream:
+        if piece:
+            yield piece
+
+
+def _normalize_newlines(pieces: Iterable[str]) -> Iterator[str]:
+    """\r\n / \r -> \n across piece boundaries (a trailing \r waits for the next piece)."""
+    carry = ""
+    for piece in pieces:
+        piece = carry + piece
+        carry = ""
+        if piece.endswith("\r"):
+            piece, carry = piece[:-1], "\r"
+        if "\r" in piece:
+            piece = piece.replace("\r\n", "\n").replace("\r", "\n")
+        if piece:
+            yield piece
+    if carry:
+        yield "\n"
+
+
+def _iter_regions(pieces: Iterable[str], min_chars: int = 1 << 16) -> Iterator[Tuple[int, str, bool]]:
+    """
+    (offset, region, is_last) pieces of a text stream, cut at the first non-space after a
+    blank-line break. Breaks (paragraph and section) never cross such a cut, so splitting
+    each region gives the same blocks as splitting the whole text. Memory is bounded by the
+    longest stretch without a blank line (plus min_chars of read-ahead).
+    """
+    buf = ""
+    base = 0
+    scan_from = 0
+    pending: List[str] = []
+    n_pending = 0
+
+    def cut_point() -> int:
+        last = prev = -1
+        for m in _PARA_SPLIT_RE.finditer(buf, scan_from):
+            prev, last = last, m.end()
+        # Only the last break can still grow (or lack text after it)
+        for pos in (last, prev):
+            if pos >= 0:
+                m = _NONSPACE_RE.search(buf, pos)
+                if m is not None:
+                    return m.start()
+        return -1
+
+    def feed() -> Iterator[Tuple[int, str, bool]]:
+        nonlocal buf, base, scan_from, pending, n_pending
+        buf += "".join(pending)
+        pending, n_pending = [], 0
+        cut = cut_point()
+        if cut > 0:
+            yield base, buf[:cut], False
+            base += cut
+            buf = buf[cut:]
+        # Rescan only the trailing whitespace run, where a break may still be forming
+        scan_from = len(buf)
+        while scan_from > 0 and buf[scan_from - 1].isspace():
+            scan_from -= 1
+
+    for piece in pieces:
+        pending.append(piece)
+        n_pending += len(piece)
+        if n_pending >= min_chars:
+            yield from feed()
+    if pending:
+        yield from feed()
+    if buf:
+        yield base, buf, True
+
+
+def iter_fixed_chars(
+    stream: TextStream,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    read_chars: int = STREAM_READ_CHARS,
+) -> Iterator[Chunk]:
+    """
+    chunk_fixed_chars over a text stream, holding one read block plus one window.
+    Chunks own their text; start/end are offsets in the whole stream (source is empty).
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be > 0")
+    if overlap < 0 or overlap >= chunk_size:
+        raise ValueError("overlap must be >= 0 and < chunk_size")
+
+    step = chunk_size - overlap
+    buf = ""   # text from offset base on; base is the next window start
+    base = 0
+
+    def window(pos: int) -> Optional[Chunk]:
+        span = _strip_span(buf, pos, min(pos + chunk_size, len(buf)))
+        if span is None:
+            return None
+        return Chunk("", base + span[0], base + span[1], "fixed", text=buf[span[0] : span[1]])
+
+    for piece in _iter_pieces(stream, read_chars):
+        buf += piece
+        pos = 0
+        while len(buf) - pos >= chunk_size:
+            c = window(pos)
+            if c is not None:
+                yield c
+            pos += step
+        buf = buf[pos:]
+        base += pos
+
+    pos = 0
+    while pos < len(buf):
+        c = window(pos)
+        if c is not None:
+            yield c
+        pos += step
+
+
+def iter_layout_breaks(
+    stream: TextStream,
+    max_chars: int = 1200,
+    read_chars: int = STREAM_READ_CHARS,
+) -> Iterator[Chunk]:
+    """
+    chunk_by_layout_breaks over a text stream, one blank-line-delimited region at a time.
+    Chunks own their text; start/end are offsets in the whole stream (source is empty).
+    """
+    buf: List[Tuple[int, int, str]] = []
+    buf_len = 0
+
+    def flush() -> Chunk:
+        return Chunk("", buf[0][0], buf[-1][1], "layout", text="\n\n".join(t for _, _, t in buf))
+
+    for base, region, is_last in _iter_regions(_iter_pieces(stream, read_chars)):
+        hi = len(region)
+        if is_last:
+            # The batch chunker strips the document first (a final header line has no "\n")
+            span = _strip_span(region, 0, hi)
+            if span is None:
+                break
+            hi = span[1]
+        for s, e in _split_spans(region, _SECTION_BREAK_RE, 0, hi):
+            b = (base + s, base + e, region[s:e])
+            if not buf:
+                buf, buf_len = [b], e - s
+            elif buf_len + 2 + (e - s) <= max_chars:
+                buf.append(b)
+                buf_len += 2 + (e - s)
+            else:
+                yield flush()
+                buf, buf_len = [b], e - s
+    if buf:
+        yield flush()
+
+
+def chunk_fixed_chars(text: DocumentInput, chunk_size: int = 1000, overlap: int = 200) -> List[Chunk]:
+    """
+    Baseline #1: Fixed-size character windows with overlap.
+    - chunk_size: how big each chunk is (in characters)
+    - overlap: how many characters repeat between adjacent chunks
+    Why overlap exists: prevents cutting important context at chunk boundaries.
+    """
+    return fixed_char_spans(text, chunk_size=chunk_size, overlap=overlap).to_chunks()
+
+def chunk_by_layout_breaks(text: DocumentInput, max_chars: int = 1200) -> List[Chunk]:
     """
     Baseline #2: Layout/structure-ish chunking.
     Idea: split on "natural" boundaries:
@@ -46,29 +569,4 @@ def chunk_by_layout_breaks(text: str, max_chars: int = 1200) -> List[Chunk]:
     - section-like headers (ALL CAPS-ish lines)
     Then merge blocks until each chunk is <= max_chars.
     """
-    text = (text or "").strip()
-    if not text:
-        return []
-
-    blocks = [b.strip() for b in _SECTION_BREAK_RE.split(text) if b and b.strip()]
-
-    merged: List[str] = []
-    buf = ""
-
-    def flush():
-        nonlocal buf
-        if buf.strip():
-            merged.append(buf.strip())
-        buf = ""
-
-    for b in blocks:
-        if not buf:
-            buf = b
-        elif len(buf) + 2 + len(b) <= max_chars:
-            buf = buf + "\n\n" + b
-        else:
-            flush()
-            buf = b
-    flush()
-
-    return [Chunk(text=m) for m in merged]
+    return layout_break_spans(text, max_chars=max_chars).to_chunks()
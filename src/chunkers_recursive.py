@@ -1,17 +1,48 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Callable
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Callable, NamedTuple, Optional, Tuple
 import re
 
-@dataclass
-class Chunk:
-    text: str
-    meta: dict | None = None
+from src.chunkers import (
+    TEXT_COLLAPSED,
+    TEXT_LINES,
+    TEXT_OWNED,
+    TEXT_PARAGRAPHS,
+    TEXT_SLICE,
+    STREAM_READ_CHARS,
+    Chunk,
+    ChunkSpans,
+    DocumentInput,
+    PreparedDocument,
+    TextStream,
+    _PARA_SPLIT_RE,
+    _SpanBuilder,
+    _iter_pieces,
+    _iter_regions,
+    _materialize,
+    _normalize_newlines,
+    _strip_span,
+    locate_spans,
+    prepare_document,
+)
+
+if TYPE_CHECKING:
+    from src.token_counter import TokenCounter
+
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+_DIGIT_RE = re.compile(r"\d")
+_THOUSANDS_RE = re.compile(r"\d{1,3}(,\d{3})+")
+
+# Line features from _scan_lines (bit flags)
+LINE_DIGIT = 1       # any digit
+LINE_MONEY = 2       # "$"
+LINE_THOUSANDS = 4   # 1,234-style number
+LINE_PIPE = 8        # "|"-delimited cells
+TABLE_LINE_RATIO = 0.4
 
 
 def _split_paragraphs(text: str) -> List[str]:
     t = text.replace("\r\n", "\n").replace("\r", "\n").strip()
-    parts = [p.strip() for p in re.split(r"\n\s*\n+", t) if p.strip()]
+    parts = [p.strip() for p in _PARA_SPLIT_RE.split(t) if p.strip()]
     return parts
 
 
@@ -19,7 +50,7 @@ def split_sentences_rule(text: str) -> List[str]:
     t = " ".join(text.split())
     if not t:
         return []
-    sents = re.split(r"(?<=[.!?])\s+", t)
+    sents = _SENTENCE_BREAK_RE.split(t)
     return [s.strip() for s in sents if s.strip()]
 
 
@@ -31,117 +62,402 @@ def split_sentences_nltk(text: str) -> List[str]:
     return [s.strip() for s in sent_tokenize(t) if s.strip()]
 
 
-def _looks_table_like(paragraph: str) -> bool:
-    # If it contains many short lines with numbers/currency, treat as table-ish
-    lines = [ln.strip() for ln in paragraph.splitlines() if ln.strip()]
-    if len(lines) < 4:
-        return False
+class _LineScan(NamedTuple):
+    """Non-empty lines of a paragraph: stripped spans in the source and their LINE_* flags."""
+    spans: List[Tuple[int, int]]
+    flags: List[int]
 
-    numericish = 0
-    for ln in lines:
-        has_num = bool(re.search(r"\d", ln))
-        has_money = "$" in ln
-        has_commas = bool(re.search(r"\d{1,3}(,\d{3})+", ln))
-        has_pipe = "|" in ln
-        if has_pipe or (has_num and (has_money or has_commas)):
-            numericish += 1
+    @property
+    def table_like(self) -> bool:
+        # Many short lines with numbers/currency: a pipe, a thousands separator, or "$" with a digit
+        if len(self.flags) < 4:
+            return False
+        numericish = 0
+        for f in self.flags:
+            if f & (LINE_PIPE | LINE_THOUSANDS) or f & (LINE_MONEY | LINE_DIGIT) == LINE_MONEY | LINE_DIGIT:
+                numericish += 1
+        return numericish / len(self.flags) >= TABLE_LINE_RATIO
 
-    return (numericish / max(1, len(lines))) >= 0.4
 
+def _line_flags(line: str) -> int:
+    f = 0
+    if "|" in line:
+        f |= LINE_PIPE
+    if "$" in line:
+        f |= LINE_MONEY
+    m = _DIGIT_RE.search(line)
+    if m is not None:
+        f |= LINE_DIGIT
+        if _THOUSANDS_RE.search(line, m.start()) is not None:
+            f |= LINE_THOUSANDS
+    return f
 
-def chunk_recursive(
-    text: str,
-    max_chars: int = 1200,
-    min_chars: int = 300,
-    overlap_chars: int = 0,
-    sentence_splitter: Callable[[str], List[str]] = split_sentences_rule,
-) -> List[Chunk]:
+
+def _scan_lines(source: str, start: int, end: int) -> _LineScan:
     """
-    Meaning-first chunker with guards:
-    - Prefer paragraph splits
-    - Sentence split only for prose paragraphs (not tables)
-    - Merge tiny chunks to satisfy min_chars
+    One pass over the lines of source[start:end]: the flags decide whether the paragraph
+    is a table (table_like), the spans are what the table packer cuts on.
     """
-    if not text or not text.strip():
-        return []
+    spans: List[Tuple[int, int]] = []
+    flags: List[int] = []
+    pos = start
+    for ln in source[start:end].splitlines(True):
+        line_start, pos = pos, pos + len(ln)
+        stripped = ln.strip()
+        if not stripped:
+            continue
+        # First occurrence of the first non-space character is where the stripped line starts
+        ls = line_start + ln.find(stripped[0])
+        spans.append((ls, ls + len(stripped)))
+        flags.append(_line_flags(stripped))
+    return _LineScan(spans, flags)
 
-    paras = _split_paragraphs(text)
-    raw_chunks: List[str] = []
 
-    def pack_units(units: List[str]) -> None:
-        buf = ""
-        for u in units:
-            u = u.strip()
-            if not u:
-                continue
+def _table_lines(source: str, start: int, end: int) -> Optional[List[Tuple[int, int]]]:
+    """Line spans of source[start:end] if it is table-like, else None."""
+    # Fewer than 4 lines can't be a table; most prose paragraphs are one line (splitlines
+    # also breaks on \r, \f, \x1c, ..., so it settles the few-"\n" case)
+    if source.count("\n", start, end) < 3 and len(source[start:end].splitlines()) < 4:
+        return None
+    scan = _scan_lines(source, start, end)
+    return scan.spans if scan.table_like else None
+
+
+class _Unit(NamedTuple):
+    """A packing unit (paragraph, sentence, packed lines or hard-split piece) located in the source."""
+    start: int
+    end: int
+    flags: int      # TEXT_* rule that rebuilds its text from the span
+    length: int     # length of that text
+    text: Optional[str] = None  # only when no rule applies (TEXT_OWNED)
+    is_para: bool = False
+    collapsed: bool = False     # split_sentences_rule sentence: " "-joins of these collapse the span
+    size: int = -1              # token count when packing by tokens (-1: size is length)
+
+
+def _unit_text(source: str, u: _Unit) -> str:
+    return u.text if u.text is not None else _materialize(source, u.start, u.end, u.flags)
+
 
+def _sentence_units(source: str, start: int, end: int, sentence_splitter) -> List[_Unit]:
+    if sentence_splitter is split_sentences_rule:
+        # Same boundaries as splitting the whitespace-collapsed paragraph, found in place;
+        # breaks swallow whole whitespace runs, so every piece is already stripped
+        units = []
+        pos = start
+        for m in _SENTENCE_BREAK_RE.finditer(source, start, end):
+            units.append(_Unit(pos, m.start(), TEXT_COLLAPSED, len(" ".join(source[pos : m.start()].split())), collapsed=True))
+            pos = m.end()
+        units.append(_Unit(pos, end, TEXT_COLLAPSED, len(" ".join(source[pos:end].split())), collapsed=True))
+        return units
+
+    p = source[start:end]
+    sents = [t.strip() for t in (sentence_splitter(p) or [p]) if t.strip()]
+    units = []
+    for (s, e), t in zip(locate_spans(p, sents), sents):
+        if s >= 0 and p[s:e] == t:
+            units.append(_Unit(start + s, start + e, TEXT_SLICE, len(t)))
+        else:
+            units.append(_Unit(start + s if s >= 0 else -1, start + e if s >= 0 else -1, TEXT_OWNED, len(t), t))
+    return units
+
+
+def _join_units(source: str, units: List[_Unit], sep: str) -> _Unit:
+    """One unit for units joined by sep, keeping a span rule when one reproduces the join."""
+    first, last = units[0], units[-1]
+    length = sum(u.length for u in units) + len(sep) * (len(units) - 1)
+    if len(units) == 1:
+        return first
+
+    if sep == " " and all(u.collapsed for u in units):
+        flags = TEXT_COLLAPSED
+    elif sep == "\n\n" and all(u.is_para for u in units):
+        flags = TEXT_PARAGRAPHS
+    else:
+        text = sep.join(_unit_text(source, u) for u in units)
+        return _Unit(first.start, last.end, TEXT_OWNED, length, text)
+    return _Unit(first.start, last.end, flags, length)
+
+
+def _raw_units(
+    doc: PreparedDocument,
+    max_chars: int,
+    sentence_splitter: Callable[[str], List[str]],
+    counter: Optional["TokenCounter"] = None,
+) -> List[_Unit]:
+    """
+    Paragraphs of doc.source, sentence- or line-packed when longer than max_chars.
+    With a counter, max_chars is a token budget: sizes are (cached) unit token counts and
+    joins cost nothing, since whitespace never merges tokens.
+    """
+    source = doc.source
+    raw: List[_Unit] = []
+    sep = 1 if counter is None else 0
+
+    def sizes(units: List[_Unit]) -> List[int]:
+        if counter is None:
+            return [u.length for u in units]
+        return counter.count_many([_unit_text(source, u) for u in units])
+
+    def hard_split(u: _Unit) -> None:
+        # Unit longer than max_chars: fixed windows, sliced in place when the unit is an exact slice
+        if counter is not None:
+            t = _unit_text(source, u)
+            tokens = counter.spans(t)
+            for i in range(0, len(tokens), max_chars):
+                a, b = tokens[i][0], tokens[min(i + max_chars, len(tokens)) - 1][1]
+                n = min(max_chars, len(tokens) - i)
+                if u.flags == TEXT_SLICE:
+                    raw.append(_Unit(u.start + a, u.start + b, TEXT_SLICE, b - a, size=n))
+                else:
+                    raw.append(_Unit(u.start, u.end, TEXT_OWNED, b - a, t[a:b], size=n))
+            return
+        if u.flags == TEXT_SLICE:
+            for i in range(u.start, u.end, max_chars):
+                span = _strip_span(source, i, min(i + max_chars, u.end))
+                if span is not None:
+                    raw.append(_Unit(span[0], span[1], TEXT_SLICE, span[1] - span[0]))
+            return
+        t = _unit_text(source, u)
+        for i in range(0, len(t), max_chars):
+            piece = t[i : i + max_chars].strip()
+            if piece:
+                raw.append(_Unit(u.start, u.end, TEXT_OWNED, len(piece), piece))
+
+    def flush_units(buf: List[_Unit], buf_size: int) -> None:
+        u = _join_units(source, buf, " ")
+        raw.append(u if counter is None else u._replace(size=buf_size))
+
+    def pack_units(units: List[_Unit]) -> None:
+        buf: List[_Unit] = []
+        buf_len = 0
+        for u, n in zip(units, sizes(units)):
             # Hard fallback if unit itself is too big
-            if len(u) > max_chars:
-                if buf.strip():
-                    raw_chunks.append(buf.strip())
-                    buf = ""
-                for i in range(0, len(u), max_chars):
-                    piece = u[i : i + max_chars].strip()
-                    if piece:
-                        raw_chunks.append(piece)
+            if n > max_chars:
+                if buf:
+                    flush_units(buf, buf_len)
+                    buf = []
+                hard_split(u)
                 continue
 
             if not buf:
-                buf = u
-            elif len(buf) + 1 + len(u) <= max_chars:
-                buf = buf + " " + u
+                buf, buf_len = [u], n
+            elif buf_len + sep + n <= max_chars:
+                buf.append(u)
+                buf_len += sep + n
+            else:
+                flush_units(buf, buf_len)
+                buf, buf_len = [u], n
+
+        if buf:
+            flush_units(buf, buf_len)
+
+    def pack_lines(lines: List[Tuple[int, int]]) -> None:
+        # pack_units specialised for table lines: spans and running lengths only, no per-line objects
+        # buf_len counts chars (the chunk's text length), buf_size the budget (chars or tokens)
+        buf_start = buf_end = -1
+        buf_len = buf_size = n_buf = 0
+        line_sizes = [le - ls for ls, le in lines] if counter is None else counter.count_many([source[ls:le] for ls, le in lines])
+        for (ls, le), size in zip(lines, line_sizes):
+            n = le - ls
+            if size > max_chars:
+                if n_buf:
+                    raw.append(_Unit(buf_start, buf_end, TEXT_SLICE if n_buf == 1 else TEXT_LINES, buf_len, size=buf_size))
+                    n_buf = 0
+                hard_split(_Unit(ls, le, TEXT_SLICE, n))
+                continue
+
+            if not n_buf:
+                buf_start, buf_end, buf_len, buf_size, n_buf = ls, le, n, size, 1
+            elif buf_size + sep + size <= max_chars:
+                buf_end, buf_len, buf_size, n_buf = le, buf_len + 1 + n, buf_size + sep + size, n_buf + 1
             else:
-                raw_chunks.append(buf.strip())
-                buf = u
+                raw.append(_Unit(buf_start, buf_end, TEXT_SLICE if n_buf == 1 else TEXT_LINES, buf_len, size=buf_size))
+                buf_start, buf_end, buf_len, buf_size, n_buf = ls, le, n, size, 1
 
-        if buf.strip():
-            raw_chunks.append(buf.strip())
+        if n_buf:
+            raw.append(_Unit(buf_start, buf_end, TEXT_SLICE if n_buf == 1 else TEXT_LINES, buf_len, size=buf_size))
 
-    for p in paras:
-        if len(p) <= max_chars:
-            raw_chunks.append(p)
+    paras = doc.paragraphs
+    if counter is None:
+        para_sizes = [e - s for s, e in paras]
+    else:
+        para_sizes = counter.count_many([source[s:e] for s, e in paras])
+    for i, ((s, e), size) in enumerate(zip(paras, para_sizes)):
+        if size <= max_chars:
+            raw.append(_Unit(s, e, TEXT_SLICE, e - s, is_para=True, size=-1 if counter is None else size))
             continue
 
         # If table-like, do NOT sentence split — just size-pack by lines
-        if _looks_table_like(p):
-            lines = [ln.strip() for ln in p.splitlines() if ln.strip()]
-            pack_units(lines)
+        lines = doc.table_lines(i)
+        if lines is not None:
+            pack_lines(lines)
+        elif sentence_splitter is split_sentences_rule:
+            # Rule sentences only depend on the paragraph: kept on the document for re-runs
+            units = doc._sentences.get(i)
+            if units is None:
+                units = doc._sentences[i] = _sentence_units(source, s, e, sentence_splitter)
+            pack_units(units)
         else:
-            sents = sentence_splitter(p) or [p]
-            pack_units(sents)
-
-    # Merge tiny chunks forward to satisfy min_chars (without exceeding max_chars)
-    merged: List[str] = []
-    buf = ""
-    for c in raw_chunks:
-        c = c.strip()
-        if not c:
-            continue
+            pack_units(_sentence_units(source, s, e, sentence_splitter))
+    return raw
+
+
+def _merge_small(
+    units: Iterable[_Unit],
+    min_chars: int,
+    max_chars: int,
+    join: Callable[[List[_Unit]], _Unit],
+    sep: int = 2,
+) -> Iterator[_Unit]:
+    """Merge tiny chunks forward to satisfy min_chars (without exceeding max_chars); sized by .size when set."""
+    buf: List[_Unit] = []
+    buf_len = 0
+    for c in units:
+        n = c.length if c.size < 0 else c.size
         if not buf:
-            buf = c
+            buf, buf_len = [c], n
             continue
 
         # If current buffer is too small, try to merge
-        if len(buf) < min_chars and len(buf) + 2 + len(c) <= max_chars:
-            buf = buf + "\n\n" + c
+        if buf_len < min_chars and buf_len + sep + n <= max_chars:
+            buf.append(c)
+            buf_len += sep + n
         else:
-            merged.append(buf)
-            buf = c
+            yield join(buf)
+            buf, buf_len = [c], n
 
-    if buf.strip():
-        merged.append(buf)
+    if buf:
+        yield join(buf)
 
-    # Optional overlap
-    if overlap_chars > 0 and len(merged) > 1:
-        out: List[str] = []
-        prev = ""
-        for c in merged:
+
+def _recursive_spans(
+    text: DocumentInput,
+    max_size: int,
+    min_size: int,
+    overlap: int,
+    sentence_splitter: Callable[[str], List[str]],
+    counter: Optional["TokenCounter"],
+) -> ChunkSpans:
+    out = _SpanBuilder()
+    doc = prepare_document(text)
+    if not doc.paragraphs:
+        return out.build(doc.text, "recursive")
+    source = doc.source
+
+    raw = _raw_units(doc, max_size, sentence_splitter, counter)
+    join = lambda buf: _join_units(source, buf, "\n\n")
+    merged = list(_merge_small(raw, min_size, max_size, join, sep=2 if counter is None else 0))
+
+    # Optional overlap: every chunk after the first starts with the tail of the previous one
+    prev = ""
+    for i, c in enumerate(merged):
+        if overlap > 0 and len(merged) > 1:
+            t = _unit_text(source, c)
             if prev:
-                prefix = prev[-overlap_chars:]
-                out.append((prefix + " " + c).strip())
+                if counter is None:
+                    tail = prev[-overlap:]
+                else:
+                    tokens = counter.spans(prev)
+                    tail = prev[tokens[-overlap][0] :] if len(tokens) > overlap else prev
+                prefixed = (tail + " " + t).strip()
+                out.add(c.start, c.end, TEXT_OWNED, len(prefixed), prefixed)
             else:
-                out.append(c)
-            prev = c
-        merged = out
+                out.add(c.start, c.end, c.flags, c.length, c.text)
+            prev = t
+        else:
+            out.add(c.start, c.end, c.flags, c.length, c.text)
+
+    return out.build(source, "recursive")
+
+
+def recursive_spans(
+    text: DocumentInput,
+    max_chars: int = 1200,
+    min_chars: int = 300,
+    overlap_chars: int = 0,
+    sentence_splitter: Callable[[str], List[str]] = split_sentences_rule,
+) -> ChunkSpans:
+    """
+    chunk_recursive as spans. Units are located in the text instead of copied; a chunk
+    only gets its own string when no TEXT_* rule rebuilds it (hard-split sentences,
+    merges of mixed units, overlap prefixes, custom splitters that rewrite text).
+    Spans index the text with \r\n / \r normalized to \n (the same string if it has no \r).
+    """
+    return _recursive_spans(text, max_chars, min_chars, overlap_chars, sentence_splitter, None)
+
 
-    return [Chunk(text=c, meta={"chunker": "recursive"}) for c in merged]
+def recursive_token_spans(
+    text: DocumentInput,
+    max_tokens: int = 96,
+    min_tokens: int = 32,
+    overlap_tokens: int = 0,
+    sentence_splitter: Callable[[str], List[str]] = split_sentences_rule,
+    counter: Optional["TokenCounter"] = None,
+) -> ChunkSpans:
+    """
+    recursive_spans with token budgets. Paragraphs, sentences and table lines are counted
+    once each through the counter's cache and their counts added up while packing;
+    oversized units are cut on token boundaries.
+    """
+    from src.token_counter import get_token_counter
+
+    return _recursive_spans(text, max_tokens, min_tokens, overlap_tokens, sentence_splitter, counter or get_token_counter())
+
+
+def iter_recursive(
+    stream: TextStream,
+    max_chars: int = 1200,
+    min_chars: int = 300,
+    overlap_chars: int = 0,
+    sentence_splitter: Callable[[str], List[str]] = split_sentences_rule,
+    read_chars: int = STREAM_READ_CHARS,
+) -> Iterator[Chunk]:
+    """
+    chunk_recursive over a text stream, one blank-line-delimited region at a time.
+    Chunks own their text; start/end are offsets in the whole stream with \r\n / \r
+    normalized to \n, as in recursive_spans (source is empty).
+    """
+
+    def stream_units() -> Iterator[_Unit]:
+        pieces = _normalize_newlines(_iter_pieces(stream, read_chars))
+        for base, region, _ in _iter_regions(pieces):
+            for u in _raw_units(PreparedDocument(region), max_chars, sentence_splitter):
+                start, end = (base + u.start, base + u.end) if u.start >= 0 else (-1, -1)
+                yield _Unit(start, end, TEXT_OWNED, u.length, _unit_text(region, u), u.is_para)
+
+    def join(buf: List[_Unit]) -> _Unit:
+        if len(buf) == 1:
+            return buf[0]
+        length = sum(u.length for u in buf) + 2 * (len(buf) - 1)
+        return _Unit(buf[0].start, buf[-1].end, TEXT_OWNED, length, "\n\n".join(u.text for u in buf))
+
+    prev = ""
+    for c in _merge_small(stream_units(), min_chars, max_chars, join):
+        t = c.text
+        if overlap_chars > 0 and prev:
+            t = (prev[-overlap_chars:] + " " + t).strip()
+        prev = c.text
+        yield Chunk("", c.start, c.end, "recursive", text=t)
+
+
+def chunk_recursive(
+    text: DocumentInput,
+    max_chars: int = 1200,
+    min_chars: int = 300,
+    overlap_chars: int = 0,
+    sentence_splitter: Callable[[str], List[str]] = split_sentences_rule,
+) -> List[Chunk]:
+    """
+    Meaning-first chunker with guards:
+    - Prefer paragraph splits
+    - Sentence split only for prose paragraphs (not tables)
+    - Merge tiny chunks to satisfy min_chars
+    """
+    return recursive_spans(
+        text,
+        max_chars=max_chars,
+        min_chars=min_chars,
+        overlap_chars=overlap_chars,
+        sentence_splitter=sentence_splitter,
+    ).to_chunks()
@@ -1,19 +1,18 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple
 import numpy as np
-import re
 
-@dataclass
-class Chunk:
-    text: str
-    meta: dict | None = None
+from src.chunkers import TEXT_PARAGRAPHS, TEXT_SLICE, Chunk, DocumentInput, PreparedDocument, prepare_document
+from src.embedding_pool import DEFAULT_MODEL, get_model
 
+if TYPE_CHECKING:
+    from src.embedding_cache import EmbeddingCache
+    from src.token_counter import TokenCounter
 
-def _split_paragraphs(text: str) -> List[str]:
-    t = text.replace("\r\n", "\n").replace("\r", "\n").strip()
-    parts = [p.strip() for p in re.split(r"\n\s*\n+", t) if p.strip()]
-    return parts
+def paragraph_units(text: DocumentInput) -> List[str]:
+    """The units the semantic chunker embeds: stripped, blank-line-separated paragraphs."""
+    doc = prepare_document(text)
+    return [doc.source[s:e] for s, e in doc.paragraphs]
 
 
 def _cosine(a: np.ndarray, b: np.ndarray) -> float:
@@ -21,13 +20,147 @@ def _cosine(a: np.ndarray, b: np.ndarray) -> float:
     return float(np.dot(a, b) / denom)
 
 
+def _merge_sequential(
+    lengths: List[int],
+    embs: np.ndarray,
+    max_chars: int,
+    min_chars: int,
+    similarity_threshold: float,
+    sep: int = 2,
+) -> List[Tuple[int, int]]:
+    """Original running-mean merge: compares each unit to the mean of the current buffer."""
+    groups: List[Tuple[int, int]] = []
+    start = 0
+    buf_len = lengths[0]
+    buf_emb = embs[0]
+
+    for i in range(1, len(lengths)):
+        cand_len = lengths[i]
+        cand_emb = embs[i]
+
+        sim = _cosine(buf_emb, cand_emb)
+
+        # Decision: merge if semantically close OR buffer is still too small,
+        # and we won't exceed max_chars
+        should_merge = (sim >= similarity_threshold) or (buf_len < min_chars)
+
+        if should_merge and (buf_len + sep + cand_len <= max_chars):
+            buf_len += sep + cand_len
+            # Update embedding as mean (simple)
+            buf_emb = (buf_emb + cand_emb) / 2.0
+            # normalize again (keep cosine stable)
+            buf_emb = buf_emb / (np.linalg.norm(buf_emb) + 1e-12)
+        else:
+            groups.append((start, i))
+            start = i
+            buf_len = cand_len
+            buf_emb = cand_emb
+
+    groups.append((start, len(lengths)))
+    return groups
+
+
+def _merge_vectorized(
+    lengths: np.ndarray,
+    embs: np.ndarray,
+    max_chars: int,
+    min_chars: int,
+    similarity_threshold: float,
+    sep: int = 2,
+) -> List[Tuple[int, int]]:
+    """
+    Same merge rule, but unit i is compared to unit i-1 instead of the buffer mean, so
+    every similarity comes from one row-wise dot product over the (normalized) embeddings.
+    Chunk ends are then derived from cumulative lengths with searchsorted.
+    """
+    n = len(lengths)
+    sims = np.einsum("ij,ij->i", embs[:-1], embs[1:])  # sims[i - 1] = cos(unit i - 1, unit i)
+
+    # cum[k] = sum(len + sep) over units < k, so units s..j-1 joined by "\n\n" span cum[j] - cum[s] - sep
+    cum = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lengths + sep, out=cum[1:])
+
+    # next_break[j]: first i >= j where unit i is not similar to unit i - 1 (n if none)
+    is_break = np.ones(n + 1, dtype=bool)
+    is_break[0] = False
+    is_break[1:n] = sims < similarity_threshold
+    next_break = np.minimum.accumulate(np.where(is_break, np.arange(n + 1), n)[::-1])[::-1]
+
+    # For every possible chunk start s (all at once):
+    # - fit_end: largest end whose joined text still fits max_chars (a lone oversized unit stands alone)
+    # - min_end: smallest end whose joined text reaches min_chars; breaks before it are ignored
+    starts = np.arange(n)
+    fit_end = np.maximum(starts + 1, np.searchsorted(cum, cum[:n] + sep + max_chars, side="right") - 1)
+    min_end = np.maximum(starts + 1, np.searchsorted(cum, cum[:n] + sep + min_chars, side="left"))
+    ends = np.where(min_end > n, fit_end, np.minimum(fit_end, next_break[np.minimum(min_end, n)])).tolist()
+
+    # Only the chain of chunk starts is walked in Python
+    groups: List[Tuple[int, int]] = []
+    s = 0
+    while s < n:
+        groups.append((s, ends[s]))
+        s = ends[s]
+    return groups
+
+
+def _encode_units(
+    units: List[str],
+    model_name: str,
+    batch_size: int,
+    device: Optional[str],
+    cache: Optional["EmbeddingCache"],
+) -> np.ndarray:
+    if cache is not None:
+        return cache.encode(units, model_name=model_name, normalize_embeddings=True, batch_size=batch_size, device=device)
+    # Loaded once per process (see src/embedding_pool.py)
+    model = get_model(model_name, device=device)
+    return model.encode(units, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def _merge_units(
+    doc: PreparedDocument,
+    units: List[str],
+    embs: np.ndarray,
+    max_chars: int,
+    min_chars: int,
+    similarity_threshold: float,
+    mode: str,
+    counter: Optional["TokenCounter"] = None,
+) -> List[Chunk]:
+    # With a counter, sizes are token counts and "\n\n" joins cost nothing (they never merge tokens)
+    if counter is None:
+        lengths, sep = [len(u) for u in units], 2
+    else:
+        lengths, sep = counter.count_many(units), 0
+    if mode == "sequential":
+        groups = _merge_sequential(lengths, embs, max_chars, min_chars, similarity_threshold, sep)
+    else:
+        groups = _merge_vectorized(np.array(lengths, dtype=np.int64), embs, max_chars, min_chars, similarity_threshold, sep)
+
+    # Chunks are runs of paragraphs: the span from the first to the last rebuilds the "\n\n" join
+    paras = doc.paragraphs
+    return [
+        Chunk(doc.source, paras[a][0], paras[b - 1][1], "semantic_adjacent", TEXT_SLICE if b - a == 1 else TEXT_PARAGRAPHS)
+        for a, b in groups
+    ]
+
+
+def _check_mode(mode: str) -> None:
+    if mode not in ("vectorized", "sequential"):
+        raise ValueError(f"Unknown mode: {mode!r} (expected 'vectorized' or 'sequential')")
+
+
 def chunk_semantic_adjacent(
-    text: str,
+    text: DocumentInput,
     max_chars: int = 1200,
     min_chars: int = 300,
     similarity_threshold: float = 0.78,
-    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+    model_name: str = DEFAULT_MODEL,
     batch_size: int = 32,
+    device: Optional[str] = None,
+    cache: Optional["EmbeddingCache"] = None,
+    mode: str = "vectorized",
+    counter: Optional["TokenCounter"] = None,
 ) -> List[Chunk]:
     """
     Baseline semantic chunking:
@@ -35,45 +168,112 @@ def chunk_semantic_adjacent(
     2) Embed each unit
     3) Merge adjacent units while they remain semantically similar
        and chunk size stays within [min_chars, max_chars]
+
+    mode="vectorized" compares neighbouring paragraphs (NumPy, one pass);
+    mode="sequential" compares each paragraph to the running mean of the current chunk.
+    The two place different boundaries (vectorized makes more, smaller chunks; see
+    experiments/bench_semantic_boundaries.py); sequential reproduces results from before
+    the vectorized default.
+    counter: size chunks in its tokens instead of characters (max_chars / min_chars are
+    then token budgets; see chunk_semantic_adjacent_tokens).
     """
-    if not text or not text.strip():
+    _check_mode(mode)
+    doc = prepare_document(text)
+    units = paragraph_units(doc)
+    if not units:
         return []
 
-    units = _split_paragraphs(text)
+    embs = _encode_units(units, model_name, batch_size, device, cache)
+    return _merge_units(doc, units, embs, max_chars, min_chars, similarity_threshold, mode, counter)
+
+
+def chunk_semantic_adjacent_from_embeddings(
+    text: DocumentInput,
+    unit_embs: np.ndarray,
+    max_chars: int = 1200,
+    min_chars: int = 300,
+    similarity_threshold: float = 0.78,
+    mode: str = "vectorized",
+    counter: Optional["TokenCounter"] = None,
+) -> List[Chunk]:
+    """
+    chunk_semantic_adjacent with the (normalized) embeddings of paragraph_units(text) given,
+    e.g. computed once and reused across parameter settings.
+    """
+    _check_mode(mode)
+    doc = prepare_document(text)
+    units = paragraph_units(doc)
     if not units:
         return []
+    if len(unit_embs) != len(units):
+        raise ValueError(f"Expected {len(units)} unit embeddings, got {len(unit_embs)}")
+    return _merge_units(doc, units, unit_embs, max_chars, min_chars, similarity_threshold, mode, counter)
 
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer(model_name)
 
-    embs = model.encode(units, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+def iter_chunk_semantic_adjacent_many(
+    texts: Iterable[DocumentInput],
+    max_chars: int = 1200,
+    min_chars: int = 300,
+    similarity_threshold: float = 0.78,
+    model_name: str = DEFAULT_MODEL,
+    batch_size: int = 128,
+    device: Optional[str] = None,
+    cache: Optional["EmbeddingCache"] = None,
+    mode: str = "vectorized",
+    pool_units: int = 8192,
+    counter: Optional["TokenCounter"] = None,
+) -> Iterator[List[Chunk]]:
+    """
+    chunk_semantic_adjacent over many documents, yielding one chunk list per text (in order).
+    Paragraphs of consecutive documents are pooled (up to ~pool_units) into a single
+    encode call, so short documents no longer produce tiny batches; model.encode
+    length-sorts each call, so pooled batches also pad less. Embeddings are scattered
+    back by offset and merged per document, so chunks match one call per text (up to
+    float noise from batching).
+    """
+    _check_mode(mode)
+    pending: List[Tuple[PreparedDocument, List[str]]] = []
+    n_pending = 0
 
-    chunks: List[str] = []
-    buf_text = units[0]
-    buf_emb = embs[0]
+    def drain() -> Iterator[List[Chunk]]:
+        pooled = [u for _, units in pending for u in units]
+        embs = _encode_units(pooled, model_name, batch_size, device, cache) if pooled else None
+        offset = 0
+        for doc, units in pending:
+            if not units:
+                yield []
+                continue
+            doc_embs = embs[offset : offset + len(units)]
+            offset += len(units)
+            yield _merge_units(doc, units, doc_embs, max_chars, min_chars, similarity_threshold, mode, counter)
 
-    for i in range(1, len(units)):
-        cand_text = units[i]
-        cand_emb = embs[i]
+    for text in texts:
+        doc = prepare_document(text)
+        units = paragraph_units(doc)
+        pending.append((doc, units))
+        n_pending += len(units)
+        if n_pending >= pool_units:
+            yield from drain()
+            pending, n_pending = [], 0
 
-        sim = _cosine(buf_emb, cand_emb)
+    if pending:
+        yield from drain()
 
-        # Decision: merge if semantically close OR buffer is still too small,
-        # and we won't exceed max_chars
-        should_merge = (sim >= similarity_threshold) or (len(buf_text) < min_chars)
 
-        if should_merge and (len(buf_text) + 2 + len(cand_text) <= max_chars):
-            buf_text = buf_text + "\n\n" + cand_text
-            # Update embedding as mean (simple)
-            buf_emb = (buf_emb + cand_emb) / 2.0
-            # normalize again (keep cosine stable)
-            buf_emb = buf_emb / (np.linalg.norm(buf_emb) + 1e-12)
-        else:
-            chunks.append(buf_text.strip())
-            buf_text = cand_text
-            buf_emb = cand_emb
+def chunk_semantic_adjacent_many(texts: Iterable[DocumentInput], **kwargs) -> List[List[Chunk]]:
+    """List form of iter_chunk_semantic_adjacent_many (same keyword arguments)."""
+    return list(iter_chunk_semantic_adjacent_many(texts, **kwargs))
+
 
-    if buf_text.strip():
-        chunks.append(buf_text.strip())
+def chunk_semantic_adjacent_tokens(
+    text: DocumentInput,
+    max_tokens: int = 96,
+    min_tokens: int = 48,
+    counter: Optional["TokenCounter"] = None,
+    **kwargs,
+) -> List[Chunk]:
+    """chunk_semantic_adjacent with token budgets (counter defaults to the embedding model's tokenizer)."""
+    from src.token_counter import get_token_counter
 
-    return [Chunk(text=c, meta={"chunker": "semantic_adjacent", "threshold": similarity_threshold}) for c in chunks]
+    counter = counter or get_token_counter(kwargs.get("model_name", DEFAULT_MODEL))
+    return chunk_semantic_adjacent(text, max_chars=max_tokens, min_chars=min_tokens, counter=counter, **kwargs)
@@ -0,0 +1,328 @@
+from __future__ import annotations
+import atexit
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.embedding_pool import DEFAULT_MODEL, get_model
+
+DEFAULT_CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", "artifacts/embedding_cache"))
+
+# Raw digest bytes (not "S16", which would drop trailing NULs)
+_INDEX_DTYPE = np.dtype([("key", "u1", (16,)), ("row", "<i8"), ("last_used", "<i8")])
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+class _Shard:
+    """
+    One (model_name, normalize) namespace on disk:
+    - vectors.<gen>.bin: raw row-major vectors (float32 or float16), append-only
+    - index.<gen>.npy:   structured array (text hash, row, last_used tick)
+    - meta.json:         dim / dtype / committed row count, and which vectors / index
+                         files make up the committed generation
+    meta.json is replaced last and is the only commit point: compaction and flush write
+    new files, so a crash at any step leaves the previous generation intact. Rows
+    appended after the last flush are ignored (and truncated) on load; files of other
+    generations are deleted. A generation that fails its checks loads as an empty cache.
+    """
+
+    def __init__(self, root: Path, dtype: np.dtype):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.meta_path = root / "meta.json"
+
+        self.dtype = dtype
+        self.dim: Optional[int] = None
+        self.rows: Dict[bytes, int] = {}
+        self.last_used: List[int] = []
+        self.n_rows = 0
+        self.gen = 0
+        self.dirty = False
+        self._mmap: Optional[np.memmap] = None
+        self.vec_path = root / "vectors.0.bin"
+        self.index_path: Optional[Path] = None
+
+        if self.meta_path.exists() and not self._load_committed():
+            # Never reuse a generation whose files disagree with each other
+            self.meta_path.unlink()
+            self.gen += 1
+            self.vec_path = root / f"vectors.{self.gen}.bin"
+
+        # Uncommitted files: compactions / index writes interrupted before meta.json,
+        # and vectors.bin written before the first flush
+        keep = {self.meta_path, self.vec_path, self.index_path}
+        for path in list(root.glob("vectors*.bin")) + list(root.glob("index*.npy")) + list(root.glob("*.tmp")):
+            if path not in keep:
+                path.unlink()
+        # put_many appends and numbers rows from n_rows, so rows past the commit must go
+        committed_bytes = self.nbytes
+        if self.vec_path.exists() and self.vec_path.stat().st_size != committed_bytes:
+            with self.vec_path.open("r+b") as f:
+                f.truncate(committed_bytes)
+
+    def _load_committed(self) -> bool:
+        """Load the generation named in meta.json; False when its files do not match it."""
+        meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        self.gen = int(meta.get("gen", 0))
+        # Layout before generations: fixed file names
+        vec_path = self.root / meta.get("vectors", "vectors.bin")
+        index_path = self.root / meta.get("index", "index.npy")
+        if not index_path.exists() or not vec_path.exists():
+            return False
+        dim, dtype, n_rows = int(meta["dim"]), np.dtype(meta["dtype"]), int(meta["n_rows"])
+        if vec_path.stat().st_size < n_rows * dim * dtype.itemsize:
+            return False
+        idx = np.load(index_path)
+        rows = idx["row"]
+        if len(idx) > n_rows or (len(rows) and (rows.min() < 0 or rows.max() >= n_rows)):
+            return False
+
+        self.dim, self.dtype, self.n_rows = dim, dtype, n_rows
+        self.vec_path, self.index_path = vec_path, index_path
+        self.rows = {k.tobytes(): int(r) for k, r in zip(idx["key"], rows)}
+        self.last_used = [0] * n_rows
+        for r, t in zip(rows.tolist(), idx["last_used"].tolist()):
+            self.last_used[r] = t
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.dim is None else self.n_rows * self.dim * self.dtype.itemsize
+
+    def _vectors(self) -> np.memmap:
+        if self._mmap is None or self._mmap.shape[0] != self.n_rows:
+            self._mmap = np.memmap(self.vec_path, dtype=self.dtype, mode="r", shape=(self.n_rows, self.dim))
+        return self._mmap
+
+    def get(self, key: bytes, tick: int) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        self.last_used[row] = tick
+        self.dirty = True
+        return np.asarray(self._vectors()[row], dtype=np.float32)
+
+    def put_many(self, keys: Sequence[bytes], vecs: np.ndarray, tick: int) -> None:
+        if self.dim is None:
+            self.dim = int(vecs.shape[1])
+        with self.vec_path.open("ab") as f:
+            f.write(np.ascontiguousarray(vecs, dtype=self.dtype).tobytes())
+        for k in keys:
+            self.rows[k] = self.n_rows
+            self.last_used.append(tick)
+            self.n_rows += 1
+        self._mmap = None
+        self.dirty = True
+
+    def evict_to(self, max_bytes: int) -> int:
+        """Keep the most recently used rows that fit in max_bytes; rewrite files compactly."""
+        if self.nbytes <= max_bytes or self.dim is None:
+            return 0
+        keep_n = max_bytes // (self.dim * self.dtype.itemsize)
+        by_row = sorted(self.rows.items(), key=lambda kv: self.last_used[kv[1]], reverse=True)[:keep_n]
+        by_row.sort(key=lambda kv: kv[1])
+
+        # Compacted rows go to the next generation's file; the committed one stays valid
+        # until flush() switches meta.json over
+        old = self._vectors()
+        self.gen += 1
+        new_path = self.root / f"vectors.{self.gen}.bin"
+        with new_path.open("wb") as f:
+            for _, r in by_row:
+                f.write(np.ascontiguousarray(old[r]).tobytes())
+        self._mmap = None
+        del old
+        self.vec_path = new_path
+
+        evicted = self.n_rows - len(by_row)
+        self.rows = {k: i for i, (k, _) in enumerate(by_row)}
+        self.last_used = [self.last_used[r] for _, r in by_row]
+        self.n_rows = len(by_row)
+        self.dirty = True
+        return evicted
+
+    def flush(self) -> None:
+        if not self.dirty or self.dim is None:
+            return
+        idx = np.empty(len(self.rows), dtype=_INDEX_DTYPE)
+        for i, (k, r) in enumerate(self.rows.items()):
+            idx[i] = (np.frombuffer(k, dtype=np.uint8), r, self.last_used[r])
+        self.gen += 1
+        index_path = self.root / f"index.{self.gen}.npy"
+        with index_path.open("wb") as f:
+            np.save(f, idx)
+        meta = {
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "n_rows": self.n_rows,
+            "gen": self.gen,
+            "vectors": self.vec_path.name,
+            "index": index_path.name,
+        }
+        tmp_meta = self.meta_path.with_suffix(".tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_meta, self.meta_path)
+
+        # Committed: files of the previous generation are no longer referenced
+        for path in list(self.root.glob("vectors*.bin")) + list(self.root.glob("index*.npy")):
+            if path not in (self.vec_path, index_path):
+                path.unlink()
+        self.index_path = index_path
+        self.dirty = False
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store shared by chunking and retrieval.
+    - Keyed by (model_name, normalize_embeddings, blake2b(text))
+    - Disk tier: memory-mapped float32/float16 vectors + compact index per namespace
+    - Memory tier: LRU of recently used vectors
+    - Disk size bounded by max_bytes per namespace (least recently used rows evicted on flush)
+    Intended for one writer process at a time.
+    """
+
+    def __init__(
+        self,
+        root: Path | str = DEFAULT_CACHE_DIR,
+        dtype: str = "float32",
+        max_bytes: int = 2 * 1024**3,
+        memory_items: int = 50_000,
+        flush_every: int = 4096,
+    ):
+        self.root = Path(root)
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.flush_every = flush_every
+
+        self._shards: Dict[Tuple[str, bool], _Shard] = {}
+        self._lru: "OrderedDict[Tuple[str, bool, bytes], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tick = 0
+        self._pending = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.model_calls = 0
+
+    def _shard(self, model_name: str, normalize: bool) -> _Shard:
+        ns = (model_name, normalize)
+        shard = self._shards.get(ns)
+        if shard is None:
+            shard = _Shard(self.root / f"{_slug(model_name)}__norm{int(normalize)}", self.dtype)
+            self._shards[ns] = shard
+        return shard
+
+    def _remember(self, key: Tuple[str, bool, bytes], vec: np.ndarray) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        model_name: str = DEFAULT_MODEL,
+        normalize_embeddings: bool = False,
+        batch_size: int = 32,
+        device: Optional[str] = None,
+    ) -> np.ndarray:
+        """Drop-in for model.encode(texts, convert_to_numpy=True, ...) that only embeds unseen texts."""
+        with self._lock:
+            self._tick += 1
+            shard = self._shard(model_name, normalize_embeddings)
+            out: List[Optional[np.ndarray]] = [None] * len(texts)
+            missing: Dict[bytes, List[int]] = {}
+            miss_texts: List[str] = []
+
+            for i, t in enumerate(texts):
+                k = text_key(t)
+                mem_key = (model_name, normalize_embeddings, k)
+                vec = self._lru.get(mem_key)
+                if vec is not None:
+                    self._lru.move_to_end(mem_key)
+                    self.hits_memory += 1
+                    out[i] = vec
+                    continue
+                vec = shard.get(k, self._tick)
+                if vec is not None:
+                    self.hits_disk += 1
+                    self._remember(mem_key, vec)
+                    out[i] = vec
+                    continue
+                if k not in missing:
+                    missing[k] = []
+                    miss_texts.append(t)
+                missing[k].append(i)
+
+            if miss_texts:
+                self.misses += len(miss_texts)
+                self.model_calls += 1
+                model = get_model(model_name, device=device)
+                vecs = model.encode(
+                    miss_texts,
+                    batch_size=batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=normalize_embeddings,
+                    show_progress_bar=False,
+                ).astype(np.float32)
+                keys = list(missing.keys())
+                shard.put_many(keys, vecs, self._tick)
+                for k, vec in zip(keys, vecs):
+                    # What later reads see, so float16 storage gives the same vectors either way
+                    vec = vec.astype(self.dtype).astype(np.float32)
+                    self._remember((model_name, normalize_embeddings, k), vec)
+                    for i in missing[k]:
+                        out[i] = vec
+                self._pending += len(keys)
+                if self._pending >= self.flush_every:
+                    self._flush_locked()
+
+            if not out:
+                return np.zeros((0, shard.dim or 0), dtype=np.float32)
+            return np.stack(out).astype(np.float32, copy=False)
+
+    def _flush_locked(self) -> None:
+        for shard in self._shards.values():
+            shard.evict_to(self.max_bytes)
+            shard.flush()
+        self._pending = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "model_calls": self.model_calls,
+            "disk_bytes": sum(s.nbytes for s in self._shards.values()),
+        }
+
+
+_DEFAULT_CACHE: Optional[EmbeddingCache] = None
+
+
+def get_default_cache() -> EmbeddingCache:
+    """Shared on-disk cache under artifacts/ (override location with EMBED_CACHE_DIR)."""
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = EmbeddingCache()
+        atexit.register(_DEFAULT_CACHE.flush)
+    return _DEFAULT_CACHE
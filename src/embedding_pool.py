@@ -0,0 +1,102 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+PoolKey = Tuple[str, Optional[str], Optional[str]]
+
+
+@dataclass
+class PoolStats:
+    hits: int = 0
+    misses: int = 0
+    load_seconds: float = 0.0
+
+
+_MODELS: Dict[PoolKey, object] = {}
+_LOAD_SECONDS: Dict[PoolKey, float] = {}
+_STATS = PoolStats()
+_LOCK = threading.Lock()
+_KEY_LOCKS: Dict[PoolKey, threading.Lock] = {}
+
+
+def _load_model(model_name: str, device: Optional[str], dtype: Optional[str]):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device=device)
+    if dtype == "float16":
+        model = model.half()
+    elif dtype == "bfloat16":
+        import torch
+        model = model.to(torch.bfloat16)
+    return model
+
+
+def get_model(
+    model_name: str = DEFAULT_MODEL,
+    device: Optional[str] = None,
+    dtype: Optional[str] = None,
+):
+    """
+    Process-wide SentenceTransformer pool.
+    - One model instance per (model_name, device, dtype)
+    - First caller loads it, concurrent callers wait on a per-key lock
+      instead of loading the same weights twice
+    """
+    key = (model_name, device, dtype)
+    with _LOCK:
+        model = _MODELS.get(key)
+        if model is not None:
+            _STATS.hits += 1
+            return model
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _LOCK:
+            model = _MODELS.get(key)
+            if model is not None:
+                _STATS.hits += 1
+                return model
+
+        t0 = time.perf_counter()
+        model = _load_model(model_name, device, dtype)
+        elapsed = time.perf_counter() - t0
+
+        with _LOCK:
+            _MODELS[key] = model
+            _LOAD_SECONDS[key] = elapsed
+            _STATS.misses += 1
+            _STATS.load_seconds += elapsed
+    return model
+
+
+def warm_models(
+    model_names: Iterable[str] = (DEFAULT_MODEL,),
+    device: Optional[str] = None,
+    dtype: Optional[str] = None,
+) -> None:
+    """Load models up front (e.g. at script start) so the first chunk call doesn't pay for it."""
+    for name in model_names:
+        get_model(name, device=device, dtype=dtype)
+
+
+def pool_stats() -> Dict[str, object]:
+    with _LOCK:
+        return {
+            "hits": _STATS.hits,
+            "misses": _STATS.misses,
+            "load_seconds": _STATS.load_seconds,
+            "loaded": {"|".join(str(p) for p in k): s for k, s in _LOAD_SECONDS.items()},
+        }
+
+
+def clear_pool() -> None:
+    with _LOCK:
+        _MODELS.clear()
+        _LOAD_SECONDS.clear()
+        _KEY_LOCKS.clear()
+        _STATS.hits = 0
+        _STATS.misses = 0
+        _STATS.load_seconds = 0.0
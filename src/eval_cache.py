@@ -0,0 +1,162 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.tracing import get_tracer
+
+DEFAULT_STORE_PATH = Path(os.getenv("JUDGE_STORE_PATH", "artifacts/judge_scores.sqlite"))
+
+# rows, metrics -> one {metric_name: score} dict per row (e.g. ragas evaluate(...).to_pandas() records)
+ShardEvaluator = Callable[[List[Dict[str, Any]], List[Any]], List[Dict[str, Any]]]
+
+
+def sample_key(row: Dict[str, Any], exclude: Sequence[str] = ("chunker",)) -> str:
+    """Content hash of one eval sample, so edited answers/contexts are re-judged."""
+    payload = {k: v for k, v in row.items() if k not in exclude}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def metric_name(metric: Any) -> str:
+    return getattr(metric, "name", None) or str(metric)
+
+
+class JudgeStore:
+    """
+    Per-cell judge results: (sample, chunker, metric, judge model) -> score.
+    NULL scores (judge failed / NaN) are kept for inspection but count as missing.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        con = self._con()
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " sample TEXT NOT NULL, chunker TEXT NOT NULL, metric TEXT NOT NULL, judge TEXT NOT NULL,"
+            " score REAL, created REAL NOT NULL,"
+            " PRIMARY KEY (sample, chunker, metric, judge))"
+        )
+        con.commit()
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            self._local.con = con
+        return con
+
+    def get(self, chunker: str, metric: str, judge: str, samples: Sequence[str]) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {}
+        con = self._con()
+        for i in range(0, len(samples), 500):
+            part = list(samples[i : i + 500])
+            marks = ",".join("?" * len(part))
+            for s, score in con.execute(
+                f"SELECT sample, score FROM scores WHERE chunker = ? AND metric = ? AND judge = ? AND sample IN ({marks})",
+                [chunker, metric, judge, *part],
+            ):
+                out[s] = score
+        return out
+
+    def put_many(self, cells: Sequence[Tuple[str, str, str, str, Optional[float]]]) -> None:
+        """cells: (sample, chunker, metric, judge, score)"""
+        con = self._con()
+        now = time.time()
+        con.executemany(
+            "INSERT OR REPLACE INTO scores (sample, chunker, metric, judge, score, created) VALUES (?, ?, ?, ?, ?, ?)",
+            [(*c, now) for c in cells],
+        )
+        con.commit()
+
+
+def _clean_score(v: Any) -> Optional[float]:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(f) else f
+
+
+def evaluate_with_store(
+    by_chunker: Dict[str, List[Dict[str, Any]]],
+    metrics: List[Any],
+    judge: str,
+    evaluate_shard: ShardEvaluator,
+    store: JudgeStore,
+    n_workers: int = 4,
+    shard_size: int = 8,
+) -> int:
+    """
+    Judge only the (sample, chunker, metric) cells missing from the store.
+    Missing cells are grouped into shards of <= shard_size samples for one chunker and
+    one metric, and shards run on n_workers threads. Returns the number of shards run.
+    Each shard is traced as one "judge_call" span (chunker, metric; count = samples).
+    """
+    shards: List[Tuple[str, Any, List[Dict[str, Any]], List[str]]] = []
+    for chunker, rows in by_chunker.items():
+        keys = [sample_key(r) for r in rows]
+        for metric in metrics:
+            have = store.get(chunker, metric_name(metric), judge, keys)
+            todo = [(r, k) for r, k in zip(rows, keys) if have.get(k) is None]
+            for i in range(0, len(todo), shard_size):
+                part = todo[i : i + shard_size]
+                shards.append((chunker, metric, [r for r, _ in part], [k for _, k in part]))
+
+    if not shards:
+        return 0
+
+    tracer = get_tracer()
+
+    def run(shard) -> None:
+        chunker, metric, rows, keys = shard
+        name = metric_name(metric)
+        with tracer.span("judge_call", chunker, metric=name, judge=judge) as sp:
+            sp["count"] = len(rows)
+            sp["bytes"] = sum(len(json.dumps(r, ensure_ascii=False).encode("utf-8")) for r in rows)
+            records = evaluate_shard(rows, [metric])
+        store.put_many([(k, chunker, name, judge, _clean_score(rec.get(name))) for k, rec in zip(keys, records)])
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        futures = {pool.submit(run, s): s for s in shards}
+        for fut in as_completed(futures):
+            chunker, metric, rows, _ = futures[fut]
+            err = fut.exception()
+            status = f"failed: {err}" if err is not None else "done"
+            print(f"  shard {chunker} | {metric_name(metric)} | n={len(rows)} {status}")
+
+    return len(shards)
+
+
+def aggregate_from_store(
+    by_chunker: Dict[str, List[Dict[str, Any]]],
+    metrics: List[Any],
+    judge: str,
+    store: JudgeStore,
+) -> List[Dict[str, Any]]:
+    """
+    Per-chunker metric means over the stored cells (NaN-skipping, like DataFrame.mean).
+    Scores are taken per row, so duplicated samples weigh as often as they appear.
+    """
+    results = []
+    for chunker, rows in by_chunker.items():
+        keys = [sample_key(r) for r in rows]
+        means: Dict[str, Any] = {}
+        for metric in metrics:
+            name = metric_name(metric)
+            got = store.get(chunker, name, judge, keys)
+            scores = [s for s in (got.get(k) for k in keys) if s is not None]
+            means[name] = sum(scores) / len(scores) if scores else float("nan")
+        means["chunker"] = chunker
+        means["n_examples"] = len(rows)
+        results.append(means)
+    return results
@@ -0,0 +1,168 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+import heapq
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# 408 timeout, 409 ollama "model busy", 429 rate limit, 5xx server side
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    jitter: float = 0.25
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Worth retrying: connection drops, timeouts, 429 / 5xx.
+    Works for requests exceptions (exc.response.status_code) and the openai client (exc.status_code).
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return int(status) in RETRY_STATUSES
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def call_with_retries(
+    fn: Callable[[], R],
+    policy: RetryPolicy = RetryPolicy(),
+    is_retryable: Callable[[BaseException], bool] = is_transient_error,
+) -> R:
+    """Call fn, retrying transient failures with capped exponential backoff + jitter."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= policy.max_attempts or not is_retryable(e):
+                raise
+            delay = min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1)))
+            time.sleep(delay * (1 + policy.jitter * random.random()))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at rate_per_minute.
+    acquire(n) blocks until n tokens are available (n is capped at capacity).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0) -> float:
+        """Returns seconds spent waiting."""
+        n = min(n, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return waited
+                delay = (n - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits, as API providers enforce them."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, n_tokens: float = 0.0) -> float:
+        waited = self.requests.acquire(1)
+        if self.tokens is not None and n_tokens > 0:
+            waited += self.tokens.acquire(n_tokens)
+        return waited
+
+
+def run_bounded(
+    items: Iterable[T],
+    fn: Callable[[T], R],
+    max_workers: int = 4,
+    max_in_flight: Optional[int] = None,
+    ordered: bool = False,
+    pool: Optional[Executor] = None,
+) -> Iterator[Tuple[T, Optional[R], Optional[BaseException]]]:
+    """
+    Run fn over items on a thread pool, yielding (item, result, error) as calls complete.
+    - At most max_workers calls run at once
+    - At most max_in_flight items are pulled from `items` ahead of completion, so a
+      streaming input is never fully materialized
+    - Results come back in the calling thread (single writer); in completion order,
+      or in input order with ordered=True (completed results wait for earlier ones)
+    - pool: run on an existing executor instead (e.g. a ProcessPoolExecutor; fn and
+      items must then be picklable)
+    """
+    max_in_flight = max_in_flight or 2 * max_workers
+    if pool is None:
+        with ThreadPoolExecutor(max_workers=max_workers) as own_pool:
+            yield from run_bounded(items, fn, max_workers, max_in_flight, ordered, pool=own_pool)
+        return
+
+    if not ordered:
+        for _, item, result, err in _run_unordered(((None, x) for x in items), fn, pool, max_in_flight):
+            yield item, result, err
+        return
+
+    # Reorder buffer keyed by input position; only holds results behind a slow call
+    next_seq = 0
+    ready: list = []
+    for seq, item, result, err in _run_unordered(enumerate(items), fn, pool, max_in_flight):
+        heapq.heappush(ready, (seq, item, result, err))
+        while ready and ready[0][0] == next_seq:
+            _, item, result, err = heapq.heappop(ready)
+            next_seq += 1
+            yield item, result, err
+
+
+def _run_unordered(
+    it: Iterator[Tuple[Any, T]],
+    fn: Callable[[T], R],
+    pool: Executor,
+    max_in_flight: int,
+) -> Iterator[Tuple[Any, T, Optional[R], Optional[BaseException]]]:
+    """(tag, item) pairs in, (tag, item, result, error) out; only fn(item) is submitted."""
+    pending: Dict[Future, Tuple[Any, T]] = {}
+    exhausted = False
+    while True:
+        while not exhausted and len(pending) < max_in_flight:
+            try:
+                tag, item = next(it)
+            except StopIteration:
+                exhausted = True
+                break
+            pending[pool.submit(fn, item)] = (tag, item)
+
+        if not pending:
+            return
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            tag, item = pending.pop(fut)
+            err = fut.exception()
+            yield tag, item, (None if err is not None else fut.result()), err
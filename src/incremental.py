@@ -0,0 +1,248 @@
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.chunkers import Chunk, _PARA_SPLIT_RE, _split_spans
+
+ChunkerFn = Callable[[str], List[Chunk]]
+
+# Chunkers whose state resets at every chunk boundary and whose closing decision only
+# looks at the next unit, so re-chunking can restart at a paragraph-aligned chunk start.
+# (fixed windows sit on a global stride and cannot re-align after an insertion.)
+INCREMENTAL_CHUNKERS = {"layout", "recursive_rule", "semantic_adjacent"}
+NORMALIZED_CHUNKERS = {"recursive_rule", "semantic_adjacent"}  # offsets index the text with \r\n / \r -> \n
+
+# Paragraphs past the changed region in the first re-chunk window
+WINDOW_PARAGRAPHS = 8
+
+
+@dataclass
+class ChunkDelta:
+    """
+    New chunks of a changed document, relative to its previous chunks.
+    Chunk ids are positions in the document's chunk list (the index keeps a document's
+    chunks contiguous, so its row is the document's first row + id).
+    - old_ids: per new chunk, the old chunk with the same text (embedding reusable), or -1
+    - added:   new ids that need embedding
+    - removed: old ids with no counterpart in the new document
+    - rechunked_chars: text actually run through the chunker
+    """
+
+    chunks: List[Chunk]
+    old_ids: List[int]
+    added: List[int] = field(default_factory=list)
+    removed: List[int] = field(default_factory=list)
+    rechunked_chars: int = 0
+
+    def vectors(self, old_vectors: np.ndarray, encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Vectors for self.chunks: old rows for reused chunks, encode() for added ones."""
+        out = np.empty((len(self.chunks), old_vectors.shape[1]), dtype=old_vectors.dtype)
+        reused = [i for i, o in enumerate(self.old_ids) if o >= 0]
+        if reused:
+            out[reused] = old_vectors[[self.old_ids[i] for i in reused]]
+        if self.added:
+            out[self.added] = encode([self.chunks[i].text for i in self.added])
+        return out
+
+
+class _Paragraphs:
+    """Paragraph starts of a text and its items (paragraph + following whitespace), for diffing."""
+
+    def __init__(self, text: str):
+        self.starts = [s for s, _ in _split_spans(text, _PARA_SPLIT_RE, 0, len(text))]
+        bounds = [0] + self.starts[1:] + [len(text)] if self.starts else [0, len(text)]
+        self.items = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+        self.offsets = bounds  # item i spans offsets[i]:offsets[i + 1]
+
+    def index_of(self, pos: int) -> int:
+        """Index of the paragraph starting at pos, or -1."""
+        i = bisect_left(self.starts, pos)
+        return i if i < len(self.starts) and self.starts[i] == pos else -1
+
+
+def _is_boundary(chunks: Sequence[Chunk], i: int) -> bool:
+    """Chunk i starts fresh: it does not share its span with the previous chunk (hard-split pieces do)."""
+    if i == 0:
+        return True
+    return chunks[i].start >= 0 and 0 <= chunks[i - 1].end <= chunks[i].start
+
+
+def diff_paragraphs(old_text: str, new_text: str) -> List[Tuple[str, int, int, int, int]]:
+    """SequenceMatcher opcodes over paragraph items (paragraph text + the whitespace after it)."""
+    old_p, new_p = _Paragraphs(old_text), _Paragraphs(new_text)
+    return SequenceMatcher(None, old_p.items, new_p.items, autojunk=False).get_opcodes()
+
+
+def rechunk_incremental(
+    old_text: str,
+    old_chunks: Sequence[Chunk],
+    new_text: str,
+    chunk_fn: ChunkerFn,
+    window_paragraphs: int = WINDOW_PARAGRAPHS,
+) -> ChunkDelta:
+    """
+    Chunks of new_text, re-chunking only around the paragraphs that changed since old_text.
+    old_chunks must be chunk_fn's output for old_text (offsets into old_text). Unchanged
+    stretches keep their old chunks (offsets shifted); around each change, chunk_fn runs on
+    a window that starts at an old chunk boundary on a paragraph start and grows until its
+    chunks fall back onto old boundaries. Output equals chunk_fn(new_text).
+    """
+    old_p, new_p = _Paragraphs(old_text), _Paragraphs(new_text)
+    ops = SequenceMatcher(None, old_p.items, new_p.items, autojunk=False).get_opcodes()
+
+    # Equal runs as char ranges: old [o_lo, o_hi) == new [o_lo + shift, o_hi + shift)
+    runs: List[Tuple[int, int, int]] = []
+    changes: List[int] = []  # new offset where each non-equal stretch ends
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == "equal":
+            o_lo, o_hi = old_p.offsets[i1], old_p.offsets[i2]
+            runs.append((o_lo, o_hi, new_p.offsets[j1] - o_lo))
+        else:
+            changes.append(new_p.offsets[j2])
+    run_starts_new = [o_lo + shift for o_lo, _, shift in runs]
+    old_by_start: Dict[int, int] = {}
+    for k, c in enumerate(old_chunks):
+        if _is_boundary(old_chunks, k):
+            old_by_start.setdefault(c.start, k)
+
+    def run_at_new(pos: int) -> int:
+        r = bisect_right(run_starts_new, pos) - 1
+        if r >= 0 and pos < runs[r][1] + runs[r][2]:
+            return r
+        return -1
+
+    chunks: List[Chunk] = []
+    old_ids: List[int] = []
+    rechunked = 0
+
+    def copy(k: int, shift: int) -> None:
+        c = old_chunks[k]
+        start, end = (c.start + shift, c.end + shift) if c.start >= 0 else (-1, -1)
+        chunks.append(Chunk(new_text, start, end, c.chunker, c.flags, c.doc_id, c._text))
+        old_ids.append(k)
+
+    def synced(k: int, r: int) -> Optional[int]:
+        """Copy old chunks from k while their closing decisions stay inside run r; new restart offset."""
+        o_lo, o_hi, shift = runs[r]
+        if o_hi == len(old_text) and o_hi + shift == len(new_text):
+            for j in range(k, len(old_chunks)):
+                copy(j, shift)
+            return None
+        m = k
+        # Chunk j closes by looking at chunk j + 1's first unit, so j + 1 must lie in the run
+        while m + 1 < len(old_chunks) and old_chunks[m + 1].end <= o_hi:
+            m += 1
+        # Restart on a paragraph start (recursive chunks can start mid-paragraph)
+        while m > k and (old_p.index_of(old_chunks[m].start) < 0 or not _is_boundary(old_chunks, m)):
+            m -= 1
+        for j in range(k, m):
+            copy(j, shift)
+        return old_chunks[m].start + shift
+
+    # Start in sync when the document opens unchanged
+    pos: Optional[int] = 0
+    if old_chunks and runs and runs[0][0] == 0 and runs[0][2] == 0 and old_p.index_of(old_chunks[0].start) >= 0:
+        pos = synced(0, 0)
+
+    n_par = len(new_p.starts)
+    extra = window_paragraphs
+    while pos is not None:
+        # Resync only past the change this window is for
+        nxt = bisect_left(changes, pos)
+        resync_from = changes[nxt] if nxt < len(changes) else pos
+        first = bisect_right(new_p.starts, max(pos, resync_from))
+        w_idx = min(n_par, first + extra)
+        w_end = new_p.starts[w_idx] if w_idx < n_par else len(new_text)
+        final = w_end == len(new_text)
+
+        window = chunk_fn(new_text[pos:w_end])
+        rechunked += w_end - pos
+        new_chunks = [
+            Chunk(new_text, c.start + pos if c.start >= 0 else -1, c.end + pos if c.start >= 0 else -1, c.chunker, c.flags, c.doc_id, c._text)
+            for c in window
+        ]
+
+        # Chunk i is final once chunk i + 1 ends before the window's last paragraph
+        if final:
+            n_valid = len(new_chunks)
+        else:
+            lim = new_p.starts[w_idx - 1]
+            n_valid = 0
+            while n_valid + 1 < len(new_chunks) and new_chunks[n_valid + 1].end <= lim:
+                n_valid += 1
+
+        resync = None
+        for i in range(1, min(n_valid + 1, len(new_chunks))):
+            s = new_chunks[i].start
+            if s < resync_from or new_p.index_of(s) < 0 or not _is_boundary(new_chunks, i):
+                continue
+            r = run_at_new(s)
+            if r >= 0 and (s - runs[r][2]) in old_by_start:
+                resync = (i, old_by_start[s - runs[r][2]], r)
+                break
+
+        if resync is not None:
+            i, k, r = resync
+            chunks.extend(new_chunks[:i])
+            old_ids.extend([-1] * i)
+            extra = window_paragraphs
+            pos = synced(k, r)
+            continue
+        if final:
+            chunks.extend(new_chunks)
+            old_ids.extend([-1] * len(new_chunks))
+            break
+
+        # No boundary matched yet: keep the settled chunks and continue from the last
+        # paragraph-aligned boundary, or widen the window if there is none
+        restart = max(
+            (
+                i
+                for i in range(1, min(n_valid + 1, len(new_chunks)))
+                if new_p.index_of(new_chunks[i].start) >= 0 and _is_boundary(new_chunks, i)
+            ),
+            default=0,
+        )
+        if restart:
+            chunks.extend(new_chunks[:restart])
+            old_ids.extend([-1] * restart)
+            pos = new_chunks[restart].start
+        else:
+            extra *= 2
+
+    # Re-chunked chunks that reproduce an old chunk's text keep its id (and embedding)
+    used = set(o for o in old_ids if o >= 0)
+    free: Dict[str, List[int]] = {}
+    for k in range(len(old_chunks) - 1, -1, -1):
+        if k not in used:
+            free.setdefault(old_chunks[k].text, []).append(k)
+    for i, o in enumerate(old_ids):
+        if o < 0:
+            ks = free.get(chunks[i].text)
+            if ks:
+                old_ids[i] = ks.pop()
+    used = set(o for o in old_ids if o >= 0)
+
+    return ChunkDelta(
+        chunks=chunks,
+        old_ids=old_ids,
+        added=[i for i, o in enumerate(old_ids) if o < 0],
+        removed=[k for k in range(len(old_chunks)) if k not in used],
+        rechunked_chars=rechunked,
+    )
+
+
+def rechunk_document(chunker_name: str, old_text: str, old_chunks: Sequence[Chunk], new_text: str) -> ChunkDelta:
+    """rechunk_incremental with a registry chunker (see INCREMENTAL_CHUNKERS)."""
+    if chunker_name not in INCREMENTAL_CHUNKERS:
+        raise ValueError(f"{chunker_name!r} does not support incremental re-chunking (supported: {sorted(INCREMENTAL_CHUNKERS)})")
+    from src.chunker_registry import CHUNKERS
+
+    if chunker_name in NORMALIZED_CHUNKERS:
+        old_text = old_text.replace("\r\n", "\n").replace("\r", "\n")
+        new_text = new_text.replace("\r\n", "\n").replace("\r", "\n")
+    return rechunk_incremental(old_text, old_chunks, new_text, CHUNKERS[chunker_name])
@@ -0,0 +1,161 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from src.retrieval import IndexSpec, search_params
+
+INDEX_ROOT = Path("artifacts/indexes")
+
+# One row per chunk; text_* index into texts.bin (utf-8), start/end into the source document
+CHUNK_META_DTYPE = np.dtype(
+    [("doc", "<i4"), ("start", "<i8"), ("end", "<i8"), ("text_start", "<i8"), ("text_end", "<i8")]
+)
+
+
+def doc_key(doc_text: str) -> str:
+    return hashlib.sha1(doc_text.encode("utf-8")).hexdigest()
+
+
+def save_chunk_index(
+    out_dir: Path,
+    chunker: str,
+    index: faiss.Index,
+    doc_ids: Sequence[str],
+    meta: np.ndarray,
+    texts_blob: bytes,
+    embed_model: str,
+    spec: Optional[IndexSpec] = None,
+) -> None:
+    """
+    Layout of artifacts/indexes/<chunker>/:
+    - index.faiss:   vectors (row i == chunk i)
+    - chunks.npy:    CHUNK_META_DTYPE sidecar (doc, offsets, text location)
+    - texts.bin:     concatenated utf-8 chunk texts
+    - manifest.json: chunker, embedding model, index spec, doc ids
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(out_dir / "index.faiss"))
+    np.save(out_dir / "chunks.npy", meta)
+    (out_dir / "texts.bin").write_bytes(texts_blob)
+    manifest = {
+        "chunker": chunker,
+        "embed_model": embed_model,
+        "n_chunks": int(len(meta)),
+        "dim": int(index.d),
+        "index_spec": asdict(spec or IndexSpec()),
+        "doc_ids": list(doc_ids),
+    }
+    (out_dir / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+
+class _DocChunks(Sequence[str]):
+    """Lazy view of one document's chunk texts; only touched rows are decoded."""
+
+    def __init__(self, store: "ChunkIndex", lo: int, hi: int):
+        self.store, self.lo, self.hi = store, lo, hi
+
+    def __len__(self) -> int:
+        return self.hi - self.lo
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.store.text(self.lo + i)
+
+
+@dataclass
+class ChunkIndex:
+    chunker: str
+    embed_model: str
+    index: faiss.Index
+    meta: np.ndarray
+    texts_blob: np.ndarray
+    doc_ids: List[str]
+    doc_ranges: Dict[str, Tuple[int, int]]
+    spec: IndexSpec = field(default_factory=IndexSpec)
+
+    def text(self, i: int) -> str:
+        r = self.meta[i]
+        return bytes(self.texts_blob[r["text_start"] : r["text_end"]]).decode("utf-8")
+
+    def doc_chunks(self, doc_id: str) -> Sequence[str]:
+        lo, hi = self.doc_ranges.get(doc_id, (0, 0))
+        return _DocChunks(self, lo, hi)
+
+    def search(
+        self,
+        query_vecs: np.ndarray,
+        k: int,
+        doc_id: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched search over normalized query vectors.
+        With doc_id, restrict to that document's chunks and return ids local to it
+        (-1 where fewer than k chunks exist), matching a per-document index.
+        nprobe / ef_search override the spec defaults for IVF / HNSW indexes.
+        """
+        q = np.ascontiguousarray(query_vecs, dtype="float32")
+        if doc_id is None:
+            params = search_params(self.spec, nprobe=nprobe, ef_search=ef_search)
+            return self.index.search(q, k, params=params)
+        lo, hi = self.doc_ranges[doc_id]
+        sel = faiss.IDSelectorRange(lo, hi)
+        params = search_params(self.spec, sel=sel, nprobe=nprobe, ef_search=ef_search)
+        scores, idxs = self.index.search(q, k, params=params)
+        return scores, np.where(idxs >= 0, idxs - lo, -1)
+
+
+# IO_FLAG_MMAP only maps IVF inverted lists; IO_FLAG_MMAP_IFC (faiss >= 1.9) also maps flat
+# and HNSW vector storage, so every index type build_index writes stays on disk
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def load_chunk_index(index_dir: Path, mmap: bool = True, embed_model: Optional[str] = None) -> ChunkIndex:
+    """
+    Open a persisted index. mmap=True maps index vectors, chunks.npy and texts.bin read-only
+    (pages are read on demand and shared between processes); mmap=False reads them into RAM.
+    On faiss builds without IO_FLAG_MMAP_IFC only IVF inverted lists are mapped.
+    embed_model: the model queries will be embedded with; raises ValueError if the index
+    was built from another model's vectors.
+    """
+    manifest = json.loads((index_dir / "manifest.json").read_text(encoding="utf-8"))
+    if embed_model is not None and manifest["embed_model"] != embed_model:
+        raise ValueError(
+            f"{index_dir} was built with {manifest['embed_model']!r}, queries use {embed_model!r} "
+            "(rebuild it with python -m experiments.build_index)"
+        )
+    flags = _MMAP_FLAGS if mmap else 0
+    index = faiss.read_index(str(index_dir / "index.faiss"), flags)
+    mode = "r" if mmap else None
+    meta = np.load(index_dir / "chunks.npy", mmap_mode=mode)
+    blob_path = index_dir / "texts.bin"
+    if mmap and blob_path.stat().st_size > 0:
+        texts_blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+    else:
+        texts_blob = np.frombuffer(blob_path.read_bytes(), dtype=np.uint8)
+
+    doc_ids = manifest["doc_ids"]
+    docs = np.asarray(meta["doc"])
+    bounds = np.searchsorted(docs, np.arange(len(doc_ids) + 1), side="left")
+    doc_ranges = {d: (int(bounds[i]), int(bounds[i + 1])) for i, d in enumerate(doc_ids)}
+
+    return ChunkIndex(
+        chunker=manifest["chunker"],
+        embed_model=manifest["embed_model"],
+        index=index,
+        meta=meta,
+        texts_blob=texts_blob,
+        doc_ids=doc_ids,
+        doc_ranges=doc_ranges,
+        spec=IndexSpec(**manifest.get("index_spec", {})),
+    )
@@ -0,0 +1,180 @@
+from __future__ import annotations
+import gzip
+import json
+import os
+from pathlib import Path
+import warnings
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional fast path
+    orjson = None
+
+
+def open_text(path: Path | str, mode: str = "r") -> IO[str]:
+    """
+    Open a text file, transparently (de)compressing by suffix:
+    - .gz  -> gzip
+    - .zst -> zstandard (pip install zstandard)
+    mode is "r", "w" or "a".
+    """
+    path = Path(path)
+    if mode not in ("r", "w", "a"):
+        raise ValueError("mode must be 'r', 'w' or 'a'")
+    if mode != "r":
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(f"{path}: reading/writing .zst needs `pip install zstandard`") from e
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8", buffering=1024 * 1024)
+
+
+def loads(line: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def dumps_line(obj: Any, use_orjson: bool = False) -> str:
+    # stdlib by default so files stay byte-compatible with earlier runs
+    if use_orjson and orjson is not None:
+        return orjson.dumps(obj).decode("utf-8") + "\n"
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+def iter_jsonl(path: Path | str) -> Iterator[Dict[str, Any]]:
+    """Yield one parsed row per non-empty line; memory stays flat regardless of file size."""
+    with open_text(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield loads(line)
+
+
+def trim_partial_tail(path: Path | str) -> int:
+    """
+    Remove a last line that has no newline, as left by a writer killed mid-flush.
+    Returns the number of bytes removed. A last row that parses but only lacks
+    its newline is kept, and the newline is added. Only plain files are handled;
+    .gz / .zst files are returned untouched.
+    """
+    path = Path(path)
+    if path.suffix in (".gz", ".zst") or not path.exists():
+        return 0
+    with path.open("r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        # Walk back to the last newline; only the bytes after it can be partial
+        cut = pos = size
+        tail = b""
+        while pos > 0:
+            step = min(1 << 16, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                tail = block[i + 1 :] + tail
+                cut = pos + i + 1
+                break
+            tail = block + tail
+            cut = pos
+        if not tail.strip():
+            return 0
+        try:
+            loads(tail.decode("utf-8"))
+        except ValueError:  # json / orjson decode errors, invalid utf-8
+            f.truncate(cut)
+            return size - cut
+        f.seek(size)
+        f.write(b"\n")
+        return 0
+
+
+def iter_jsonl_resume(path: Path | str) -> Iterator[Dict[str, Any]]:
+    """
+    iter_jsonl for the output of an interrupted run that is about to be appended to.
+    A partially written last line is trimmed with a warning (trim_partial_tail), so
+    appended rows start on a fresh line. Corrupt lines before the end still raise.
+    """
+    dropped = trim_partial_tail(path)
+    if dropped:
+        warnings.warn(f"{path}: dropped a partially written last line ({dropped} bytes)", stacklevel=2)
+    yield from iter_jsonl(path)
+
+
+def count_jsonl(path: Path | str) -> int:
+    n = 0
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                n += 1
+    return n
+
+
+class JsonlWriter:
+    """
+    Buffered JSONL writer:
+    - rows are serialized immediately but written in batches of batch_size
+    - mode "a" appends (resumable stages), "w" truncates
+    - flush() forces buffered rows to disk (e.g. after each answer batch)
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        mode: str = "w",
+        batch_size: int = 256,
+        use_orjson: bool = False,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.use_orjson = use_orjson
+        self.n_written = 0
+        self._buf: List[str] = []
+        self._f: Optional[IO[str]] = open_text(self.path, mode)
+
+    def write(self, obj: Any) -> None:
+        self._buf.append(dumps_line(obj, self.use_orjson))
+        if len(self._buf) >= self.batch_size:
+            self._drain()
+
+    def write_many(self, objs: Iterable[Any]) -> None:
+        for obj in objs:
+            self.write(obj)
+
+    def _drain(self) -> None:
+        if self._buf and self._f is not None:
+            self._f.write("".join(self._buf))
+            self.n_written += len(self._buf)
+            self._buf.clear()
+
+    def flush(self) -> None:
+        self._drain()
+        if self._f is not None:
+            self._f.flush()
+
+    def close(self) -> None:
+        if self._f is not None:
+            self.flush()
+            self._f.close()
+            self._f = None
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_jsonl(path: Path | str, rows: Iterable[Any], mode: str = "w") -> int:
+    with JsonlWriter(path, mode=mode) as w:
+        w.write_many(rows)
+        w.flush()
+        return w.n_written
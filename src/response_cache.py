@@ -0,0 +1,145 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", "artifacts/llm_cache.sqlite"))
+
+
+def response_key(provider: str, model: str, options: Dict[str, Any], prompt: str) -> str:
+    payload = json.dumps([provider, model, options, prompt], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent prompt -> response cache for LLM calls (SQLite, WAL mode).
+    - Keyed by sha256 of (provider, model, options, prompt); a changed option is a miss
+    - One connection per thread, safe to share across a generation thread pool
+    - invalidate_model() drops every entry for a model (e.g. after pulling new weights)
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        con = self._con()
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, provider TEXT NOT NULL, model TEXT NOT NULL,"
+            " response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS responses_model ON responses (provider, model)")
+        con.commit()
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def get(self, provider: str, model: str, options: Dict[str, Any], prompt: str) -> Optional[str]:
+        row = self._con().execute(
+            "SELECT response FROM responses WHERE key = ?",
+            (response_key(provider, model, options, prompt),),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, provider: str, model: str, options: Dict[str, Any], prompt: str, response: str) -> None:
+        con = self._con()
+        con.execute(
+            "INSERT OR REPLACE INTO responses (key, provider, model, response, created) VALUES (?, ?, ?, ?, ?)",
+            (response_key(provider, model, options, prompt), provider, model, response, time.time()),
+        )
+        con.commit()
+
+    def cached_call(
+        self,
+        provider: str,
+        model: str,
+        options: Dict[str, Any],
+        prompt: str,
+        fn: Callable[[], str],
+    ) -> str:
+        """Return the cached response, or call fn() and store what it returns (errors are not cached)."""
+        cached = self.get(provider, model, options, prompt)
+        if cached is not None:
+            return cached
+        response = fn()
+        self.put(provider, model, options, prompt, response)
+        return response
+
+    def invalidate_model(self, model: str, provider: Optional[str] = None) -> int:
+        con = self._con()
+        if provider is None:
+            cur = con.execute("DELETE FROM responses WHERE model = ?", (model,))
+        else:
+            cur = con.execute("DELETE FROM responses WHERE model = ? AND provider = ?", (model, provider))
+        con.commit()
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        n = self._con().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": n,
+        }
+
+
+_DEFAULT_CACHE: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Shared cache under artifacts/ (override location with LLM_CACHE_PATH)."""
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = ResponseCache()
+    return _DEFAULT_CACHE
+
+
+def main():
+    """python -m src.response_cache {stats | invalidate MODEL [--provider P]}"""
+    ap = argparse.ArgumentParser(description="Inspect / invalidate the LLM response cache")
+    ap.add_argument("--path", default=str(DEFAULT_CACHE_PATH))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats")
+    inv = sub.add_parser("invalidate")
+    inv.add_argument("model")
+    inv.add_argument("--provider", default=None)
+    args = ap.parse_args()
+
+    cache = ResponseCache(args.path)
+    if args.cmd == "stats":
+        rows = cache._con().execute(
+            "SELECT provider, model, COUNT(*) FROM responses GROUP BY provider, model ORDER BY provider, model"
+        ).fetchall()
+        for provider, model, n in rows:
+            print(f"{provider:<8} {model:<32} {n}")
+    else:
+        n = cache.invalidate_model(args.model, provider=args.provider)
+        print(f"Removed {n} cached responses for {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+Hit = Tuple[int, float, str]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """float32 copy with unit-length rows (cosine similarity == inner product)."""
+    vecs = np.array(vectors, dtype="float32", copy=True, ndmin=2)
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+def build_faiss_index(vectors: np.ndarray) -> faiss.IndexFlatIP:
+    """
+    We use cosine similarity by normalizing vectors and using inner product index.
+    """
+    vecs = normalize_rows(vectors)
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(vecs)
+    return index
+
+
+def search_batch(index: faiss.Index, query_vecs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One index.search call for a matrix of queries.
+    query_vecs must already be normalized (see normalize_rows).
+    """
+    q = np.ascontiguousarray(query_vecs, dtype="float32")
+    return index.search(q, k)
+
+
+def hits_for_row(scores: np.ndarray, idxs: np.ndarray, chunks: Sequence[str]) -> List[Hit]:
+    """
+    (chunk index, score, chunk text) for one query row of a search result.
+    FAISS pads with id -1 (score -FLT_MAX / FLT_MAX) when fewer than k results exist:
+    fewer chunks than k, or an IVF / HNSW search restricted to one document.
+    """
+    out = []
+    for i, s in zip(idxs.tolist(), scores.tolist()):
+        if i < 0:
+            continue
+        out.append((i, float(s), chunks[i]))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Corpus-scale index factory (persisted indexes, see experiments/build_index.py)
+# ---------------------------------------------------------------------------
+
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+@dataclass
+class IndexSpec:
+    """
+    kind:
+    - flat:     exact IndexFlatIP (baseline)
+    - ivf_flat: inverted lists over nlist centroids, exact vectors
+    - ivf_pq:   inverted lists + product quantization (pq_m sub-vectors x pq_bits)
+    - hnsw:     graph index, no training
+    nprobe / ef_search are the default search-time knobs (overridable per search).
+    """
+    kind: str = "flat"
+    nlist: int = 1024
+    pq_m: int = 16
+    pq_bits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    nprobe: int = 16
+    ef_search: int = 64
+    train_size: int = 100_000
+    seed: int = 0
+
+
+def make_index(spec: IndexSpec, dim: int, n_train: int) -> faiss.Index:
+    """Untrained index for spec; nlist / pq_bits shrink when there is too little training data."""
+    if spec.kind not in INDEX_KINDS:
+        raise ValueError(f"unknown index kind {spec.kind!r}, expected one of {INDEX_KINDS}")
+
+    metric = faiss.METRIC_INNER_PRODUCT
+    if spec.kind == "flat":
+        return faiss.IndexFlatIP(dim)
+    if spec.kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, spec.hnsw_m, metric)
+        index.hnsw.efConstruction = spec.ef_construction
+        return index
+
+    # k-means wants ~39 points per centroid
+    nlist = max(1, min(spec.nlist, n_train // 39))
+    quantizer = faiss.IndexFlatIP(dim)
+    if spec.kind == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+
+    if dim % spec.pq_m != 0:
+        raise ValueError(f"pq_m={spec.pq_m} must divide the embedding dim {dim}")
+    pq_bits = max(1, min(spec.pq_bits, int(np.log2(max(2, n_train // 39)))))
+    return faiss.IndexIVFPQ(quantizer, dim, nlist, spec.pq_m, pq_bits, metric)
+
+
+def build_ann_index(vectors: np.ndarray, spec: IndexSpec, add_batch: int = 65_536) -> faiss.Index:
+    """
+    Build an index from (already normalized) vectors; works on np.memmap too.
+    - Trains on a random sample of at most spec.train_size rows
+    - Adds in batches so the full matrix is never copied at once
+    """
+    n, dim = vectors.shape
+    rng = np.random.default_rng(spec.seed)
+    n_train = min(n, spec.train_size)
+    index = make_index(spec, dim, n_train)
+
+    if not index.is_trained:
+        sample = np.sort(rng.choice(n, size=n_train, replace=False))
+        index.train(np.ascontiguousarray(vectors[sample], dtype="float32"))
+
+    for lo in range(0, n, add_batch):
+        index.add(np.ascontiguousarray(vectors[lo : lo + add_batch], dtype="float32"))
+
+    set_search_defaults(index, spec)
+    return index
+
+
+def set_search_defaults(index: faiss.Index, spec: IndexSpec) -> None:
+    if spec.kind in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = spec.nprobe
+    elif spec.kind == "hnsw":
+        index.hnsw.efSearch = spec.ef_search
+
+
+def search_params(
+    spec: IndexSpec,
+    sel: Optional[faiss.IDSelector] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> faiss.SearchParameters:
+    """Per-call search parameters of the right type for spec.kind (IVF / HNSW / flat)."""
+    if spec.kind in ("ivf_flat", "ivf_pq"):
+        params = faiss.SearchParametersIVF(nprobe=nprobe or spec.nprobe)
+    elif spec.kind == "hnsw":
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or spec.ef_search)
+    else:
+        params = faiss.SearchParameters()
+    if sel is not None:
+        params.sel = sel
+    return params
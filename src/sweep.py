@@ -0,0 +1,274 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import inspect
+import itertools
+import multiprocessing as mp
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.chunkers import ChunkSpans, PreparedDocument, prepare_document
+from src.chunkers_semantic import chunk_semantic_adjacent_from_embeddings, paragraph_units
+from src.gen_runner import run_bounded
+
+# (factory name, keyword arguments) of one chunker configuration
+GridPoint = Tuple[str, Dict[str, Any]]
+
+DEFAULT_WORKERS = int(os.getenv("CHUNK_WORKERS", str(os.cpu_count() or 1)))
+# Factory arguments that select an output form, not a chunking parameter
+_NON_PARAMS = {"as_spans", "as_stream", "use_cache"}
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")  # applied with thousands separators removed
+_WORD_RE = re.compile(r"[a-z]{4,}")
+
+
+def _factories() -> Dict[str, Callable]:
+    from src.chunker_registry import make_fixed, make_layout, make_recursive_rule, make_semantic_adjacent
+
+    return {
+        "fixed": make_fixed,
+        "layout": make_layout,
+        "recursive_rule": make_recursive_rule,
+        "semantic_adjacent": make_semantic_adjacent,
+    }
+
+
+def expand_grid(grid: Dict[str, Dict[str, Sequence[Any]]]) -> List[GridPoint]:
+    """
+    All grid points of {factory name: {parameter: values}}, in order.
+    Parameters are checked against the registry factory's signature (make_fixed, ...).
+    """
+    factories = _factories()
+    points: List[GridPoint] = []
+    for name, params in grid.items():
+        if name not in factories:
+            raise ValueError(f"Unknown chunker factory {name!r} (expected one of {sorted(factories)})")
+        allowed = set(inspect.signature(factories[name]).parameters) - _NON_PARAMS
+        unknown = set(params) - allowed
+        if unknown:
+            raise ValueError(f"{name}: unknown parameters {sorted(unknown)} (allowed: {sorted(allowed)})")
+        keys = list(params)
+        for values in itertools.product(*(params[k] for k in keys)):
+            points.append((name, dict(zip(keys, values))))
+    return points
+
+
+@dataclass
+class SweepDoc:
+    """A document and the questions asked about it (answers are matched in retrieved chunks)."""
+
+    text: str
+    questions: List[str] = field(default_factory=list)
+    answers: List[str] = field(default_factory=list)
+
+
+def answer_terms(answer: str) -> List[str]:
+    """
+    Terms a retrieved chunk must contain to support an answer: its numbers (commas
+    dropped) or, for answers without numbers, its lowercase words of 4+ letters.
+    """
+    numbers = _NUMBER_RE.findall(answer.replace(",", ""))
+    if numbers:
+        return sorted(set(numbers))
+    return sorted(set(_WORD_RE.findall(answer.lower())))
+
+
+def _chunk_terms(text: str) -> set:
+    return set(_NUMBER_RE.findall(text.replace(",", ""))) | set(_WORD_RE.findall(text.lower()))
+
+
+def pooled_vectors(doc: PreparedDocument, unit_embs: np.ndarray, spans: np.ndarray) -> np.ndarray:
+    """
+    Chunk vectors from paragraph embeddings: the mean of the paragraphs a chunk covers,
+    weighted by the characters it takes from each (normalized). Needs no model call,
+    so every grid point reuses the one paragraph-embedding pass.
+    """
+    paras = np.array(doc.paragraphs, dtype=np.int64).reshape(-1, 2)
+    out = np.zeros((len(spans), unit_embs.shape[1]), dtype=np.float32)
+    if not len(paras) or not len(spans):
+        return out
+    ps, pe = paras[:, 0], paras[:, 1]
+    cs, ce = spans[:, 0], spans[:, 1]
+
+    # prefix[k] = sum over paragraphs < k of length * vector
+    prefix = np.zeros((len(paras) + 1, unit_embs.shape[1]), dtype=np.float64)
+    np.cumsum((pe - ps)[:, None] * unit_embs, axis=0, out=prefix[1:])
+
+    # Paragraphs lo..hi-1 intersect the chunk; the first and last may be cut
+    lo = np.searchsorted(pe, cs, side="right")
+    hi = np.searchsorted(ps, ce, side="left")
+    ok = (cs >= 0) & (hi > lo)
+    lo, hi, cs, ce = lo[ok], hi[ok], cs[ok], ce[ok]
+    cut_left = np.maximum(0, cs - ps[lo])[:, None]
+    cut_right = np.maximum(0, pe[hi - 1] - ce)[:, None]
+    vecs = prefix[hi] - prefix[lo] - cut_left * unit_embs[lo] - cut_right * unit_embs[hi - 1]
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+    out[ok] = vecs
+    return out
+
+
+def _chunk_point(doc: PreparedDocument, unit_embs: np.ndarray, point: GridPoint) -> ChunkSpans:
+    name, params = point
+    if name == "semantic_adjacent":
+        chunks = chunk_semantic_adjacent_from_embeddings(doc, unit_embs, **params)
+        return ChunkSpans.from_chunks(doc.source, chunks, name)
+    return _factories()[name](as_spans=True, **params)(doc)
+
+
+# (doc index, normalized text, paragraph embeddings, question vectors, answers, grid, top_k)
+_SweepUnit = Tuple[int, str, np.ndarray, np.ndarray, List[str], List[GridPoint], int]
+
+
+def _sweep_doc(
+    unit: _SweepUnit,
+    encode_chunks: Optional[Callable[[List[str]], np.ndarray]] = None,
+) -> List[Dict[str, float]]:
+    """Chunk one document at every grid point and score retrieval for its questions."""
+    _, text, unit_embs, q_vecs, answers, points, top_k = unit
+    doc = prepare_document(text)
+    terms = [set(answer_terms(a)) for a in answers]
+    scored = [i for i, t in enumerate(terms) if t]
+    # Grid points share many chunks (whole paragraphs, tables): extract their terms once
+    term_cache: Dict[str, set] = {}
+
+    out: List[Dict[str, float]] = []
+    for point in points:
+        t0 = time.perf_counter()
+        spans = _chunk_point(doc, unit_embs, point)
+        chunk_s = time.perf_counter() - t0
+        lengths = spans.lengths
+        row = {
+            "n_chunks": len(spans),
+            "chunk_chars": int(lengths.sum()),
+            "min_chunk_chars": int(lengths.min()) if len(spans) else 0,
+            "max_chunk_chars": int(lengths.max()) if len(spans) else 0,
+            "chunk_s": chunk_s,
+            "n_questions": len(scored),
+            "hits": 0,
+            "terms_found": 0,
+            "terms_total": sum(len(terms[i]) for i in scored),
+        }
+        if len(spans) and scored:
+            if encode_chunks is not None:
+                vecs = encode_chunks(spans.texts())
+            else:
+                vecs = pooled_vectors(doc, unit_embs, spans.spans)
+            k = min(top_k, len(spans))
+            sims = q_vecs[scored] @ vecs.T
+            top = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+            for row_i, qi in enumerate(scored):
+                found = set()
+                for c in top[row_i].tolist():
+                    # Only retrieved chunks are materialized
+                    t = spans.text(c)
+                    ct = term_cache.get(t)
+                    if ct is None:
+                        ct = term_cache[t] = _chunk_terms(t)
+                    if terms[qi] <= ct:
+                        row["hits"] += 1
+                        found = terms[qi]
+                        break
+                    found |= terms[qi] & ct
+                row["terms_found"] += len(found)
+        out.append(row)
+    return out
+
+
+def run_sweep(
+    docs: Sequence[SweepDoc],
+    grid: Dict[str, Dict[str, Sequence[Any]]],
+    encode: Callable[[List[str]], np.ndarray],
+    top_k: int = 5,
+    n_workers: Optional[int] = None,
+    encode_chunks: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Chunk every document at every grid point and score retrieval; one result row per grid point.
+    - encode: texts -> normalized vectors (e.g. the embedding cache). It embeds each document's
+      paragraphs and all questions once; paragraph splits, table lines and sentence units
+      are shared across grid points through PreparedDocument
+    - encode_chunks=False ranks chunks by pooled_vectors (no model call per grid point);
+      True embeds every grid point's chunks with encode, in this process (use for the
+      shortlisted configurations)
+    - documents fan out over n_workers processes (CHUNK_WORKERS by default)
+    Metrics: hit_at_k = share of questions with a top-k chunk holding every answer term
+    (answer_terms); term_recall_at_k = share of answer terms found across the top k.
+    """
+    points = expand_grid(grid)
+    texts = [d.text.replace("\r\n", "\n").replace("\r", "\n") for d in docs]
+    units = [paragraph_units(t) for t in texts]
+
+    # The one embedding pass: all paragraphs (the semantic chunker's units) and questions
+    pooled = [u for us in units for u in us]
+    questions = [q for d in docs for q in d.questions]
+    vecs = encode(pooled + questions) if pooled or questions else np.zeros((0, 1), dtype=np.float32)
+    para_vecs, q_vecs = vecs[: len(pooled)], vecs[len(pooled) :]
+
+    def work_units() -> Iterator[_SweepUnit]:
+        p_off = q_off = 0
+        for i, (d, us) in enumerate(zip(docs, units)):
+            yield (
+                i,
+                texts[i],
+                para_vecs[p_off : p_off + len(us)],
+                q_vecs[q_off : q_off + len(d.questions)],
+                list(d.answers),
+                points,
+                top_k,
+            )
+            p_off += len(us)
+            q_off += len(d.questions)
+
+    totals = [
+        {"n_docs": 0, "n_chunks": 0, "chunk_chars": 0, "min_chunk_chars": None, "max_chunk_chars": 0,
+         "chunk_s": 0.0, "n_questions": 0, "hits": 0, "terms_found": 0, "terms_total": 0}
+        for _ in points
+    ]
+
+    def add(doc_rows: List[Dict[str, float]]) -> None:
+        for tot, r in zip(totals, doc_rows):
+            tot["n_docs"] += 1
+            for key in ("n_chunks", "chunk_chars", "chunk_s", "n_questions", "hits", "terms_found", "terms_total"):
+                tot[key] += r[key]
+            if r["n_chunks"]:
+                lo = tot["min_chunk_chars"]
+                tot["min_chunk_chars"] = r["min_chunk_chars"] if lo is None else min(lo, r["min_chunk_chars"])
+                tot["max_chunk_chars"] = max(tot["max_chunk_chars"], r["max_chunk_chars"])
+
+    if n_workers is None:
+        n_workers = 0 if encode_chunks else DEFAULT_WORKERS
+    if encode_chunks or n_workers <= 0:
+        chunk_encoder = encode if encode_chunks else None
+        for unit in work_units():
+            add(_sweep_doc(unit, chunk_encoder))
+    else:
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx) as pool:
+            for _, doc_rows, err in run_bounded(work_units(), _sweep_doc, max_workers=n_workers, pool=pool):
+                if err is not None:
+                    raise err
+                add(doc_rows)
+
+    # Tidy table: one row per grid point, one column per parameter (blank where a factory has none)
+    param_names = sorted({k for _, params in points for k in params})
+    rows: List[Dict[str, Any]] = []
+    for (name, params), tot in zip(points, totals):
+        row: Dict[str, Any] = {"chunker": name}
+        row.update({k: params.get(k, "") for k in param_names})
+        row.update({
+            "n_docs": tot["n_docs"],
+            "n_chunks": tot["n_chunks"],
+            "avg_chunk_chars": tot["chunk_chars"] / max(1, tot["n_chunks"]),
+            "min_chunk_chars": tot["min_chunk_chars"] or 0,
+            "max_chunk_chars": tot["max_chunk_chars"],
+            "n_questions": tot["n_questions"],
+            "hit_at_k": tot["hits"] / max(1, tot["n_questions"]),
+            "term_recall_at_k": tot["terms_found"] / max(1, tot["terms_total"]),
+            "chunk_s": tot["chunk_s"],
+        })
+        rows.append(row)
+    return rows
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.embedding_pool import DEFAULT_MODEL
+
+# all-MiniLM-L6-v2 truncates at 256 tokens, [CLS] / [SEP] included
+MODEL_MAX_TOKENS = 256
+SPECIAL_TOKENS = 2
+
+# Stand-in when no tokenizer is available: words and single punctuation marks, which is
+# how BERT's pre-tokenizer splits text (WordPiece only splits words further, so it undercounts)
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Token counts for chunk sizing, cached per text (chunkers count units - paragraphs,
+    sentences, lines, blocks - and add them up, instead of re-tokenizing a growing buffer).
+    - tokenizer: a Hugging Face tokenizer (fast / Rust-backed preferred); None = regex approximation
+    Joining units with whitespace does not merge tokens, so unit counts add up to the count
+    of the joined text for whitespace-pre-tokenized models (BERT / MiniLM WordPiece).
+    """
+
+    def __init__(self, tokenizer=None, max_cache: int = 1 << 18):
+        self.tokenizer = tokenizer
+        self._backend = getattr(tokenizer, "backend_tokenizer", None)
+        if self._backend is not None:
+            # Counts must not be capped at the model window (tokenizer.json may enable truncation)
+            self._backend.no_truncation()
+            self._backend.no_padding()
+        self.max_cache = max_cache
+        self._counts: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _encode_counts(self, texts: List[str]) -> List[int]:
+        if self.tokenizer is None:
+            return [len(_APPROX_TOKEN_RE.findall(t)) for t in texts]
+        if self._backend is not None:
+            return [len(e.ids) for e in self._backend.encode_batch(texts, add_special_tokens=False)]
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    def count(self, text: str) -> int:
+        n = self._counts.get(text)
+        if n is not None:
+            self.hits += 1
+            return n
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        """Counts for many texts; cache misses are tokenized in one batch."""
+        out: List[int] = []
+        missing: Dict[str, List[int]] = {}
+        for i, t in enumerate(texts):
+            n = self._counts.get(t)
+            if n is None:
+                missing.setdefault(t, []).append(i)
+            out.append(n)
+        self.hits += len(texts) - sum(len(ix) for ix in missing.values())
+        if missing:
+            todo = list(missing)
+            self.misses += len(todo)
+            if len(self._counts) + len(todo) > self.max_cache:
+                self._counts.clear()
+            for t, n in zip(todo, self._encode_counts(todo)):
+                self._counts[t] = n
+                for i in missing[t]:
+                    out[i] = n
+        return out
+
+    def spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character (start, end) of every token in text (not cached; used for token windows)."""
+        if self._backend is not None:
+            return [(s, e) for s, e in self._backend.encode(text, add_special_tokens=False).offsets if e > s]
+        if self.tokenizer is not None:
+            try:
+                enc = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+                return [(s, e) for s, e in enc["offset_mapping"] if e > s]
+            except NotImplementedError:
+                pass  # slow tokenizers have no offsets
+        return [m.span() for m in _APPROX_TOKEN_RE.finditer(text)]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._counts)}
+
+
+_COUNTERS: Dict[str, TokenCounter] = {}
+_LOCK = threading.Lock()
+
+
+def get_token_counter(model_name: Optional[str] = DEFAULT_MODEL) -> TokenCounter:
+    """
+    Process-wide counter for a model's tokenizer (tokenizer only, no weights are loaded).
+    model_name=None, or transformers not installed, gives the regex approximation.
+    """
+    key = model_name or ""
+    with _LOCK:
+        counter = _COUNTERS.get(key)
+        if counter is None:
+            tokenizer = None
+            if model_name:
+                try:
+                    from transformers import AutoTokenizer
+                except ImportError:
+                    AutoTokenizer = None
+                if AutoTokenizer is not None:
+                    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+            counter = _COUNTERS[key] = TokenCounter(tokenizer)
+    return counter
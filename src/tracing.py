@@ -0,0 +1,181 @@
+from __future__ import annotations
+import atexit
+from contextlib import contextmanager
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.jsonl_io import JsonlWriter, iter_jsonl
+
+DEFAULT_TRACE_PATH = Path(os.getenv("TRACE_PATH", "artifacts/traces/pipeline.jsonl"))
+# TRACE=0 turns every span into a no-op
+TRACE_ENABLED = os.getenv("TRACE", "1") != "0"
+
+PERCENTILES = (50, 95, 99)
+# Span name that wraps a whole pipeline stage (one per script run)
+STAGE_SPAN = "stage"
+
+
+def text_bytes(texts: Iterable[str]) -> int:
+    return sum(len(t.encode("utf-8")) for t in texts)
+
+
+class Tracer:
+    """
+    Appends one JSON row per finished span to a local trace file:
+      {"run", "stage", "span", "chunker", "start", "seconds", "count", "bytes", "ok", ...}
+    - run groups the stages of one pipeline run (TRACE_RUN_ID, else one id per process);
+      export the same TRACE_RUN_ID before each script to compare stages of one run
+    - span() yields the row, so callers fill count / bytes / extra fields inside the block
+    - thread-safe (generation / judge thread pools); rows are buffered and flushed at exit
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        path: Path | str = DEFAULT_TRACE_PATH,
+        run_id: Optional[str] = None,
+        enabled: bool = TRACE_ENABLED,
+        batch_size: int = 256,
+    ):
+        self.stage = stage
+        self.path = Path(path)
+        self.run_id = run_id or os.getenv("TRACE_RUN_ID") or time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        self.enabled = enabled
+        self.n_spans = 0
+        self._lock = threading.Lock()
+        self._writer = JsonlWriter(self.path, mode="a", batch_size=batch_size) if enabled else None
+
+    @contextmanager
+    def span(self, name: str, chunker: Optional[str] = None, **fields: Any) -> Iterator[Dict[str, Any]]:
+        row: Dict[str, Any] = {"count": 0, "bytes": 0, **fields}
+        if not self.enabled:
+            yield row
+            return
+        start = time.time()
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            yield row
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.record(name, time.perf_counter() - t0, chunker=chunker, start=start, ok=ok, **row)
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        chunker: Optional[str] = None,
+        start: Optional[float] = None,
+        ok: bool = True,
+        **fields: Any,
+    ) -> None:
+        """Add a span timed elsewhere (e.g. reported by a client library)."""
+        if not self.enabled:
+            return
+        row = {
+            "run": self.run_id,
+            "stage": self.stage,
+            "span": name,
+            "chunker": chunker,
+            "start": start if start is not None else time.time() - seconds,
+            "seconds": seconds,
+            "count": 0,
+            "bytes": 0,
+            "ok": ok,
+        }
+        row.update(fields)
+        with self._lock:
+            self._writer.write(row)
+            self.n_spans += 1
+
+    @contextmanager
+    def stage_span(self, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """Wall-clock of the whole stage; flushes the trace file when it ends."""
+        try:
+            with self.span(STAGE_SPAN, **fields) as row:
+                yield row
+        finally:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._writer is not None:
+            with self._lock:
+                self._writer.flush()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            with self._lock:
+                self._writer.close()
+
+
+_TRACER: Optional[Tracer] = None
+
+
+def start_trace(stage: str, path: Path | str = DEFAULT_TRACE_PATH, **kwargs: Any) -> Tracer:
+    """Create the process-wide tracer for a pipeline stage (call once, in the script's main)."""
+    global _TRACER
+    if _TRACER is not None:
+        _TRACER.close()
+    _TRACER = Tracer(stage, path, **kwargs)
+    atexit.register(_TRACER.close)
+    return _TRACER
+
+
+def get_tracer() -> Tracer:
+    """The tracer from start_trace(); a no-op one when the running script never started one."""
+    global _TRACER
+    if _TRACER is None:
+        _TRACER = Tracer("", enabled=False)
+    return _TRACER
+
+
+def load_trace(path: Path | str = DEFAULT_TRACE_PATH, runs: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Trace rows, optionally only those of the given run ids."""
+    keep = set(runs) if runs else None
+    return [r for r in iter_jsonl(path) if keep is None or r.get("run") in keep]
+
+
+def latest_run(rows: Sequence[Dict[str, Any]]) -> Optional[str]:
+    """Run id of the most recently started span."""
+    if not rows:
+        return None
+    return max(rows, key=lambda r: r.get("start") or 0.0)["run"]
+
+
+def summarize(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    One row per (stage, span, chunker): n, total seconds, p50/p95/p99/max in ms, summed
+    count and bytes, failures, and total_s as a share of the stage's wall-clock.
+    The share can pass 1.0 for spans that ran concurrently (thread-pooled LLM / judge calls).
+    """
+    groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+    stage_wall: Dict[str, float] = {}
+    for r in rows:
+        if r["span"] == STAGE_SPAN:
+            stage_wall[r["stage"]] = stage_wall.get(r["stage"], 0.0) + r["seconds"]
+        groups.setdefault((r["stage"], r["span"], r.get("chunker") or ""), []).append(r)
+
+    out: List[Dict[str, Any]] = []
+    for (stage, span, chunker), rs in groups.items():
+        secs = np.array([r["seconds"] for r in rs], dtype=np.float64)
+        pcts = np.percentile(secs, PERCENTILES) * 1000.0
+        total = float(secs.sum())
+        wall = stage_wall.get(stage)
+        row: Dict[str, Any] = {"stage": stage, "span": span, "chunker": chunker, "n": len(rs), "total_s": total}
+        row.update({f"p{p}_ms": float(v) for p, v in zip(PERCENTILES, pcts)})
+        row.update({
+            "max_ms": float(secs.max()) * 1000.0,
+            "count": sum(r.get("count") or 0 for r in rs),
+            "bytes": sum(r.get("bytes") or 0 for r in rs),
+            "failed": sum(1 for r in rs if not r.get("ok", True)),
+            "share_of_stage": total / wall if wall else float("nan"),
+        })
+        out.append(row)
+    return out
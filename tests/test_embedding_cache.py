@@ -0,0 +1,99 @@
+from __future__ import annotations
+import sys
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+import src.embedding_cache as embedding_cache
+from src.embedding_cache import EmbeddingCache
+
+
+class _FakeModel:
+    """Deterministic per-text vectors, so a vector read back can be checked against its text."""
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, show_progress_bar=False):
+        out = np.zeros((len(texts), 4), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i] = [len(t), ord(t[0]), ord(t[-1]), sum(map(ord, t))]
+        return out
+
+
+def test_unflushed_rows_are_dropped_on_reopen(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "get_model", lambda *a, **k: _FakeModel())
+    expected = lambda texts: _FakeModel().encode(texts)
+
+    # Process "crashes" before the first flush: vectors.bin has rows, no meta / index
+    crashed = EmbeddingCache(tmp_path, flush_every=10**9)
+    crashed.encode(["aaa", "bbbb"])
+    del crashed
+
+    cache = EmbeddingCache(tmp_path, flush_every=10**9, memory_items=0)
+    np.testing.assert_array_equal(cache.encode(["cc"]), expected(["cc"]))
+    np.testing.assert_array_equal(cache.encode(["aaa", "cc"]), expected(["aaa", "cc"]))
+    assert cache.misses == 2
+    cache.flush()
+
+    # Committed rows survive; rows appended after the last flush are dropped again
+    cache.encode(["dddd"])
+    del cache
+    reopened = EmbeddingCache(tmp_path, flush_every=10**9, memory_items=0)
+    np.testing.assert_array_equal(reopened.encode(["cc", "aaa"]), expected(["cc", "aaa"]))
+    assert reopened.misses == 0
+    np.testing.assert_array_equal(reopened.encode(["eee"]), expected(["eee"]))
+
+
+def _check_reads(cache, texts, expected):
+    """Every text is either missing (re-embedded) or read back as its own vector."""
+    np.testing.assert_array_equal(cache.encode(texts), expected(texts))
+
+
+def test_crash_after_compaction_keeps_committed_generation(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "get_model", lambda *a, **k: _FakeModel())
+    expected = lambda texts: _FakeModel().encode(texts)
+    texts = ["aaa", "bbbb", "cc", "ddddd", "e"]
+
+    cache = EmbeddingCache(tmp_path, flush_every=10**9, memory_items=0)
+    cache.encode(texts)
+    cache.flush()
+    # Compaction rewrites the vectors, then the process dies before the index / meta commit
+    cache.encode(["ffffff"])
+    shard = next(iter(cache._shards.values()))
+    assert shard.evict_to(2 * 4 * 4) == 4
+    del cache, shard
+
+    reopened = EmbeddingCache(tmp_path, flush_every=10**9, memory_items=0)
+    _check_reads(reopened, texts, expected)
+    assert reopened.misses == 0
+
+
+def test_crash_between_index_and_meta_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "get_model", lambda *a, **k: _FakeModel())
+    expected = lambda texts: _FakeModel().encode(texts)
+
+    cache = EmbeddingCache(tmp_path, flush_every=10**9, memory_items=0)
+    cache.encode(["aaa", "bbbb"])
+    cache.flush()
+    cache.encode(["cc", "ddddd"])
+
+    # Dies right before meta.json is replaced, after everything else was written
+    real_replace = embedding_cache.os.replace
+
+    def crash(src, dst):
+        if Path(dst).name == "meta.json":
+            raise KeyboardInterrupt
+        real_replace(src, dst)
+    monkeypatch.setattr(embedding_cache.os, "replace", crash)
+    try:
+        cache.flush()
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.undo()
+    monkeypatch.setattr(embedding_cache, "get_model", lambda *a, **k: _FakeModel())
+    del cache
+
+    reopened = EmbeddingCache(tmp_path, flush_every=10**9, memory_items=0)
+    _check_reads(reopened, ["cc", "aaa", "ddddd", "bbbb"], expected)
+    assert reopened.misses == 2
@@ -0,0 +1,19 @@
+from __future__ import annotations
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.eval_cache import JudgeStore, aggregate_from_store, sample_key
+
+
+def test_aggregate_weights_duplicate_samples_per_row(tmp_path):
+    store = JudgeStore(tmp_path / "judge.sqlite")
+    a, b = {"question": "a"}, {"question": "b"}
+    store.put_many([(sample_key(a), "fixed", "m", "judge", 1.0), (sample_key(b), "fixed", "m", "judge", 0.0)])
+
+    # Same as DataFrame.mean over the rows: a counts three times
+    (means,) = aggregate_from_store({"fixed": [a, a, a, b]}, ["m"], "judge", store)
+    assert means["m"] == 0.75
+    assert means["n_examples"] == 4
@@ -0,0 +1,48 @@
+from __future__ import annotations
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.index_store import CHUNK_META_DTYPE, load_chunk_index, save_chunk_index
+from src.retrieval import IndexSpec, build_ann_index, hits_for_row
+
+
+def _save(out_dir: Path, spec: IndexSpec, n_small: int = 3, n_big: int = 2000) -> np.ndarray:
+    """Two documents: "small" with n_small chunks, "big" with n_big; returns the vectors."""
+    rng = np.random.default_rng(0)
+    n = n_small + n_big
+    vecs = rng.standard_normal((n, 32)).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    meta = np.zeros(n, dtype=CHUNK_META_DTYPE)
+    meta["doc"] = np.r_[np.zeros(n_small), np.ones(n_big)]
+    meta["text_start"] = np.arange(n) * 5
+    meta["text_end"] = meta["text_start"] + 5
+    blob = b"".join(b"t%04d" % i for i in range(n))
+    save_chunk_index(out_dir, "fixed", build_ann_index(vecs, spec), ["small", "big"], meta, blob, "model-a", spec)
+    return vecs
+
+
+def test_restricted_search_drops_padding_ids(tmp_path):
+    vecs = _save(tmp_path, IndexSpec(kind="ivf_flat", nlist=16, nprobe=1))
+    store = load_chunk_index(tmp_path)
+    chunks = store.doc_chunks("small")
+
+    # k > chunks in the document: FAISS pads with -1, which must not become chunks[-1]
+    scores, idxs = store.search(vecs[:1], 5, doc_id="small")
+    assert (idxs < 0).any()
+    hits = hits_for_row(scores[0], idxs[0], chunks)
+    assert 0 < len(hits) <= len(chunks)
+    assert all(0 <= i < len(chunks) and abs(s) < 1e30 for i, s, _ in hits)
+    assert [t for _, _, t in hits] == [chunks[i] for i, _, _ in hits]
+
+
+def test_load_refuses_other_embedding_model(tmp_path):
+    _save(tmp_path, IndexSpec(kind="flat"), n_big=10)
+    assert load_chunk_index(tmp_path, embed_model="model-a").embed_model == "model-a"
+    with pytest.raises(ValueError, match="model-b"):
+        load_chunk_index(tmp_path, embed_model="model-b")
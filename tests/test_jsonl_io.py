@@ -0,0 +1,52 @@
+from __future__ import annotations
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.jsonl_io import JsonlWriter, iter_jsonl, iter_jsonl_resume, write_jsonl
+
+
+def _rows(n):
+    return [{"id": str(i), "chunker": "fixed", "answer": "é" * i} for i in range(n)]
+
+
+def test_resume_trims_truncated_last_line(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    write_jsonl(path, _rows(3))
+    # Killed mid-flush: the last row is cut inside a multi-byte character
+    data = path.read_bytes()
+    path.write_bytes(data[:-4])
+
+    with pytest.warns(UserWarning, match="partially written"):
+        done = [r["id"] for r in iter_jsonl_resume(path)]
+    assert done == ["0", "1"]
+
+    # Rows appended by the resumed run start on a line of their own
+    with JsonlWriter(path, mode="a") as out:
+        out.write(_rows(3)[2])
+    assert list(iter_jsonl(path)) == _rows(3)
+
+
+def test_resume_keeps_complete_last_row_without_newline(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in _rows(2)), encoding="utf-8")
+
+    assert list(iter_jsonl_resume(path)) == _rows(2)
+    with JsonlWriter(path, mode="a") as out:
+        out.write(_rows(3)[2])
+    assert list(iter_jsonl(path)) == _rows(3)
+
+
+def test_resume_still_raises_on_corrupt_middle_line(tmp_path):
+    path = tmp_path / "answers.jsonl"
+    lines = [json.dumps(r) for r in _rows(3)]
+    lines[1] = lines[1][:5]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        list(iter_jsonl_resume(path))